@@ -0,0 +1,22 @@
+"""Misst, was das Sammeln der Abdeckung in Simulationen kostet.
+
+Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.abdeckung
+"""
+from xwatc_zwei import LEVELS, loader, simulation
+
+
+def main() -> None:
+    for name in ("Die_Pilzfee.cfg", "Kurztreffen_Straße.cfg"):
+        geschichte = loader.load_geschichte(LEVELS / name)
+        ohne = simulation.simuliere(geschichte, 5000)
+        mit = simulation.simuliere(geschichte, 5000, abdeckung=True)
+        assert mit.abdeckung
+        print(f"{geschichte.pfad:<20} ohne {ohne.läufe_pro_sekunde:8.0f} Läufe/s   "
+              f"mit Abdeckung {mit.läufe_pro_sekunde:8.0f} Läufe/s   "
+              f"({mit.abdeckung.datei(geschichte.pfad).anteil:.0%} abgedeckt)")
+
+
+if __name__ == "__main__":
+    main()
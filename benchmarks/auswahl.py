@@ -0,0 +1,51 @@
+"""Vergleicht die Auswahl mit Index und Fenwick-Baum mit dem Neuauswerten aller Bedingungen.
+
+Eine Situation hat zehntausend Geschichten, deren Bedingungen von hundert Weltvariablen
+abhängen. Vor jeder Auswahl ändert sich eine Variable. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.auswahl
+"""
+import random
+import time
+
+from xwatc_zwei import loader
+from xwatc_zwei.auswahl import Auswahl
+from xwatc_zwei.geschichte import Bedingung
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Spielzustand
+
+
+def _einfach(gewichte: list[int], bedingungen: list[Bedingung], zustand: Spielzustand,
+             rng: random.Random) -> int:
+    möglich = [i for i, bed in enumerate(bedingungen) if bed.übersetzt(zustand)]
+    return rng.choices(möglich, [gewichte[i] for i in möglich])[0]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    anzahl, variablen, runden = 10_000, 100, 200
+    gewichte = [rng.randrange(1, 10) for __ in range(anzahl)]
+    bedingungen = [loader.parse_bedingung(
+        f".v{rng.randrange(variablen)} | .v{rng.randrange(variablen)}") for __ in range(anzahl)]
+    zustand = Spielzustand.aus_geschichte(Geschichte([Geschichtsblock("a", [])]))
+    welt = zustand.assert_get_welt()
+    for i in range(variablen):
+        welt.setze_variable(f"v{i}", i % 2 == 0)
+    änderungen = [rng.randrange(variablen) for __ in range(runden)]
+
+    def messe(ziehe) -> float:
+        start = time.perf_counter()
+        for i in änderungen:
+            welt.setze_variable(f"v{i}", not welt.get_variable(f"v{i}", False))
+            ziehe()
+        return (time.perf_counter() - start) * 1000 / runden
+
+    auswahl = Auswahl(gewichte, bedingungen)
+    auswahl.aktualisiere(zustand)
+    einfach = messe(lambda: _einfach(gewichte, bedingungen, zustand, rng))
+    mit_index = messe(lambda: auswahl.ziehe(zustand, rng))
+    print(f"{anzahl} Geschichten, {variablen} Variablen:  alle prüfen {einfach:7.3f} ms   "
+          f"Auswahl {mit_index:7.3f} ms   pro Ziehung")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Vergleicht die Erkundung aller Wege mit und ohne Zusammenlegen gleicher Zustände.
+
+Erkundet werden die Level und eine erzeugte Geschichte mit vielen Entscheidungen
+hintereinander, in denen jeweils gewürfelt wird. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.erkundung
+"""
+from xwatc_zwei import LEVELS, geschichte, loader
+from xwatc_zwei.erkundung import erkunde
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock
+
+
+def _kette(länge: int) -> Geschichte:
+    zeilen: list[geschichte.Zeile] = []
+    for i in range(länge):
+        zeilen.append(geschichte.Entscheidung([
+            geschichte.Wahlmöglichkeit(id, id, [geschichte.IfElif([
+                (loader.parse_bedingung("glück(50)"), [geschichte.Text("Glück")]),
+                (None, [geschichte.Text("Pech")]),
+            ])]) for id in ("links", "rechts", "warten")]))
+    return Geschichte([Geschichtsblock("start", zeilen)], f"Kette_{länge}")
+
+
+def main() -> None:
+    geschichten = [loader.load_geschichte(LEVELS / name) for name in (
+        "Die_Pilzfee.cfg", "Kurztreffen_Straße.cfg", "scenario1.cfg")]
+    geschichten += [_kette(3), _kette(5)]
+    for geschichte_ in geschichten:
+        zeiten = []
+        for zusammenlegen in (True, False):
+            ergebnis = erkunde(geschichte_, zusammenlegen=zusammenlegen, max_zustände=20_000)
+            zeiten.append(f"{ergebnis.zustände:>7} Zustände {ergebnis.dauer * 1000:9.1f} ms")
+        print(f"{geschichte_.pfad:<20} zusammengelegt: {zeiten[0]}   einzeln: {zeiten[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Vergleicht Spielzustand.fork mit dem Kopieren aller Variablen beim Durchsuchen aller Wege.
+
+Durchsucht werden alle Wahlen von Kurztreffen_Straße.cfg, einmal mit einer normalen und
+einmal mit einer großen Welt (viele Weltvariablen, wie nach langem Spielen). Aufruf aus dem
+Hauptordner::
+
+    python -m benchmarks.fork
+"""
+import random
+import time
+from collections.abc import Callable
+
+from xwatc_zwei import LEVELS, loader, mänx
+from xwatc_zwei.geschichte import Entscheidung
+from xwatc_zwei.variablen import Variablen
+from xwatc_zwei.verteiler import Spielzustand, Weltposition
+
+
+def _kopiere(zustand: Spielzustand) -> Spielzustand:
+    """Wie fork, aber mit einer echten Kopie aller Variablen."""
+    rng = random.Random()
+    rng.setstate(zustand.get_rng().getstate())
+    position = zustand.position
+    alter_mänx = zustand.assert_get_mänx()
+    return Spielzustand(
+        zustand.verteiler,
+        Weltposition(position.geschichte, position.pc, Variablen(position.modul_vars))
+        if position else None,
+        mänx.Mänx(Variablen(alter_mänx._werte), Variablen(alter_mänx._fähigkeiten)),
+        mänx.Welt(Variablen(zustand.assert_get_welt()._variablen)),
+        rng=rng)
+
+
+def _durchsuche(zustand: Spielzustand, eingabe: str, kopiere: Callable[[Spielzustand],
+                Spielzustand], tiefe: int = 20) -> int:
+    """Gehe alle Wege durch und gebe die Zahl der besuchten Entscheidungen zurück."""
+    _outputs, zeile = zustand.run(eingabe)
+    if not zustand.position or not isinstance(zeile, Entscheidung) or not tiefe:
+        return 1
+    anzahl = 1
+    for wahl in zeile.wahlen:
+        if zustand.eval_bedingung(wahl.bedingung):
+            anzahl += _durchsuche(kopiere(zustand), wahl.id, kopiere, tiefe - 1)
+    return anzahl
+
+
+def main() -> None:
+    geschichte = loader.load_geschichte(LEVELS / "Kurztreffen_Straße.cfg")
+    for weltvariablen in (0, 10_000):
+        basis = Spielzustand.aus_geschichte(geschichte, seed=0)
+        for i in range(weltvariablen):
+            basis.assert_get_welt().setze_variable(f"v{i}", i)
+        ergebnisse = []
+        for kopiere in (_kopiere, Spielzustand.fork):
+            start = time.perf_counter()
+            durchläufe = knoten = 0
+            while time.perf_counter() - start < 1:
+                knoten = _durchsuche(kopiere(basis), "", kopiere)
+                durchläufe += 1
+            ergebnisse.append(durchläufe / (time.perf_counter() - start))
+        print(f"{weltvariablen:>6} Weltvariablen, {knoten} Entscheidungen:  "
+              f"Kopie {ergebnisse[0]:8.1f}/s   fork {ergebnisse[1]:8.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Vergleicht den Interpreter für übersetzte Programme mit dem alten Durchlaufen der Zeilen.
+
+Gemessen werden ausgeführte Zeilen pro Sekunde in einer Geschichte, die sich mit einer
+Entscheidung immer wieder selbst aufruft. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.interpreter
+"""
+import time
+from collections.abc import Sequence
+
+from attrs import define
+
+from xwatc_zwei import geschichte, loader
+from xwatc_zwei.geschichte import InputZeile, OutputZeile, Sonderziel, Zeile
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Spielzustand, Weltposition
+
+
+@define
+class _Baumzustand(Spielzustand):
+    """Der Interpreter, wie er vor dem Übersetzen war: Er läuft mit einem Positionstupel
+    durch die verschachtelten Zeilen."""
+    _block: Geschichtsblock | None = None
+    _pos: tuple[int, ...] = (0,)
+    schritte: int = 0
+
+    def _aktuelle_zeile(self) -> Zeile | None:
+        assert self._block
+        while True:
+            try:
+                return self._block[self._pos]
+            except IndexError:
+                if len(self._pos) > 1:
+                    self._pos = (*self._pos[:-3], self._pos[-3] + 1)
+                else:
+                    return None
+
+    def run(self, input: str) -> tuple[Sequence[OutputZeile], InputZeile]:
+        if not self._position:
+            self._position = Weltposition.start(self.verteiler.nächste_geschichte(self))
+            self._block = self._position.geschichte.module[0]
+        else:
+            zeile = self._aktuelle_zeile()
+            assert isinstance(zeile, geschichte.Entscheidung)
+            i = next(i for i, wahl in enumerate(zeile.wahlen) if wahl.id == input)
+            self._pos = (*self._pos, i, 0)
+        outputs: list[OutputZeile] = []
+        while True:
+            zeile = self._aktuelle_zeile()
+            if not zeile:
+                self._position = None
+                return outputs, geschichte.Entscheidung.neue_bestätigung()
+            if isinstance(zeile, InputZeile):
+                return outputs, zeile
+            self.schritte += 1
+            if isinstance(zeile, OutputZeile):
+                outputs.append(zeile)
+            if isinstance(zeile, geschichte.IfElif):
+                for j, (bed, _fall) in enumerate(zeile.fälle):
+                    if not bed or self.eval_bedingung(bed):
+                        self._pos = (*self._pos, j, 0)
+                        break
+                else:
+                    self._pos = (*self._pos[:-1], self._pos[-1] + 1)
+            elif isinstance(zeile, geschichte.Sprung):
+                if zeile.ziel != Sonderziel.Self:
+                    self._block = self._position.geschichte.block_by_id(zeile.ziel)
+                self._pos = (0,)
+            else:
+                if isinstance(zeile, geschichte.SetzeVariable):
+                    globals_ = self._welt._variablen if self._welt else None
+                    zeile.ausführen(self._position.modul_vars, globals_)
+                self._pos = (*self._pos[:-1], self._pos[-1] + 1)
+
+
+def _geschichte(länge: int) -> Geschichte:
+    """Eine Schleife mit `länge` Texten und Verzweigungen vor der Entscheidung."""
+    zeilen: list[Zeile] = []
+    for i in range(länge):
+        zeilen.append(geschichte.Text(f"Zeile {i}"))
+        zeilen.append(geschichte.IfElif([
+            (loader.parse_bedingung("x, !y"), [geschichte.Text("x")]),
+            (None, [geschichte.SetzeVariable("x", True)]),
+        ]))
+    zeilen.append(geschichte.Entscheidung([geschichte.Wahlmöglichkeit("w", "Weiter", [
+        geschichte.Text("weiter"), geschichte.Sprung("schleife")])]))
+    return Geschichte([Geschichtsblock("schleife", zeilen)])
+
+
+def _messe(zustand: Spielzustand, mindestzeit: float = 1.0) -> float:
+    """Lasse die Schleife laufen und gebe die Durchläufe pro Sekunde zurück."""
+    zustand.run("")
+    durchläufe = 0
+    start = time.perf_counter()
+    while (dauer := time.perf_counter() - start) < mindestzeit:
+        zustand.run("w")
+        durchläufe += 1
+    return durchläufe / dauer
+
+
+def main() -> None:
+    print(f"{'Länge':>8}{'Baum':>16}{'Programm':>16}")
+    for länge in (1, 10, 100):
+        ziel = _geschichte(länge)
+        baum = _Baumzustand.aus_geschichte(ziel)
+        baum.run("")
+        vorher = baum.schritte
+        baum.run("w")
+        schritte = baum.schritte - vorher
+        baum = _Baumzustand.aus_geschichte(ziel)
+        ergebnisse = [_messe(baum), _messe(Spielzustand.aus_geschichte(ziel))]
+        print(f"{länge:>8}" + "".join(f"{schritte * d:>12.0f} S/s" for d in ergebnisse))
+
+
+if __name__ == "__main__":
+    main()
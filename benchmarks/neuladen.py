@@ -0,0 +1,62 @@
+"""Vergleicht das Neuladen einer geänderten Geschichte mit dem Laden des ganzen Verteilers.
+
+Die Level werden dafür in einen temporären Ordner kopiert. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.neuladen
+"""
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from xwatc_zwei import LEVELS, loader, verteiler
+
+
+def _messe(funktion, wiederholungen: int = 20) -> float:
+    """Die beste Zeit in Millisekunden."""
+    beste = float("inf")
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        funktion()
+        beste = min(beste, time.perf_counter() - start)
+    return beste * 1000
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        ordner = Path(tmp)
+        with open(LEVELS / "verteiler.json", encoding="utf-8") as read:
+            daten = json.load(read)
+        for situation in daten["situationen"]:
+            for i, modul in enumerate(situation["module"]):
+                ziel = ordner / modul
+                shutil.copy(LEVELS / modul, ziel)
+                situation["module"][i] = str(ziel)
+        datei = ordner / "verteiler.json"
+        datei.write_text(json.dumps(daten), encoding="utf-8")
+        geändert = ordner / "Die_Pilzfee.cfg"
+
+        def ändere() -> None:
+            stat = geändert.stat()
+            os.utime(geändert, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        with mock.patch.object(loader, "CACHE_PATH", ordner / "__cache__"):
+            for parser in ("pyparsing", "zeilen"):
+                zustand = verteiler.Spielzustand.from_verteiler(
+                    loader.load_verteiler(datei, workers=1, parser=parser))
+                zustand.run("")
+                alles = _messe(lambda: loader.load_verteiler(
+                    datei, workers=1, cache=False, parser=parser))
+
+                def neu_laden() -> None:
+                    ändere()
+                    loader.lade_neu(zustand, geändert, parser=parser)
+                eine = _messe(neu_laden)
+                print(f"{parser:<10} Verteiler: {alles:8.2f} ms   Eine Datei: {eine:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
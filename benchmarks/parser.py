@@ -0,0 +1,51 @@
+"""Vergleicht die Geschwindigkeit der beiden Parser in Zeilen pro Sekunde.
+
+Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.parser
+"""
+import time
+
+import pyparsing as pp
+
+from xwatc_zwei import LEVELS, loader, zeilenparser
+
+
+def _messe(parse, text: str, mindestzeit: float = 1.0) -> float:
+    """Parse den Text wiederholt und gebe die Durchläufe pro Sekunde zurück."""
+    durchläufe = 0
+    start = time.perf_counter()
+    while (dauer := time.perf_counter() - start) < mindestzeit:
+        parse(text)
+        durchläufe += 1
+    return durchläufe / dauer
+
+
+def main() -> None:
+    backends = {
+        "pyparsing": lambda text: loader.GeschichteBody.parse_string(text, parse_all=True),
+        "zeilen": zeilenparser.parse_geschichte,
+    }
+    gesamt = dict.fromkeys(backends, 0.0)
+    zeilen_gesamt = 0
+    print(f"{'Datei':<28}{'Zeilen':>8}" + "".join(f"{name:>16}" for name in backends))
+    for datei in sorted(LEVELS.glob("*.cfg")):
+        text = datei.read_text(encoding="utf-8")
+        try:
+            loader.GeschichteBody.parse_string(text, parse_all=True)
+        except pp.ParseBaseException:
+            continue
+        zeilen = text.count("\n") + 1
+        zeilen_gesamt += zeilen
+        ergebnisse = []
+        for name, parse in backends.items():
+            pro_sekunde = _messe(parse, text)
+            gesamt[name] += 1 / pro_sekunde
+            ergebnisse.append(zeilen * pro_sekunde)
+        print(f"{datei.name:<28}{zeilen:>8}" + "".join(f"{z:>12.0f} Z/s" for z in ergebnisse))
+    print(f"{'Gesamt':<28}{zeilen_gesamt:>8}"
+          + "".join(f"{zeilen_gesamt / dauer:>12.0f} Z/s" for dauer in gesamt.values()))
+
+
+if __name__ == "__main__":
+    main()
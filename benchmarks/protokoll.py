@@ -0,0 +1,25 @@
+"""Misst den Interpreter ohne und mit Protokoll.
+
+Ohne Protokoll läuft dieselbe Schleife wie vorher, der Unterschied zu `benchmarks.interpreter`
+sollte im Rauschen liegen. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.protokoll
+"""
+from benchmarks.interpreter import _geschichte, _messe
+from xwatc_zwei.protokoll import Protokoll
+from xwatc_zwei.verteiler import Spielzustand
+
+
+def main() -> None:
+    print(f"{'Länge':>8}{'ohne':>16}{'mit Protokoll':>20}")
+    for länge in (1, 10, 100):
+        ziel = _geschichte(länge)
+        ohne = Spielzustand.aus_geschichte(ziel)
+        mit = Spielzustand.aus_geschichte(ziel)
+        mit.protokoll = Protokoll(max_ereignisse=100_000)
+        ergebnisse = [_messe(ohne), _messe(mit)]
+        print(f"{länge:>8}" + "".join(f"{d:>14.0f} Z/s" for d in ergebnisse))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Misst den Server mit zehntausend gleichzeitigen Sitzungen auf level/verteiler.json.
+
+Gemessen wird der Speicher pro Sitzung, Züge pro Sekunde direkt über
+:py:meth:`Server.bearbeite` und über TCP, wo ein Lastgenerator mit 50 Verbindungen alle
+Sitzungen reihum spielen lässt. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.server
+"""
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from xwatc_zwei import LEVELS
+from xwatc_zwei.server import Server, lade_verteiler
+
+SITZUNGEN = 10_000
+ZÜGE = 5
+VERBINDUNGEN = 50
+
+
+def _wahl(antwort: dict, rng: random.Random) -> dict:
+    return {"sitzung": antwort["sitzung"], "wahl": rng.choice(antwort["wahlen"])["id"]}
+
+
+def _direkt(server: Server) -> tuple[float, float]:
+    """Speicher pro Sitzung in Bytes und Züge pro Sekunde."""
+    rng = random.Random(0)
+    tracemalloc.start()
+    vorher = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    antworten = [server.bearbeite({"seed": i}) for i in range(SITZUNGEN)]
+    speicher = (tracemalloc.get_traced_memory()[0] - vorher) / SITZUNGEN
+    tracemalloc.stop()
+    for __ in range(ZÜGE - 1):
+        antworten = [server.bearbeite(_wahl(antwort, rng)) for antwort in antworten]
+    dauer = time.perf_counter() - start
+    return speicher, SITZUNGEN * ZÜGE / dauer
+
+
+async def _verbindung(port: int, anzahl: int, seed: int) -> None:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def frage(anfragen: list[dict]) -> list[dict]:
+        writer.writelines(json.dumps(a).encode() + b"\n" for a in anfragen)
+        return [json.loads(await reader.readline()) for __ in anfragen]
+
+    antworten = await frage([{"seed": f"{seed}:{i}"} for i in range(anzahl)])
+    for __ in range(ZÜGE - 1):
+        antworten = await frage([_wahl(antwort, rng) for antwort in antworten])
+    writer.close()
+    await writer.wait_closed()
+
+
+async def _tcp(server: Server) -> float:
+    tcp = await server.starte(port=0)
+    port = tcp.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    await asyncio.gather(*(_verbindung(port, SITZUNGEN // VERBINDUNGEN, i)
+                           for i in range(VERBINDUNGEN)))
+    dauer = time.perf_counter() - start
+    tcp.close()
+    await tcp.wait_closed()
+    return SITZUNGEN * ZÜGE / dauer
+
+
+def main() -> None:
+    verteiler = lade_verteiler(LEVELS / "verteiler.json")
+    speicher, direkt = _direkt(Server(verteiler))
+    tcp = asyncio.run(_tcp(Server(verteiler)))
+    print(f"{SITZUNGEN} Sitzungen:  {speicher / 1024:.1f} KiB pro Sitzung   "
+          f"direkt {direkt:8.0f} Züge/s   TCP {tcp:8.0f} Züge/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Misst den Speicher geladener Geschichten und wie schnell sich ihre Zeilen durchgehen lassen.
+
+Die Geschichten sind erzeugt: zehntausend Blöcke mit Texten, Fällen und Wahlen, in denen
+sich Ids, Bedingungen und viele Texte wiederholen, wie in echten Geschichten. Aufruf aus dem
+Hauptordner::
+
+    python -m benchmarks.speicher
+"""
+import random
+import time
+import tracemalloc
+
+from xwatc_zwei import geschichte, zeilenparser
+
+BLÖCKE = 10_000
+DATEIEN = 20
+
+
+def _datei(rng: random.Random, anfang: int, anzahl: int) -> str:
+    zeilen = []
+    for i in range(anfang, anfang + anzahl):
+        zeilen += [f"/b{i}/", f"/Du gehst weiter, Wegstück {rng.randrange(50)}.",
+                   "<stark(12), .tag> /Die Sonne scheint.", "<!.tag> /Es ist dunkel.", "<>",
+                   "    /Nichts passiert.",
+                   ":weiter: Weiter", f"    > b{rng.randrange(BLÖCKE)}",
+                   ":zurück<.schlüssel>: Zurück", "    .tag = 1", "    /Du kehrst um.",
+                   "    + Apfel 2", "    > self", ""]
+    return "\n".join(zeilen)
+
+
+def main() -> None:
+    rng = random.Random(0)
+    pro_datei = BLÖCKE // DATEIEN
+    texte = [_datei(rng, i * pro_datei, pro_datei) for i in range(DATEIEN)]
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    dateien = [zeilenparser.parse_geschichte(text) for text in texte]
+    speicher = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    start_zeit = time.perf_counter()
+    runden = 10
+    for __ in range(runden):
+        zeilen = sum(1 for blöcke in dateien for block in blöcke
+                     for __ in geschichte.alle_zeilen(block.zeilen))
+    dauer = (time.perf_counter() - start_zeit) / runden
+    print(f"{BLÖCKE} Blöcke, {zeilen} Zeilen:  {speicher / 2**20:6.2f} MiB   "
+          f"alle Zeilen durchgehen {dauer * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Misst, wie lange Speichern und Laden eines Spielstands mit JSON dauern.
+
+Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.spielstand
+"""
+import json
+import timeit
+
+from xwatc_zwei import LEVELS, loader
+from xwatc_zwei.verteiler import Spielzustand
+
+
+def main() -> None:
+    verteiler = loader.load_verteiler(LEVELS / "verteiler.json", workers=1)
+    zustand = Spielzustand.from_verteiler(verteiler, seed=0)
+    zustand.run("")
+    text = json.dumps(zustand.speichern())
+    anzahl = 2000
+    speichern = timeit.timeit(lambda: json.dumps(zustand.speichern()), number=anzahl)
+    laden = timeit.timeit(lambda: Spielzustand.laden(json.loads(text), verteiler),
+                          number=anzahl)
+    print(f"Größe:      {len(text)} Bytes")
+    print(f"Speichern:  {speichern / anzahl * 1e6:.1f} µs")
+    print(f"Laden:      {laden / anzahl * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
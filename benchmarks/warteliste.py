@@ -0,0 +1,64 @@
+"""Vergleicht die Warteliste des Verteilers (heapq) mit einer queue.PriorityQueue.
+
+Es werden zehntausende Geschichten für zufällige Zeiten eingereiht und dann alle wieder
+herausgeholt. Aufruf aus dem Hauptordner::
+
+    python -m benchmarks.warteliste
+"""
+import heapq
+from queue import PriorityQueue
+import random
+import time
+
+from xwatc_zwei import geschichte
+from xwatc_zwei.verteiler import (Geschichte, Geschichtsblock, Situation, Spielzustand,
+                                  Verteiler)
+
+
+def _einträge(anzahl: int) -> list[tuple[int, str, str]]:
+    rng = random.Random(0)
+    return [(rng.randrange(anzahl), "", f"g{rng.randrange(100)}") for __ in range(anzahl)]
+
+
+def _priority_queue(einträge: list[tuple[int, str, str]]) -> None:
+    warteliste: PriorityQueue[tuple[int, str, str]] = PriorityQueue()
+    for eintrag in einträge:
+        warteliste.put(eintrag)
+    while not warteliste.empty():
+        warteliste.get()
+
+
+def _heap(einträge: list[tuple[int, str, str]]) -> None:
+    warteliste: list[tuple[int, str, str]] = []
+    for eintrag in einträge:
+        heapq.heappush(warteliste, eintrag)
+    while warteliste:
+        heapq.heappop(warteliste)
+
+
+def _verteiler(einträge: list[tuple[int, str, str]]) -> None:
+    geschichten = [Geschichte([Geschichtsblock("a", [geschichte.Text(str(i))])], f"g{i}")
+                   for i in range(100)]
+    situation = Situation("s", geschichten)
+    verteiler = Verteiler([situation], situation)
+    zustand = Spielzustand(verteiler)
+    for zeit, __, pfad in einträge:
+        verteiler.reihe_ein(pfad, zeit)
+    for __ in einträge:
+        verteiler.nächste_geschichte(zustand)
+
+
+def main() -> None:
+    for anzahl in (10_000, 50_000):
+        einträge = _einträge(anzahl)
+        zeiten = []
+        for funktion in (_priority_queue, _heap, _verteiler):
+            start = time.perf_counter()
+            funktion(einträge)
+            zeiten.append((time.perf_counter() - start) * 1000)
+        print(f"{anzahl:>6} Einträge:  PriorityQueue {zeiten[0]:7.1f} ms   "
+              f"heapq {zeiten[1]:7.1f} ms   Verteiler {zeiten[2]:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
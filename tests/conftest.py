@@ -0,0 +1,13 @@
+"""Gemeinsame Einstellungen für alle Tests."""
+from unittest import mock
+
+import pytest
+
+from xwatc_zwei import loader
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _cache_in_tmp(tmp_path_factory: pytest.TempPathFactory):
+    """Der Cache der Geschichten kommt in ein temporäres Verzeichnis statt nach level/."""
+    with mock.patch.object(loader, "CACHE_PATH", tmp_path_factory.mktemp("cache")):
+        yield
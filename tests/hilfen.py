@@ -0,0 +1,8 @@
+"""Hilfsfunktionen, die sich mehrere Tests teilen."""
+from xwatc_zwei import geschichte, loader
+
+
+def wahl(id: str, *zeilen: geschichte.Zeile, bedingung: str = "") -> geschichte.Wahlmöglichkeit:
+    """Eine Wahlmöglichkeit mit gleicher Id und Text, die Bedingung wird geparst."""
+    return geschichte.Wahlmöglichkeit(id, id, list(zeilen),
+                                      loader.parse_bedingung(bedingung) if bedingung else None)
@@ -0,0 +1,98 @@
+from pathlib import Path
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from xwatc_zwei import LEVELS, loader, simulation
+from xwatc_zwei.abdeckung import Abdeckung, _bereiche
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Spielzustand
+
+_GESCHICHTE = textwrap.dedent("""\
+    /start/ Hallo
+    /Noch ein Satz,
+    /über zwei Zeilen.
+    # Kommentar
+    <.nie>
+        /Nie
+    <>
+        /Immer
+    :weiter: Weiter
+        >ende
+    :anders<.nie>: Anders
+        /Nie gewählt
+    /ende/
+    + gold 3
+    /Ende.
+    """)
+
+
+class TestAbdeckung(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp(dir=LEVELS))
+        self.datei = self.tmp / "abdeckung.cfg"
+        self.datei.write_text(_GESCHICHTE, encoding="utf-8")
+
+    def tearDown(self) -> None:
+        self.datei.unlink()
+        self.tmp.rmdir()
+
+    def test_quelle(self) -> None:
+        for parser in ("pyparsing", "zeilen"):
+            with self.subTest(parser=parser):
+                start, ende = loader.load_geschichte(self.datei, cache=False,
+                                                     parser=parser).module
+                self.assertEqual(start.quelle, {
+                    (): (1, 1), (0,): (1, 3), (1,): (5, 5), (1, 0): (5, 5), (1, 0, 0): (6, 6),
+                    (1, 1): (7, 7), (1, 1, 0): (8, 8), (2,): (9, 9), (2, 0): (9, 9),
+                    (2, 0, 0): (10, 10), (2, 1): (11, 11), (2, 1, 0): (12, 12)})
+                self.assertEqual(ende.quelle, {(): (13, 13), (0,): (14, 14), (1,): (15, 15)})
+
+    def test_abdeckung(self) -> None:
+        geschichte = loader.load_geschichte(self.datei, cache=False)
+        zustand = Spielzustand.aus_geschichte(geschichte)
+        abdeckung = zustand.protokoll = Abdeckung()
+        zustand.run("")
+        datei = abdeckung.datei(geschichte.pfad)
+        self.assertEqual(datei.nicht_erreicht, [6, 10, 12, 13, 14, 15])
+        zustand.run("weiter")
+        datei = abdeckung.datei(geschichte.pfad)
+        self.assertEqual(datei.datei, self.datei)
+        self.assertEqual(datei.nicht_erreicht, [6, 12])
+        self.assertAlmostEqual(datei.anteil, 12 / 14)
+        self.assertIn(("ende", ()), abdeckung.erreicht(geschichte.pfad))
+        bericht = abdeckung.bericht(quelltext=True)
+        self.assertIn("nicht erreicht: 6, 12", bericht)
+        self.assertIn("12 !     /Nie gewählt", bericht)
+
+    def test_nur_befehle(self) -> None:
+        geschichte = loader.load_geschichte(self.datei, cache=False)
+        zustand = Spielzustand.aus_geschichte(geschichte)
+        abdeckung = zustand.protokoll = Abdeckung()
+        with mock.patch.object(Abdeckung, "bedingung") as bedingung, \
+                mock.patch.object(Abdeckung, "sprung") as sprung, \
+                mock.patch.object(Abdeckung, "zug") as zug:
+            zustand.run("")
+            zustand.run("weiter")
+            for __ in zustand.strom(""):
+                pass
+        for gemeldet in (bedingung, sprung, zug):
+            gemeldet.assert_not_called()
+        self.assertTrue(abdeckung.befehle[geschichte.pfad])
+        ohne_datei = Geschichte([Geschichtsblock("a", [])], "ohne")
+        abdeckung.kenne(ohne_datei)
+        self.assertIsNone(abdeckung.datei("ohne").datei)
+
+    def test_simulation(self) -> None:
+        pilzfee = loader.load_geschichte(LEVELS / "Die_Pilzfee.cfg")
+        seriell = simulation.simuliere(pilzfee, 100, abdeckung=True)
+        parallel = simulation.simuliere(pilzfee, 100, prozesse=2, abdeckung=True)
+        assert seriell.abdeckung and parallel.abdeckung
+        self.assertEqual(seriell.abdeckung.befehle, parallel.abdeckung.befehle)
+        self.assertGreater(seriell.abdeckung.datei("Die_Pilzfee").anteil, .5)
+        self.assertIsNone(simulation.simuliere(pilzfee, 1).abdeckung)
+
+    def test_bereiche(self) -> None:
+        self.assertEqual(_bereiche([1, 2, 3, 5, 7, 8]), "1-3, 5, 7-8")
+        self.assertEqual(_bereiche([]), "")
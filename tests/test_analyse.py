@@ -0,0 +1,75 @@
+import unittest
+
+from xwatc_zwei import LEVELS, analyse, geschichte, loader
+from xwatc_zwei.analyse import Art, Befund
+from xwatc_zwei.geschichte import Sonderziel
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock
+
+from hilfen import wahl
+
+
+class TestAnalyse(unittest.TestCase):
+
+    def test_ortsname(self) -> None:
+        self.assertEqual(analyse.ortsname("a", (0,)), "a.1")
+        self.assertEqual(analyse.ortsname("a", (1, 1, 0)), "a.2B.1")
+        self.assertEqual(analyse.ortsname("a", (3, 0, 2, 2, 5)), "a.4A.3C.6")
+
+    def test_sprünge_und_erreichbarkeit(self) -> None:
+        befunde = analyse.analysiere_geschichte(Geschichte([
+            Geschichtsblock("start", [geschichte.Entscheidung([
+                wahl("a", geschichte.Sprung("weiter")),
+                wahl("b", geschichte.Text("b"), geschichte.Sprung("nirgends")),
+            ])]),
+            Geschichtsblock("weiter", [geschichte.Text("Ende")]),
+            Geschichtsblock("vergessen", [geschichte.Sprung("weiter")]),
+        ], "test"))
+        self.assertCountEqual(befunde, [
+            Befund(Art.UNBEKANNTES_ZIEL, "test", "start.1B.2", "nirgends"),
+            Befund(Art.UNERREICHBAR, "test", "vergessen"),
+        ])
+
+    def test_schleifen(self) -> None:
+        befunde = analyse.analysiere_geschichte(Geschichte([
+            Geschichtsblock("start", [
+                geschichte.IfElif([(loader.parse_bedingung("x"), [geschichte.Sprung("warte")])]),
+                geschichte.Entscheidung([wahl("a", geschichte.Sprung(Sonderziel.Self))]),
+            ]),
+            Geschichtsblock("warte", [
+                geschichte.Text("Warte"),
+                geschichte.IfElif([(loader.parse_bedingung("x"), [geschichte.Sprung("warte")])]),
+            ]),
+            Geschichtsblock("endlos", [geschichte.Text("Endlos"), geschichte.Sprung("endlos")]),
+        ], "test"))
+        self.assertCountEqual(befunde, [
+            Befund(Art.UNGESETZT, "test", "start.1", "x"),
+            Befund(Art.SCHLEIFE, "test", "warte.1"),
+            Befund(Art.UNERREICHBAR, "test", "endlos"),
+            Befund(Art.ENDLOSSCHLEIFE, "test", "endlos.1"),
+        ])
+
+    def test_variablen(self) -> None:
+        setzt = Geschichte([Geschichtsblock("a", [
+            geschichte.SetzeVariable(".welt", True),
+            geschichte.SetzeVariable("modul", True),
+            geschichte.IfElif([(loader.parse_bedingung("modul, !_"), [geschichte.Text("ok")])]),
+        ])], "setzt")
+        liest = Geschichte([Geschichtsblock("b", [
+            geschichte.Entscheidung([
+                wahl("a", bedingung=".welt"),
+                wahl("b", bedingung="modul | .fehlt"),
+            ]),
+        ])], "liest")
+        self.assertCountEqual(analyse.analysiere([setzt, liest]), [
+            Befund(Art.UNGESETZT, "liest", "b.1", "modul"),
+            Befund(Art.UNGESETZT, "liest", "b.1", ".fehlt"),
+        ])
+        self.assertEqual(analyse.analysiere_geschichte(liest), [
+            Befund(Art.UNGESETZT, "liest", "b.1", "modul")])
+
+    def test_level(self) -> None:
+        befunde = analyse.analysiere_dateien(sorted(LEVELS.glob("*.cfg")))
+        self.assertIn(Befund(Art.UNGESETZT, "Kurztreffen_Straße", "Verwundeter_Hund.4", "bring"),
+                      befunde)
+        self.assertTrue(all(befund.art == Art.PARSEFEHLER for befund in befunde
+                            if befund.pfad.endswith(".cfg")))
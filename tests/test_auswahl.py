@@ -0,0 +1,86 @@
+from collections import Counter
+import random
+import unittest
+from unittest import mock
+
+from xwatc_zwei import bedingung, loader
+from xwatc_zwei.auswahl import Auswahl, Fenwick
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Spielzustand
+
+
+def _zustand() -> Spielzustand:
+    return Spielzustand.aus_geschichte(Geschichte([Geschichtsblock("a", [])]))
+
+
+class TestFenwick(unittest.TestCase):
+
+    def test_finde(self) -> None:
+        gewichte = [3, 0, 1, 5, 0, 2, 7]
+        baum = Fenwick(gewichte)
+        self.assertEqual(baum.summe, 18)
+        erwartet = [i for i, gewicht in enumerate(gewichte) for __ in range(gewicht)]
+        self.assertEqual([baum.finde(ziel) for ziel in range(18)], erwartet)
+        with self.assertRaises(IndexError):
+            baum.finde(18)
+
+    def test_ändern(self) -> None:
+        rng = random.Random(3)
+        gewichte = [rng.randrange(5) for __ in range(37)]
+        baum = Fenwick(gewichte)
+        for __ in range(200):
+            i = rng.randrange(len(gewichte))
+            gewichte[i] = baum[i] = rng.randrange(5)
+            self.assertEqual(baum.summe, sum(gewichte))
+            ziel = rng.randrange(sum(gewichte))
+            self.assertEqual(baum.finde(ziel), next(
+                j for j in range(len(gewichte)) if sum(gewichte[:j + 1]) > ziel))
+
+
+class TestAuswahl(unittest.TestCase):
+
+    def test_gelesen(self) -> None:
+        self.assertEqual(bedingung.gelesen(loader.parse_bedingung(".tag, !stark(5) | f(magie)")),
+                         {"welt:tag", "wert:stark", "fähigkeit:magie"})
+        self.assertIsNone(bedingung.gelesen(loader.parse_bedingung(".tag, glück(5)")))
+        self.assertIsNone(bedingung.gelesen(loader.parse_bedingung("modul")))
+
+    def test_nur_geänderte(self) -> None:
+        auswahl = Auswahl([1, 2, 3, 4], [
+            None, loader.parse_bedingung(".tag"), loader.parse_bedingung("stark(12) | .tag"),
+            loader.parse_bedingung("glück(50)")])
+        zustand = _zustand()
+        self.assertEqual(auswahl.aktualisiere(zustand), {1, 2, 3})
+        self.assertEqual(auswahl.aktualisiere(zustand), {3})
+        zustand.assert_get_welt().setze_variable("tag", True)
+        self.assertEqual(auswahl.aktualisiere(zustand), {1, 2, 3})
+        zustand.assert_get_mänx()._werte["stark"] = 12
+        self.assertEqual(auswahl.aktualisiere(zustand), {2, 3})
+        with self.assertRaises(ValueError):
+            Auswahl([1], [None, None])
+
+    def test_nur_geschriebene_lesen(self) -> None:
+        auswahl = Auswahl([1, 1, 1], [loader.parse_bedingung(".a"), loader.parse_bedingung(".b"),
+                                      loader.parse_bedingung("stark(12)")])
+        zustand = _zustand()
+        auswahl.aktualisiere(zustand)
+        with mock.patch.object(bedingung, "lies", wraps=bedingung.lies) as lies:
+            self.assertEqual(auswahl.aktualisiere(zustand), set())
+            lies.assert_not_called()
+            zustand.assert_get_welt().setze_variable("a", True)
+            self.assertEqual(auswahl.aktualisiere(zustand), {0})
+            self.assertEqual([aufruf.args[1] for aufruf in lies.call_args_list], ["welt:a"])
+            # Ein anderer Spielzustand hat ein eigenes Journal, also wird alles gelesen.
+            lies.reset_mock()
+            self.assertEqual(auswahl.aktualisiere(zustand.fork()), set())
+            self.assertEqual(lies.call_count, 3)
+
+    def test_verteilung(self) -> None:
+        auswahl = Auswahl([1, 3, 100], [None, None, loader.parse_bedingung(".nie")])
+        zustand = _zustand()
+        rng = random.Random(0)
+        zahlen = Counter(auswahl.ziehe(zustand, rng) for __ in range(4000))
+        self.assertEqual(zahlen.keys(), {0, 1})
+        self.assertAlmostEqual(zahlen[1] / 4000, .75, delta=.03)
+        auswahl = Auswahl([1], [loader.parse_bedingung(".nie")])
+        with self.assertRaises(ValueError):
+            auswahl.ziehe(zustand, rng)
@@ -0,0 +1,120 @@
+import unittest
+
+from xwatc_zwei import LEVELS, erkundung, geschichte, loader, simulation
+from xwatc_zwei.analyse import Art, Befund
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock
+
+from hilfen import wahl
+
+
+def _fall(bedingung: str, *zeilen: geschichte.Zeile
+          ) -> tuple[geschichte.Bedingung | None, list[geschichte.Zeile]]:
+    return (loader.parse_bedingung(bedingung) if bedingung else None), list(zeilen)
+
+
+class TestErkundung(unittest.TestCase):
+
+    def test_wahrscheinlichkeiten(self) -> None:
+        ergebnis = erkundung.erkunde(Geschichte([
+            Geschichtsblock("start", [geschichte.Entscheidung([
+                wahl("a", geschichte.IfElif([
+                    _fall("glück(50)", geschichte.Sprung("gut")),
+                    _fall("", geschichte.Sprung("schlecht")),
+                ])),
+                wahl("b", geschichte.Sprung("gut")),
+                wahl("c", bedingung="glück(20)"),
+            ])]),
+            Geschichtsblock("gut", [geschichte.Text("Gut")]),
+            Geschichtsblock("schlecht", [geschichte.Treffen("kampf", ["Wolf"])]),
+        ], "test"))
+        # c ist in 20% frei, dann wird unter drei Wahlen gewählt, sonst unter zwei.
+        a = .2 / 3 + .8 / 2
+        self.assertEqual(ergebnis.ausgänge.keys(), {
+            ("ende", "test", "gut"), ("treffen", "test", "schlecht"), ("ende", "test", "start")})
+        self.assertAlmostEqual(ergebnis.ausgänge["ende", "test", "gut"], a / 2 + a)
+        self.assertAlmostEqual(ergebnis.ausgänge["treffen", "test", "schlecht"], a / 2)
+        self.assertAlmostEqual(ergebnis.ausgänge["ende", "test", "start"], .2 / 3)
+        self.assertEqual(ergebnis.nie_genommen, [])
+
+    def test_schleife_und_sackgasse(self) -> None:
+        ergebnis = erkundung.erkunde(Geschichte([Geschichtsblock("start", [
+            geschichte.Entscheidung([
+                wahl("nochmal", geschichte.Sprung(geschichte.Sonderziel.Self)),
+                wahl("weiter", geschichte.SetzeVariable(".weiter", True)),
+            ]),
+            geschichte.Entscheidung([wahl("glück", bedingung="glück(25)")]),
+        ])]))
+        self.assertAlmostEqual(ergebnis.ausgänge["ende", "", "start"], .25)
+        self.assertAlmostEqual(ergebnis.ausgänge["sackgasse", "", "start"], .75)
+        self.assertNotIn(("schleife", "", ""), ergebnis.ausgänge)
+
+    def test_endlos(self) -> None:
+        ergebnis = erkundung.erkunde(Geschichte([Geschichtsblock("start", [
+            geschichte.Text("Endlos"), geschichte.Sprung("start")])]), max_schritte=100)
+        self.assertEqual(ergebnis.ausgänge, {("schleife", "", "start"): 1.})
+
+    def test_zusammenlegen(self) -> None:
+        zeilen: list[geschichte.Zeile] = []
+        for i in range(10):
+            zeilen.append(geschichte.Entscheidung([
+                wahl("links", geschichte.Text("Links")),
+                wahl("rechts", geschichte.Text("Rechts"))]))
+        zeilen.append(geschichte.IfElif([_fall("glück(10)", geschichte.Sprung("ende"))]))
+        g = Geschichte([Geschichtsblock("start", zeilen), Geschichtsblock("ende", [])])
+        zusammen = erkundung.erkunde(g)
+        einzeln = erkundung.erkunde(g, zusammenlegen=False)
+        self.assertLess(zusammen.zustände, 50)
+        self.assertGreater(einzeln.zustände, 2 ** 10)
+        self.assertGreater(zusammen.zusammengelegt, 0)
+        self.assertEqual(einzeln.zusammengelegt, 0)
+        for ergebnis in (zusammen, einzeln):
+            self.assertAlmostEqual(ergebnis.ausgänge["ende", "", "ende"], .1)
+            self.assertAlmostEqual(ergebnis.ausgänge["ende", "", "start"], .9)
+
+    def test_abbruch(self) -> None:
+        ergebnis = erkundung.erkunde(
+            loader.load_geschichte(LEVELS / "Kurztreffen_Straße.cfg"), max_zustände=2)
+        self.assertIn("abbruch", {art for art, __, __ in ergebnis.ausgänge})
+        self.assertAlmostEqual(sum(ergebnis.ausgänge.values()), 1)
+
+    def test_nie_genommen(self) -> None:
+        g = Geschichte([Geschichtsblock("start", [
+            geschichte.IfElif([
+                _fall("!hat(speer)", geschichte.Text("Nichts")),
+                _fall("stark(5)", geschichte.Text("Stark")),
+                _fall("", geschichte.Text("Sonst")),
+            ]),
+            geschichte.Entscheidung([
+                wahl("a"), wahl("b", bedingung="stark(70)"),
+                wahl("c", bedingung="wurf(flink, 30)"), wahl("d", bedingung="f(magie)")]),
+        ])], "test")
+        self.assertEqual(erkundung.erkunde(g).nie_genommen, [
+            Befund(Art.NIE_GENOMMEN, "test", "start.1B"),
+            Befund(Art.NIE_GENOMMEN, "test", "start.1C", "sonst"),
+            Befund(Art.NIE_GENOMMEN, "test", "start.2B", "b"),
+            Befund(Art.NIE_GENOMMEN, "test", "start.2C", "c"),
+            Befund(Art.NIE_GENOMMEN, "test", "start.2D", "d"),
+        ])
+        bereiche = {"stark": (1, 100), "flink": (1, 100)}
+        self.assertEqual(erkundung.erkunde(g, bereiche=bereiche).nie_genommen[2:], [
+            Befund(Art.NIE_GENOMMEN, "test", "start.2D", "d"),
+        ])
+        with self.assertRaises(ValueError):
+            erkundung.erkunde(g, bereiche={"stärke": (1, 2)})
+
+    def test_wie_simulation(self) -> None:
+        pilzfee = loader.load_geschichte(LEVELS / "Die_Pilzfee.cfg")
+        ergebnis = erkundung.erkunde(pilzfee)
+        statistik = simulation.simuliere(pilzfee, 2000, seed=1)
+        self.assertEqual(ergebnis.ausgänge.keys(), statistik.ausgänge.keys())
+        for ausgang, wkeit in ergebnis.ausgänge.items():
+            self.assertAlmostEqual(statistik.ausgänge[ausgang] / 2000, wkeit, delta=.04)
+        self.assertIn("Ausgänge:", ergebnis.bericht())
+
+    def test_verteile(self) -> None:
+        anteile, sackgasse = erkundung._verteile([1., .5, 0.])
+        self.assertEqual(anteile, [.75, .25, 0.])
+        self.assertEqual(sackgasse, 0.)
+        anteile, sackgasse = erkundung._verteile([.5, .5])
+        self.assertEqual(anteile, [.375, .375])
+        self.assertEqual(sackgasse, .25)
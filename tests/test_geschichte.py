@@ -1,9 +1,16 @@
 
+import json
+import pickle
+import threading
+import time
 import unittest
+from unittest import mock
 
 from pyparsing import ParseBaseException
-from xwatc_zwei import LEVELS, geschichte, loader
+from xwatc_zwei import LEVELS, geschichte, loader, zeilenparser
 from xwatc_zwei import verteiler
+from xwatc_zwei.programm import Op
+from xwatc_zwei.protokoll import Protokoll
 from xwatc_zwei.verteiler import Geschichtsblock, Spielzustand, VarTypError, Geschichte
 
 
@@ -24,6 +31,137 @@ class TestVerteiler(unittest.TestCase):
         with self.assertRaises(KeyError):
             vert.block_by_id("A")
 
+    def test_sprungziele(self) -> None:
+        vert = Geschichte([
+            Geschichtsblock("a", [geschichte.IfElif([(None, [geschichte.Sprung("b")])])]),
+            Geschichtsblock("b", [geschichte.Text("b"), geschichte.Sprung("a")]),
+            Geschichtsblock("c", [geschichte.Sprung(geschichte.Sonderziel.Self)]),
+            Geschichtsblock("d", [geschichte.Sprung("nirgends")]),
+        ])
+        self.assertEqual(vert.index.keys(), {"a", "b", "c", "d"})
+        with self.assertRaises(TypeError):
+            vert.index["e"] = vert.module[0]  # type: ignore
+
+    def test_verweise_laden(self) -> None:
+        geladen = []
+
+        def lader(datei):
+            geladen.append(datei)
+            return Geschichte([Geschichtsblock("a", [geschichte.Text(datei)])], datei)
+
+        situation = verteiler.Situation("s", [verteiler.Geschichtsverweis("x", "x.cfg")])
+        vert = verteiler.Verteiler([situation], situation, lader=lader)
+        self.assertEqual(geladen, [])
+        self.assertEqual(vert.geschichte_by_id("x").pfad, "x.cfg")
+        self.assertIs(vert.nächste_geschichte(Spielzustand(vert)), vert.geschichte_by_id("x"))
+        self.assertEqual(geladen, ["x.cfg"])
+        with self.assertRaises(KeyError):
+            vert.geschichte_by_id("y")
+
+    def test_laden_parallel(self) -> None:
+        x_läuft, x_weiter = threading.Event(), threading.Event()
+
+        def lader(datei):
+            if datei == "x.cfg":
+                x_läuft.set()
+                x_weiter.wait(5)
+            return Geschichte([Geschichtsblock("a", [geschichte.Text(datei)])], datei)
+
+        situation = verteiler.Situation("s", [
+            verteiler.Geschichtsverweis("x", "x.cfg"), verteiler.Geschichtsverweis("y", "y.cfg")])
+        vert = verteiler.Verteiler([situation], situation, lader=lader)
+        thread = threading.Thread(target=vert.geschichte_by_id, args=("x",))
+        thread.start()
+        self.assertTrue(x_läuft.wait(5))
+        try:
+            # y lädt, während x noch lädt.
+            self.assertEqual(vert.geschichte_by_id("y").pfad, "y.cfg")
+            self.assertTrue(thread.is_alive())
+        finally:
+            x_weiter.set()
+            thread.join()
+        self.assertEqual(vert.geschichte_by_id("x").pfad, "x.cfg")
+
+    def test_ersetzen_beim_vorladen(self) -> None:
+        x_läuft, x_weiter = threading.Event(), threading.Event()
+
+        def lader(datei):
+            x_läuft.set()
+            x_weiter.wait(5)
+            return Geschichte([Geschichtsblock("a", [geschichte.Text("alt")])], "x")
+
+        situation = verteiler.Situation("s", [verteiler.Geschichtsverweis("x", "x.cfg")])
+        vert = verteiler.Verteiler([situation], situation, lader=lader, vorladen=True)
+        assert vert._vorlade_thread
+        self.assertTrue(x_läuft.wait(5))
+        neu = Geschichte([Geschichtsblock("a", [geschichte.Text("neu")])], "x")
+        ersetzen = threading.Thread(target=vert.ersetze_geschichte, args=(neu,))
+        ersetzen.start()
+        ersetzen.join(0.1)
+        # Das Vorladen liest noch die alte Datei und darf die neue nicht überschreiben.
+        x_weiter.set()
+        vert._vorlade_thread.join()
+        ersetzen.join()
+        self.assertIs(vert.geschichte_by_id("x"), neu)
+
+    def test_vorladen(self) -> None:
+        geladen = []
+
+        def lader(datei):
+            geladen.append(datei)
+            return Geschichte([Geschichtsblock("a", [geschichte.Text(datei)])], datei)
+
+        situation = verteiler.Situation("s", [
+            verteiler.Geschichtsverweis("x", "x.cfg"), verteiler.Geschichtsverweis("y", "y.cfg")])
+        vert = verteiler.Verteiler([situation], situation, lader=lader, vorladen=True)
+        assert vert._vorlade_thread
+        vert._vorlade_thread.join()
+        self.assertEqual(geladen, ["x.cfg", "y.cfg"])
+        vert.geschichte_by_id("y")
+        self.assertEqual(geladen, ["x.cfg", "y.cfg"])
+
+    def test_warteliste(self) -> None:
+        a, b, c, d = (Geschichte([Geschichtsblock("a", [geschichte.Text(name)])], name)
+                      for name in "abcd")
+        s = verteiler.Situation("s", [a, b])
+        vert = verteiler.Verteiler([s, verteiler.Situation("t", [c])], s, starter=[d])
+        zustand = Spielzustand(vert)
+        vert.reihe_ein("c", zeit=4, situation="t")
+        vert.reihe_ein("b")
+        with self.assertRaises(KeyError):
+            vert.reihe_ein("e")
+        with self.assertRaises(KeyError):
+            vert.reihe_ein("a", situation="u")
+        kopie = vert.fork()
+        self.assertEqual(vert.speichern(), {"zeit": 1, "situation": "s", "warteliste": [
+            [1, "", "b"], [1, "", "d"], [4, "t", "c"]]})
+        self.assertIs(vert.nächste_geschichte(zustand), b)
+        self.assertIs(vert.nächste_geschichte(zustand), d)
+        self.assertIn(vert.nächste_geschichte(zustand), (a, b))
+        self.assertIs(vert.nächste_geschichte(zustand), c)
+        self.assertIs(vert.nächste_geschichte(zustand), c)
+        self.assertEqual(vert.speichern(), {"zeit": 6, "situation": "t", "warteliste": []})
+        self.assertEqual(kopie.speichern()["zeit"], 1)
+        kopie.nächste_geschichte(zustand)
+        vert.laden(kopie.speichern())
+        self.assertEqual(vert.speichern(), {"zeit": 2, "situation": "s", "warteliste": [
+            [1, "", "d"], [4, "t", "c"]]})
+
+    def test_fork_ersetzen(self) -> None:
+        a, b = (Geschichte([Geschichtsblock("a", [geschichte.Text(name)])], name)
+                for name in "ab")
+        s = verteiler.Situation("s", [a, b])
+        vert = verteiler.Verteiler([s], s)
+        kopie = vert.fork()
+        neu = Geschichte([Geschichtsblock("a", [geschichte.Text("neu")])], "a")
+        kopie.ersetze_geschichte(neu)
+        self.assertIs(kopie.geschichte_by_id("a"), neu)
+        self.assertIs(kopie._situation.geschichten[0], neu)
+        self.assertIs(kopie.situation_by_id("s"), kopie._situation)
+        self.assertIs(vert.geschichte_by_id("a"), a)
+        self.assertIs(vert._situation, s)
+        self.assertIs(vert.situation_by_id("s"), s)
+
     def test_disallow_doubled_id(self) -> None:
         with self.assertRaises(ValueError):
             Geschichte([
@@ -60,6 +198,28 @@ TEST_MODUL = Geschichtsblock("test", [
 ])
 
 
+class TestTesteBlock(unittest.TestCase):
+
+    def test_argumente(self) -> None:
+        ifelif = geschichte.IfElif([
+            (loader.parse_bedingung("x"), [geschichte.Text("x")]),
+            (loader.parse_bedingung("x, f(fliegen)"), [geschichte.Text("fliegen")]),
+        ])
+        geschichte.teste_block([ifelif], "test")
+        bed = ifelif.fälle[1][0]
+        assert isinstance(bed, geschichte.UndBedingung)
+        fähig = bed.bedingungen[1]
+        assert isinstance(fähig, geschichte.FuncBedingung)
+        self.assertEqual(fähig.geprüfte_args, ("fliegen", None))
+
+    def test_falsche_argumente(self) -> None:
+        for bed_str in ("f(fliegen, 1, 2)", "f(1)", "schlau(a)", "wurf(schlau)", "!(hat(1))"):
+            with self.subTest(bed_str), self.assertRaises(VarTypError) as cm:
+                geschichte.teste_block([geschichte.Text("a"), geschichte.IfElif([
+                    (loader.parse_bedingung(bed_str), [geschichte.Text("x")])])], "test")
+            self.assertIn("test.2A", str(cm.exception))
+
+
 class TestGModul(unittest.TestCase):
 
     def test_getitem(self) -> None:
@@ -75,6 +235,79 @@ class TestGModul(unittest.TestCase):
         with self.assertRaises(IndexError):
             modul[0, 5, 0]
 
+    def test_unveränderlich(self) -> None:
+        a, b = (zeilenparser.parse_geschichte("/a/\n:weiter: Weiter\n  > a\n<x> /X\n")[0]
+                for __ in range(2))
+        self.assertIsInstance(a.zeilen, tuple)
+        entscheidung = a[0]
+        assert isinstance(entscheidung, geschichte.Entscheidung)
+        self.assertIsInstance(entscheidung.wahlen, tuple)
+        self.assertIs(entscheidung.blocks, entscheidung.blocks)
+        self.assertIs(entscheidung.blocks[0], entscheidung.wahlen[0].block)
+        with self.assertRaises(AttributeError):
+            entscheidung.wahlen = ()  # type: ignore
+        # Gleiche Ids und Positionen liegen nur einmal im Speicher.
+        wahl_b = b[0].wahlen[0]  # type: ignore
+        self.assertIs(entscheidung.wahlen[0].id, wahl_b.id)
+        self.assertIs(a[1].fälle[0][0].variable, b[1].fälle[0][0].variable)  # type: ignore
+        # Positionen und Zeilen werden innerhalb einer Datei geteilt, nicht darüber hinaus.
+        c, d = zeilenparser.parse_geschichte("/c/\n:w: W\n  /W\n/d/\n:w: W\n  /W\n")
+        schlüssel_d = {pos: pos for pos in d.quelle}
+        self.assertIs(schlüssel_d[0, 0], next(pos for pos in c.quelle if pos == (0, 0)))
+        self.assertIsNot(next(pos for pos in a.quelle if pos == (0, 0)),
+                         next(pos for pos in b.quelle if pos == (0, 0)))
+
+
+class TestProgramm(unittest.TestCase):
+
+    def test_übersetze(self) -> None:
+        programm = Geschichte([TEST_MODUL]).programm
+        self.assertListEqual([befehl.op for befehl in programm.befehle], [
+            Op.AUSGABE, Op.WENN, Op.AUSGABE, Op.WAHL, Op.AUSGABE, Op.WAHL, Op.AUSGABE,
+            Op.GEHE, Op.GEHE, Op.AUSGABE, Op.AUSGABE, Op.GEHE, Op.AUSGABE, Op.ENDE])
+        wenn = programm.befehle[1]
+        self.assertEqual(wenn.ziel, 3)
+        self.assertEqual(programm.befehle[3].ziele, (4, 12))
+        self.assertEqual(programm.befehle[5].ziele, (6, 9))
+        self.assertEqual(programm.befehle[7].ziel, 0)
+        self.assertEqual(programm.befehle[11].ziel, 13)
+        for pc, pos in enumerate(programm.positionen):
+            if programm.befehle[pc].zeile is not None:
+                self.assertIs(TEST_MODUL[pos], programm.befehle[pc].zeile)
+        self.assertEqual(programm.pc_von("test", (2, 0, 1, 0, 1)), 7)
+        self.assertEqual(programm.pc_von("test", (3,)), 13)
+
+    def test_sonst(self) -> None:
+        programm = Geschichte([Geschichtsblock("a", [
+            geschichte.IfElif(fälle=[
+                (loader.parse_bedingung("x"), [geschichte.Text("x")]),
+                (None, [geschichte.Text("sonst")]),
+            ]),
+            geschichte.Text("danach"),
+        ])]).programm
+        self.assertListEqual([befehl.op for befehl in programm.befehle], [
+            Op.WENN, Op.AUSGABE, Op.GEHE, Op.AUSGABE, Op.AUSGABE, Op.ENDE])
+        self.assertEqual(programm.befehle[0].ziel, 3)
+        self.assertEqual(programm.befehle[2].ziel, 4)
+
+    def test_unbekanntes_ziel(self) -> None:
+        geschichte_ = Geschichte([Geschichtsblock("a", [geschichte.Sprung("b")])])
+        self.assertIs(geschichte_.programm.befehle[0].op, Op.UNBEKANNT)
+        zustand = Spielzustand.aus_geschichte(geschichte_)
+        with self.assertRaises(KeyError):
+            zustand.run("")
+
+    def test_schleife(self) -> None:
+        programm = Geschichte([TEST_MODUL, Geschichtsblock("a", [
+            geschichte.Text("a"), geschichte.Sprung("b")]), Geschichtsblock("b", [
+            geschichte.IfElif(fälle=[(loader.parse_bedingung("x"), [geschichte.Sprung("a")])]),
+        ])]).programm
+        # Die Schleife über die Wahl in TEST_MODUL wartet auf Eingabe.
+        self.assertEqual(programm.schleife(7), [])
+        a = programm.starts["a"]
+        self.assertEqual([programm.blöcke[pc].id for pc in programm.schleife(a)],
+                         ["a", "a", "b", "b"])
+
 
 class TestSpielzustand(unittest.TestCase):
 
@@ -93,6 +326,97 @@ class TestSpielzustand(unittest.TestCase):
         outputs, input = zustand.run("b")
         self.assertEqual(outputs[0], geschichte.Text("Hallo Alter!"))
 
+    def test_strom(self) -> None:
+        geschichte_ = Geschichte([TEST_MODUL])
+        zustand = Spielzustand.aus_geschichte(geschichte_)
+        protokolliert = Spielzustand.aus_geschichte(geschichte_)
+        protokolliert.protokoll = Protokoll()
+        for eingabe in ["", "a", "w", ""]:
+            kopie = zustand.fork()
+            erwartet = zustand.run(eingabe)
+            for z in (kopie, protokolliert):
+                *outputs, input = z.strom(eingabe)
+                self.assertEqual((outputs, input), (list(erwartet[0]), erwartet[1]))
+        self.assertEqual(protokolliert.ende, zustand.ende)
+        self.assertEqual(len(protokolliert.protokoll.züge), 4)
+        # Die Ausgaben kommen, bevor der Rest ausgeführt ist.
+        strom = zustand.strom("b")
+        self.assertEqual(next(strom), geschichte.Text("Hallo Alter!"))
+        self.assertIsNotNone(zustand.position)
+        self.assertEqual(next(strom), geschichte.Entscheidung.neue_bestätigung())
+        self.assertIsNone(zustand.position)
+
+    def test_endlosschleife(self) -> None:
+        geschichte_ = Geschichte([
+            Geschichtsblock("start", [geschichte.Text("los"), geschichte.Sprung("a")]),
+            Geschichtsblock("a", [geschichte.Text("a"), geschichte.Sprung("b")]),
+            Geschichtsblock("b", [geschichte.Sprung("a")]),
+        ])
+        zustand = Spielzustand.aus_geschichte(geschichte_)
+        zustand.max_sprünge = 100
+        with self.assertRaisesRegex(verteiler.Endlosschleife, "mehr als 100 Rücksprüngen") as cm:
+            zustand.run("")
+        self.assertEqual(cm.exception.blöcke, ["a", "b"])
+        self.assertEqual((zustand.züge, zustand.sprünge), (1, 101))
+        # Die Geschichte ist beendet, ohne Ausgaben für den nächsten Zug.
+        self.assertIsNone(zustand.position)
+        assert zustand.ende
+        self.assertIn(zustand.ende.block.id, ["a", "b"])
+        self.assertFalse(zustand._outputs)
+        self.assertEqual(next(zustand.strom("")), geschichte.Text("los"))
+        zustand = Spielzustand.aus_geschichte(Geschichte([
+            Geschichtsblock("c", [geschichte.Sprung(geschichte.Sonderziel.Self)])]))
+        zustand.max_dauer = 0.01
+        with self.assertRaisesRegex(verteiler.Endlosschleife, "Schleife über c$"):
+            zustand.fork().strom("").__next__()
+        protokolliert = zustand.fork()
+        protokolliert.protokoll = Protokoll()
+        with self.assertRaises(verteiler.Endlosschleife):
+            protokolliert.run("")
+
+    def test_frist_beim_empfänger(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([Geschichtsblock("c", [
+            geschichte.Text("c"), geschichte.Sprung(geschichte.Sonderziel.Self)])]))
+        zustand.max_dauer = 0.05
+        strom = zustand.strom("")
+        # Langsames Lesen zwischen den Zeilen zählt nicht zur Dauer des Zugs.
+        for i in range(3 * verteiler._ZEIT_PRÜFEN):
+            if i % verteiler._ZEIT_PRÜFEN == 1:
+                time.sleep(0.06)
+            self.assertEqual(next(strom), geschichte.Text("c"))
+
+    def test_zähler(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([TEST_MODUL]))
+        zustand.max_sprünge = 1
+        # Jeder Zug darf einmal zurückspringen.
+        for eingabe in ["", "a", "z", "a", "z"]:
+            zustand.run(eingabe)
+        self.assertEqual((zustand.züge, zustand.sprünge), (5, 2))
+
+    def test_position(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([TEST_MODUL]))
+        zustand.run("")
+        zustand.run("a")
+        assert zustand._position
+        self.assertEqual(zustand._position.pos, (2, 0, 1))
+        self.assertIs(zustand._position.block, TEST_MODUL)
+        # Die Position wird nicht bei jedem Schritt gebaut, sondern steht im Programm.
+        self.assertIs(zustand._position.pos, zustand._position.pos)
+        self.assertIs(zustand._position.aktuelle_zeile(), TEST_MODUL[2, 0, 1])
+        outputs, _input = zustand.run("z")
+        self.assertListEqual(list(outputs), [
+            geschichte.Text("Und du bist wieder zurück"), geschichte.Text("Du bist im Wald")])
+        self.assertEqual(zustand._position.pos, (2,))
+
+    def test_sprung(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([
+            Geschichtsblock("a", [geschichte.Text("a"), geschichte.Sprung("b")]),
+            Geschichtsblock("b", [geschichte.Text("b")]),
+        ]))
+        outputs, input = zustand.run("")
+        self.assertListEqual(list(outputs), [geschichte.Text("a"), geschichte.Text("b")])
+        self.assertEqual(input, geschichte.Entscheidung.neue_bestätigung())
+
     def test_modulvariable_bedingung(self) -> None:
         zustand = Spielzustand.aus_geschichte(Geschichte([TEST_MODUL]))
         zustand._position = verteiler.Weltposition.start(
@@ -138,6 +462,68 @@ class TestSpielzustand(unittest.TestCase):
         with self.assertRaises(VarTypError):
             zustand.eval_bedingung(loader.parse_bedingung("f(fliegen, 0)"))
 
+    def test_übersetzte_bedingung(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([TEST_MODUL]))
+        zustand.assert_get_mänx().set_fähigkeit("fliegen", 3)
+        bed = loader.parse_bedingung("f(fliegen, 2), !(schlau(100) | .x)")
+        test = bed.übersetzt
+        self.assertIs(test, bed.übersetzt)
+        with mock.patch.object(Spielzustand, "teste_funktion") as teste_funktion:
+            self.assertTrue(test(zustand))
+            teste_funktion.assert_not_called()
+        self.assertTrue(pickle.loads(pickle.dumps(test))(zustand))
+        # Fehler kommen erst beim Auswerten
+        falsch = loader.parse_bedingung("f(fliegen, 2, 3)")
+        with self.assertRaises(VarTypError):
+            zustand.eval_bedingung(falsch)
+        with self.assertRaises(VarTypError):
+            zustand.eval_bedingung(loader.parse_bedingung("fliegen(2)"))
+
+    def test_zufall(self) -> None:
+        glück = Geschichte([Geschichtsblock("a", [
+            geschichte.IfElif([
+                (loader.parse_bedingung("glück(50)"), [geschichte.Text("Glück")]),
+                (None, [geschichte.Text("Pech")]),
+            ]),
+            geschichte.Entscheidung([
+                geschichte.Wahlmöglichkeit("n", "Nochmal", [geschichte.Sprung("a")])]),
+        ])])
+
+        def spiele(zustand: Spielzustand, runden: int) -> list:
+            return [zustand.run("n")[0][0] for _ in range(runden)]
+
+        erstes = Spielzustand.aus_geschichte(glück, seed=3)
+        erstes.run("")
+        zweites = Spielzustand.aus_geschichte(glück, seed=3)
+        zweites.run("")
+        ergebnisse = spiele(erstes, 30)
+        self.assertEqual(ergebnisse, spiele(zweites, 30))
+        self.assertEqual(len(set(ergebnisse)), 2)
+        schnappschuss = erstes.zufallszustand()
+        weiter = spiele(erstes, 10)
+        erstes.setze_zufallszustand(schnappschuss)
+        self.assertEqual(spiele(erstes, 10), weiter)
+
+    def test_fork(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([Geschichtsblock("a", [
+            geschichte.Entscheidung([
+                geschichte.Wahlmöglichkeit("x", "X", [geschichte.SetzeVariable("x", True),
+                                                       geschichte.SetzeVariable(".x", 1)]),
+                geschichte.Wahlmöglichkeit("y", "Y", [geschichte.SetzeVariable("y", True)]),
+            ]),
+            geschichte.Entscheidung([geschichte.Wahlmöglichkeit("w", "W", [])]),
+        ])]))
+        zustand.run("")
+        kopie = zustand.fork()
+        zustand.run("x")
+        kopie.run("y")
+        assert zustand.position and kopie.position
+        self.assertEqual(zustand.position.modul_vars, {"x": True, "_": "x"})
+        self.assertEqual(kopie.position.modul_vars, {"y": True, "_": "y"})
+        self.assertEqual(zustand.assert_get_welt().get_variable("x", 0), 1)
+        self.assertEqual(kopie.assert_get_welt().get_variable("x", 0), 0)
+        self.assertEqual(zustand.get_rng().random(), kopie.get_rng().random())
+
     def test_setze_variable(self) -> None:
         zustand = Spielzustand.aus_geschichte(Geschichte([Geschichtsblock("test", [
             geschichte.SetzeVariable("testvar", "blubb"),
@@ -161,3 +547,53 @@ class TestSpielzustand(unittest.TestCase):
         # Was ist das für ein Fehlertyp?
         # with self.assertRaises():
         # geschichte.IfElif(parse_bed("hat()"))
+
+
+class TestSpielstand(unittest.TestCase):
+    GESCHICHTE = Geschichte([Geschichtsblock("a", [
+        geschichte.Text("Start"),
+        geschichte.SetzeVariable("da", True),
+        geschichte.Entscheidung([
+            geschichte.Wahlmöglichkeit("n", "Nochmal", [geschichte.IfElif([
+                (loader.parse_bedingung("glück(50)"), [geschichte.Text("Glück")]),
+                (None, [geschichte.Text("Pech")]),
+            ]), geschichte.Sprung("b")]),
+        ]),
+    ]), Geschichtsblock("b", [geschichte.Entscheidung([
+        geschichte.Wahlmöglichkeit("n", "Nochmal", [geschichte.Sprung("a")])])])], "glück")
+
+    def test_speichern_laden(self) -> None:
+        zustand = Spielzustand.aus_geschichte(self.GESCHICHTE, seed=1)
+        zustand.assert_get_mänx().set_fähigkeit("fliegen", 2)
+        zustand.assert_get_welt().setze_variable("tag", 3)
+        zustand.run("")
+        zustand.run("n")
+        daten = json.loads(json.dumps(zustand.speichern()))
+        geladen = Spielzustand.laden(daten, verteiler.Verteiler.aus_geschichte(self.GESCHICHTE))
+        assert geladen.position and zustand.position
+        self.assertEqual(geladen.position.block.id, "b")
+        self.assertEqual(geladen.position.pc, zustand.position.pc)
+        self.assertEqual(geladen.position.modul_vars, {"da": True, "_": "n"})
+        self.assertEqual(geladen.assert_get_mänx().get_fähigkeit("fliegen"), 2)
+        self.assertEqual(geladen.assert_get_welt().get_variable("tag", 0), 3)
+        for _ in range(10):
+            self.assertEqual(geladen.run("n"), zustand.run("n"))
+
+    def test_zwischen_geschichten(self) -> None:
+        zustand = Spielzustand.aus_geschichte(self.GESCHICHTE)
+        daten = zustand.speichern()
+        self.assertIsNone(daten["position"])
+        geladen = Spielzustand.laden(daten, verteiler.Verteiler.aus_geschichte(self.GESCHICHTE))
+        self.assertEqual(geladen.run("")[0], [geschichte.Text("Start")])
+
+    def test_version(self) -> None:
+        daten = Spielzustand.aus_geschichte(self.GESCHICHTE).speichern()
+        daten["version"] += 1
+        with self.assertRaises(ValueError):
+            Spielzustand.laden(daten, verteiler.Verteiler.aus_geschichte(self.GESCHICHTE))
+
+    def test_ohne_pfad(self) -> None:
+        zustand = Spielzustand.aus_geschichte(Geschichte([TEST_MODUL]))
+        zustand.run("")
+        with self.assertRaises(ValueError):
+            zustand.speichern()
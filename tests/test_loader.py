@@ -1,10 +1,17 @@
 import inspect
+import json
+import os
+import pickle
+from pathlib import Path
+import shutil
+import tempfile
 from typing import Any
 import unittest
+from unittest import mock
 
 import pyparsing
 
-from xwatc_zwei import LEVELS, geschichte, loader, verteiler
+from xwatc_zwei import LEVELS, geschichte, loader, verteiler, zeilenparser
 
 
 def rule_test(rule: pyparsing.ParserElement, text: str) -> pyparsing.ParseResults:
@@ -172,3 +179,380 @@ class TestLoader(unittest.TestCase):
 
     def test_szenario_hund(self):
         loader.load_geschichte(LEVELS / "Kurztreffen_Straße.cfg")
+
+
+class TestZeilenparser(unittest.TestCase):
+    """Der Zeilenparser muss genau das gleiche ergeben wie die pyparsing-Grammatik."""
+
+    def vergleiche(self, text: str) -> None:
+        try:
+            erwartet = loader.GeschichteBody.parse_string(text, parse_all=True).as_list()
+        except pyparsing.ParseBaseException:
+            with self.assertRaises(zeilenparser.ParseFehler):
+                zeilenparser.parse_geschichte(text)
+        else:
+            self.assertEqual(zeilenparser.parse_geschichte(text), erwartet)
+
+    def test_level(self):
+        for datei in sorted(LEVELS.glob("*.cfg")):
+            with self.subTest(datei=datei.name):
+                self.vergleiche(datei.read_text(encoding="utf-8"))
+
+    def test_load_geschichte(self):
+        for datei in ("scenario1.cfg", "Die_Pilzfee.cfg", "Kurztreffen_Straße.cfg"):
+            with self.subTest(datei=datei):
+                self.assertEqual(loader.load_geschichte(datei, cache=False, parser="zeilen"),
+                                 loader.load_geschichte(datei, cache=False))
+
+    def test_beispiele(self):
+        beispiele = [
+            "/faa/ Hier bist du also",
+            "/header/\n/test / und nocheinmal",
+            "/header/\n:entscheidung: Weiter\n    / und auch hier / nochmal",
+            "/erster_block/Muh sagt die Kuh\n>zweiter_block\n/zweiter_block/Doch nicht.",
+            "/a/\n> dort\n> SELF\n>selfish",
+            "/a/\n>hhaga aha",
+            "/a/\n:süd: Süden\n    / Ich will Monster jagen!",
+            "/a/\n:süd<blut>:\n    / Ich will Monster jagen!\n    +fisch",
+            "/a/\n:süd\n    / Ich will Monster jagen!",
+            """/test/
+            <hat(speer)>
+                / Ich steche dich ab!
+                # Kommentar
+                / mit meinem Speer!
+                - Speer
+            <hat(schwert)>
+                + Text 3
+            <>
+                / Ich werde dich irgendwie umbringen!""",
+            """/test/ Du kannst nach Süden.
+            :süd: Süden
+                :nord: Zurück
+                    / You're back!
+                :weiter: Weiter /Du fällst in eine Grube
+            :dings<!f(a, 2)>: Nicht Süden
+                / Ich will nicht mehr!""",
+            "/a/\n<a> /inline\n    /nicht im Block\n<>\n/fängt alles\n/a/x",
+            '/a/\n.a=1\na=-1\na = "ga \\"aber\\" nicht!"\n%kampf(Huhn, -10)',
+            "/a/\na=b",
+            "/a/\n<hat(x>\n  /a",
+            "/a/\n<a b>\n  /a",
+            "/a/\n:a: b\n",
+            "/a/\n+x 5 6",
+        ]
+        for beispiel in beispiele:
+            with self.subTest(beispiel=beispiel):
+                self.vergleiche(inspect.cleandoc(beispiel))
+
+    def test_bedingungen(self):
+        for bed in ["hat(speer)", "", "a", ".a", "!!a", "hat(speer), flink(70), glück(67)",
+                    "hat(speer) | flink(70) | glück(67)", "hat(speer) , flink(70) | !glück(67)",
+                    "(a, b), c | !(d)", "a | b, c | d", "f(fliegen, -1)", "!(a|b), c"]:
+            with self.subTest(bed=bed):
+                self.assertEqual(zeilenparser.parse_bedingung(bed), loader.parse_bedingung(bed))
+        for bed in [". a", "a,", "hat(", "(a", "a b"]:
+            with self.subTest(bed=bed):
+                with self.assertRaises(zeilenparser.ParseFehler):
+                    zeilenparser.parse_bedingung(bed)
+
+class TestCache(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.datei = self.tmp / "scenario1.cfg"
+        shutil.copy(LEVELS / "scenario1.cfg", self.datei)
+        patcher = mock.patch.object(loader, "CACHE_PATH", self.tmp / "cache")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_ohne_parsen(self):
+        erste = loader.load_geschichte(self.datei)
+        with mock.patch.object(loader.GeschichteBody, "parse_file",
+                               side_effect=AssertionError("Nicht geparst")):
+            zweite = loader.load_geschichte(self.datei)
+            with self.assertRaises(AssertionError):
+                loader.load_geschichte(self.datei, cache=False)
+        self.assertEqual(erste, zweite)
+        self.assertEqual(zweite.pfad, erste.pfad)
+
+    def test_cache_veraltet(self):
+        loader.load_geschichte(self.datei)
+        with open(self.datei, "a", encoding="utf-8") as write:
+            write.write("/Neu/ Ein neuer Block\n")
+        stat = self.datei.stat()
+        os.utime(self.datei, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        neu = loader.load_geschichte(self.datei)
+        self.assertEqual(neu.module[-1].id, "Neu")
+        self.assertEqual(loader.load_geschichte(self.datei), neu)
+
+    def test_cache_kaputt(self):
+        erste = loader.load_geschichte(self.datei)
+        for datei in (self.tmp / "cache").iterdir():
+            datei.write_bytes(b"kaputt")
+        self.assertEqual(loader.load_geschichte(self.datei), erste)
+
+    def test_cache_schreibfehler(self):
+        for fehler in [OSError("voll"), pickle.PicklingError("geht nicht"), RecursionError()]:
+            with self.subTest(fehler=fehler):
+                with mock.patch.object(loader.pickle, "dump", side_effect=fehler):
+                    loader.load_geschichte(self.datei)
+                self.assertEqual(list((self.tmp / "cache").iterdir()), [])
+        with mock.patch.object(loader.os, "replace", side_effect=OSError("kaputt")):
+            loader.load_geschichte(self.datei)
+        self.assertEqual(list((self.tmp / "cache").iterdir()), [])
+        loader.load_geschichte(self.datei)
+        self.assertEqual(len(list((self.tmp / "cache").iterdir())), 1)
+
+    def test_grammatik_version(self):
+        loader.load_geschichte(self.datei)
+        with (mock.patch.object(loader, "GRAMMATIK_VERSION", loader.GRAMMATIK_VERSION + 1),
+              mock.patch.object(loader.GeschichteBody, "parse_file",
+                                side_effect=AssertionError("Geparst"))):
+            with self.assertRaises(AssertionError):
+                loader.load_geschichte(self.datei)
+
+
+class TestLoadVerteiler(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def schreibe_verteiler(self, situationen: dict[str, list[str]]) -> Path:
+        datei = self.tmp / "verteiler.json"
+        datei.write_text(json.dumps({
+            "start": next(iter(situationen)),
+            "situationen": [{"id": id, "module": module} for id, module in situationen.items()]
+        }), encoding="utf-8")
+        return datei
+
+    def test_level(self):
+        vert = loader.load_verteiler(LEVELS / "verteiler.json", workers=1)
+        self.assertEqual(vert.geschichte_by_id("scenario1").module[0].id, "Norden")
+
+    def test_lazy(self):
+        with mock.patch.object(loader, "load_geschichte", wraps=loader.load_geschichte) as load:
+            vert = loader.load_verteiler(LEVELS / "verteiler.json", lazy=True)
+            load.assert_not_called()
+            self.assertEqual(vert.geschichte_by_id("scenario1").module[0].id, "Norden")
+            vert.geschichte_by_id("scenario1")
+            load.assert_called_once()
+
+    def test_starter(self):
+        datei = self.tmp / "verteiler.json"
+        datei.write_text(json.dumps({"start": "a", "starter": ["Die_Pilzfee.cfg"], "situationen": [
+            {"id": "a", "module": ["scenario1.cfg"]}]}), encoding="utf-8")
+        vert = loader.load_verteiler(datei, workers=1, cache=False, lazy=True)
+        zustand = verteiler.Spielzustand.from_verteiler(vert)
+        self.assertEqual(vert.nächste_geschichte(zustand).pfad, "Die_Pilzfee")
+        self.assertEqual(vert.nächste_geschichte(zustand).pfad, "scenario1")
+
+    def test_gewicht_und_bedingung(self):
+        datei = self.tmp / "verteiler.json"
+        datei.write_text(json.dumps({"start": "a", "situationen": [{"id": "a", "module": [
+            {"datei": "scenario1.cfg", "gewicht": 3},
+            {"datei": "Die_Pilzfee.cfg", "bedingung": ".pilzfee"},
+            {"datei": "Kurztreffen_Straße.cfg", "gewicht": 0},
+        ]}]}), encoding="utf-8")
+        vert = loader.load_verteiler(datei, workers=1, cache=False)
+        self.assertEqual(vert._situationen[0].gewichte, [3, 1, 0])
+        zustand = verteiler.Spielzustand.from_verteiler(vert)
+        self.assertEqual({vert.nächste_geschichte(zustand).pfad for __ in range(20)},
+                         {"scenario1"})
+        zustand.assert_get_welt().setze_variable("pilzfee", True)
+        self.assertEqual({vert.nächste_geschichte(zustand).pfad for __ in range(100)},
+                         {"scenario1", "Die_Pilzfee"})
+        datei.write_text(json.dumps({"start": "a", "situationen": [{"id": "a", "module": [
+            {"datei": "scenario1.cfg", "bedingung": "stärke(5)"}]}]}), encoding="utf-8")
+        with self.assertRaisesRegex(geschichte.VarTypError, "a/scenario1.cfg"):
+            loader.load_verteiler(datei, workers=1, cache=False)
+        datei.write_text(json.dumps({"start": "a", "situationen": [{"id": "a", "module": [
+            {"datei": "scenario1.cfg", "bedingung": ".pilzfee, modulvar"}]}]}),
+            encoding="utf-8")
+        with self.assertRaisesRegex(geschichte.VarTypError, "modulvar ist eine Modulvariable"):
+            loader.load_verteiler(datei, workers=1, cache=False)
+
+    def test_doppelt_geteilt(self):
+        datei = self.schreibe_verteiler({
+            "a": ["scenario1.cfg", "Die_Pilzfee.cfg"],
+            "b": ["./scenario1.cfg", "Kurztreffen_Straße.cfg"],
+        })
+        seriell = loader.load_verteiler(datei, workers=1, cache=False)
+        parallel = loader.load_verteiler(datei, workers=2, cache=False)
+        for vert in (seriell, parallel):
+            a, b = vert._situationen
+            self.assertIs(a.geschichten[0], b.geschichten[0])
+        self.assertEqual([sit.geschichten for sit in seriell._situationen],
+                         [sit.geschichten for sit in parallel._situationen])
+
+    def test_erster_fehler(self):
+        for name in ("b_kaputt.cfg", "a_kaputt.cfg"):
+            (self.tmp / name).write_text("/kaputt/\n> 5\n", encoding="utf-8")
+        datei = self.schreibe_verteiler({"a": [
+            "scenario1.cfg", str(self.tmp / "b_kaputt.cfg"), str(self.tmp / "a_kaputt.cfg")]})
+        for workers in (1, 2):
+            for parser, fehler in (("pyparsing", pyparsing.ParseBaseException),
+                                   ("zeilen", zeilenparser.ParseFehler)):
+                with self.subTest(workers=workers, parser=parser):
+                    with self.assertRaises(fehler) as cm:
+                        loader.load_verteiler(datei, workers=workers, cache=False,
+                                              parser=parser)
+                    self.assertIn(f"{self.tmp / 'a_kaputt.cfg'}:2",
+                                  "\n".join(cm.exception.__notes__))
+
+
+class TestLadeNeu(unittest.TestCase):
+    ALT = ("/Start/ Hallo\n"
+           ":a: Weiter\n"
+           "    /Alt\n"
+           "    >Zweiter\n"
+           "/Zweiter/ Zwei\n"
+           ":b: Nochmal\n"
+           "    >Start\n")
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.datei = Path(tmp.name) / "neu.cfg"
+        self.datei.write_text(self.ALT, encoding="utf-8")
+        patcher = mock.patch.object(loader, "CACHE_PATH", Path(tmp.name) / "cache")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.verteiler = loader.load_verteiler(self.schreibe_verteiler(Path(tmp.name)))
+        self.zustand = verteiler.Spielzustand.from_verteiler(self.verteiler)
+
+    def schreibe_verteiler(self, ordner: Path) -> Path:
+        datei = ordner / "verteiler.json"
+        datei.write_text(json.dumps({"start": "a", "situationen": [
+            {"id": "a", "module": [str(self.datei)]}]}), encoding="utf-8")
+        return datei
+
+    def ändere(self, text: str) -> None:
+        stat = self.datei.stat()
+        self.datei.write_text(text, encoding="utf-8")
+        os.utime(self.datei, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    def test_position_bleibt(self):
+        self.zustand.run("")
+        self.ändere(self.ALT.replace("/Alt", "/Neu"))
+        neu = loader.lade_neu(self.zustand, self.datei)
+        self.assertIs(self.verteiler.geschichte_by_id(neu.pfad), neu)
+        self.assertIs(self.verteiler._situation.geschichten[0], neu)
+        self.assertEqual(loader.geschichte_datei(neu.pfad), self.datei)
+        outputs, wahl = self.zustand.fortsetzen()
+        self.assertFalse(outputs)
+        assert isinstance(wahl, geschichte.Entscheidung)
+        self.assertEqual(wahl.wahlen[0].id, "a")
+        outputs, _wahl = self.zustand.run("a")
+        self.assertEqual(outputs[0], geschichte.Text("Neu"))
+
+    def test_block_start(self):
+        self.zustand.run("")
+        self.zustand.run("a")
+        self.ändere(self.ALT.replace(":b: Nochmal", "x=1\n:c: Nochmal"))
+        loader.lade_neu(self.zustand, self.datei)
+        assert self.zustand.position
+        self.assertEqual(self.zustand.position.block.id, "Zweiter")
+        self.assertEqual(self.zustand.position.pos, (0,))
+        outputs, wahl = self.zustand.fortsetzen()
+        self.assertEqual(outputs, [geschichte.Text("Zwei")])
+        self.assertIsInstance(wahl, geschichte.Entscheidung)
+        self.zustand.run("c")
+
+    def test_block_weg(self):
+        self.zustand.run("")
+        self.zustand.run("a")
+        self.ändere(self.ALT.split("/Zweiter/")[0].replace(">Zweiter", ">Start"))
+        loader.lade_neu(self.zustand, self.datei)
+        assert self.zustand.position
+        self.assertEqual(self.zustand.position.block.id, "Start")
+
+    def test_fehler(self):
+        self.zustand.run("")
+        position = self.zustand.position
+        self.ändere("/Start/\n> 5\n")
+        with self.assertRaises(pyparsing.ParseBaseException):
+            loader.lade_neu(self.zustand, self.datei)
+        self.assertIs(self.zustand.position, position)
+
+
+class TestStellen(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def schreibe(self, text: str) -> Path:
+        datei = self.tmp / "stellen.cfg"
+        datei.write_text(inspect.cleandoc(text) + "\n", encoding="utf-8")
+        return datei
+
+    def test_ladefehler(self):
+        for parser in ("pyparsing", "zeilen"):
+            with self.subTest(parser=parser):
+                datei = self.schreibe("""
+                    /a/
+                    /Hallo
+                    :x: X
+                        >a
+                        /Danach
+                    """)
+                with self.assertRaisesRegex(ValueError, f"^{datei}:4: Sprung ist nicht"):
+                    loader.load_geschichte(datei, cache=False, parser=parser)
+                datei = self.schreibe("""
+                    /a/
+                    /Hallo
+                    <stark(5)> /Stark
+                    <stärke(5)> /Stärke
+                    """)
+                with self.assertRaisesRegex(geschichte.VarTypError,
+                                            f"^{datei}:4: Bedingung a.2B: Funktion stärke"):
+                    loader.load_geschichte(datei, cache=False, parser=parser)
+
+    def test_parsefehler(self):
+        datei = self.schreibe("""
+            /a/
+            /Hallo
+            :x<stark(: X
+            """)
+        for parser, fehler in (("pyparsing", pyparsing.ParseBaseException),
+                               ("zeilen", zeilenparser.ParseFehler)):
+            with self.subTest(parser=parser):
+                with self.assertRaises(fehler) as cm:
+                    loader.load_geschichte(datei, cache=False, parser=parser)
+                self.assertEqual(cm.exception.__notes__, [f"{datei}:3"])
+
+    def test_laufzeitfehler(self):
+        datei = self.schreibe("""
+            /a/
+            x = 1
+            <x> /Flag
+            """)
+        g = loader.load_geschichte(datei, cache=False)
+        with self.assertRaises(TypeError) as cm:
+            verteiler.Spielzustand.aus_geschichte(g).run("")
+        self.assertEqual(cm.exception.__notes__, [f"In {datei}:3"])
+        datei = self.schreibe("""
+            /a/
+            x = 1
+            :eins: Eins
+                x = "eins"
+            :zwei<.welt, x>: Zwei
+                /Zwei
+            """)
+        g = loader.load_geschichte(datei, cache=False)
+        zustand = verteiler.Spielzustand.aus_geschichte(g)
+        zustand.run("")
+        with self.assertRaisesRegex(geschichte.VarTypError, f"^{datei}:4: "):
+            zustand.fork().run("eins")
+        zustand.assert_get_welt().setze_variable("welt", True)
+        wahl = g.module[0].zeilen[1].wahlen[1]  # type: ignore
+        with self.assertRaises(TypeError) as cm:
+            zustand.eval_bedingung(wahl.bedingung)
+        self.assertEqual(cm.exception.__notes__, [f"In {datei}:5"])
+        self.assertEqual(g.stelle(0), f"{datei}:2")
+        ohne_datei = verteiler.Geschichte(g.module, "test")
+        self.assertEqual(ohne_datei.stelle(0), "test/a.1")
+        pc = next(pc for pc, pos in enumerate(g.programm.positionen) if pos == (1,))
+        self.assertEqual(ohne_datei.stelle(pc, wahl.bedingung), "test/a.2B")
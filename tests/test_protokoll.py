@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+import random
+import tempfile
+import unittest
+
+from xwatc_zwei import LEVELS, geschichte, loader, simulation
+from xwatc_zwei.protokoll import Beobachter, Protokoll
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Spielzustand
+
+
+def _geschichte() -> Geschichte:
+    return Geschichte([
+        Geschichtsblock("start", [
+            geschichte.Text("Hallo"),
+            geschichte.IfElif([
+                (loader.parse_bedingung(".da"), [geschichte.Text("Da")]),
+                (None, [geschichte.Text("Weg")]),
+            ]),
+            geschichte.Entscheidung([
+                geschichte.Wahlmöglichkeit("a", "A", [geschichte.Sprung("ende")]),
+                geschichte.Wahlmöglichkeit("b", "B", [], loader.parse_bedingung(".da")),
+            ]),
+        ]),
+        Geschichtsblock("ende", [geschichte.Text("Ende")]),
+    ], "test")
+
+
+class TestProtokoll(unittest.TestCase):
+
+    def test_ereignisse(self) -> None:
+        zustand = Spielzustand.aus_geschichte(_geschichte())
+        protokoll = zustand.protokoll = Protokoll()
+        outputs, __ = zustand.run("")
+        self.assertEqual(outputs, [geschichte.Text("Hallo"), geschichte.Text("Weg")])
+        self.assertFalse(zustand.eval_bedingung(loader.parse_bedingung(".da")))
+        zustand.run("a")
+        self.assertIsNone(zustand.position)
+        arten = [(eintrag["art"], eintrag["ort"]) for eintrag in protokoll.als_dicts()]
+        self.assertEqual(arten, [
+            ("befehl", "start.1"), ("befehl", "start.2"), ("bedingung", "start.2"),
+            ("sprung", "start.2"), ("befehl", "start.2B.1"), ("befehl", "start.3"),
+            ("zug", "start.3"),
+            ("bedingung", "start.3"),
+            ("sprung", "start.3"), ("befehl", "start.3A.1"), ("sprung", "start.3A.1"),
+            ("befehl", "ende.1"), ("befehl", "ende.2"), ("zug", "ende.2"),
+        ])
+        self.assertEqual(len(protokoll.züge), 2)
+        self.assertEqual(protokoll.bedingungen, {("test", 1, False): 1, ("test", 5, False): 1})
+        blöcke = {stelle.ort: stelle for stelle in protokoll.stellen()}
+        self.assertEqual(blöcke["start"].befehle, 5)
+        self.assertEqual(blöcke["start"].bedingungen, 2)
+        self.assertEqual(blöcke["ende"].befehle, 2)
+        self.assertIn("Heiße Blöcke:", protokoll.bericht())
+
+    def test_ohne_protokoll_gleich(self) -> None:
+        mit, ohne = (Spielzustand.aus_geschichte(_geschichte(), seed=1) for __ in range(2))
+        mit.protokoll = Protokoll()
+        for eingabe in ("", "a"):
+            self.assertEqual(mit.run(eingabe), ohne.run(eingabe))
+        self.assertIsNone(mit.fork().protokoll)
+
+    def test_level_gleich(self) -> None:
+        """Mit und ohne Beobachter läuft der Interpreter gleich, auch mit strom."""
+        for name in ("Die_Pilzfee.cfg", "Kurztreffen_Straße.cfg", "scenario1.cfg"):
+            geschichte_ = loader.load_geschichte(LEVELS / name)
+            for seed in range(20):
+                with self.subTest(name=name, seed=seed):
+                    zustände = [Spielzustand.aus_geschichte(geschichte_, seed)
+                                for __ in range(3)]
+                    zustände[1].protokoll = Protokoll()
+                    zustände[2].protokoll = Beobachter()
+                    rng = random.Random(seed)
+                    eingabe = ""
+                    for __ in range(30):
+                        ergebnisse = [zustände[0].run(eingabe), zustände[1].run(eingabe)]
+                        *outputs, zeile = zustände[2].strom(eingabe)
+                        ergebnisse.append((outputs, zeile))
+                        for ergebnis in ergebnisse[1:]:
+                            self.assertEqual(list(ergebnis[0]), list(ergebnisse[0][0]))
+                            self.assertEqual(ergebnis[1], ergebnisse[0][1])
+                        self.assertEqual(len({z.position and z.position.pc for z in zustände}), 1)
+                        zeile = ergebnisse[0][1]
+                        if not isinstance(zeile, geschichte.Entscheidung):
+                            break
+                        wahlen = [w for w in zeile.wahlen
+                                  if zustände[0].eval_bedingung(w.bedingung)]
+                        if not wahlen:
+                            break
+                        eingabe = rng.choice(wahlen).id
+
+    def test_max_ereignisse(self) -> None:
+        zustand = Spielzustand.aus_geschichte(_geschichte())
+        protokoll = zustand.protokoll = Protokoll(max_ereignisse=3)
+        zustand.run("")
+        self.assertEqual(len(protokoll.ereignisse), 3)
+        self.assertEqual(protokoll.befehle.total(), 4)
+
+    def test_simulation(self) -> None:
+        protokoll = Protokoll()
+        simulation.simuliere(loader.load_geschichte(LEVELS / "Die_Pilzfee.cfg"), 20,
+                             protokoll=protokoll)
+        self.assertEqual(len(protokoll.züge), sum(
+            1 for art, *__ in protokoll.ereignisse if art == "zug"))
+        with tempfile.TemporaryDirectory() as tmp:
+            datei = Path(tmp) / "protokoll.jsonl"
+            protokoll.exportiere(datei)
+            zeilen = datei.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(zeilen), len(protokoll.ereignisse))
+        self.assertEqual(json.loads(zeilen[0])["geschichte"], "Die_Pilzfee")
+        with self.assertRaises(ValueError):
+            simulation.simuliere(_geschichte(), 1, prozesse=2, protokoll=protokoll)
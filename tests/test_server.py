@@ -0,0 +1,165 @@
+import asyncio
+import json
+import unittest
+
+from xwatc_zwei import geschichte, loader
+from xwatc_zwei.server import Server
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock, Verteiler
+
+
+def _verteiler() -> Verteiler:
+    return Verteiler.aus_geschichte(Geschichte([Geschichtsblock("start", [
+        geschichte.Text("Ein Weg"),
+        geschichte.Entscheidung([
+            geschichte.Wahlmöglichkeit("apfel", "Apfel nehmen", [
+                geschichte.Erhalten("Apfel", 2),
+                geschichte.SetzeVariable(".satt", True),
+            ]),
+            geschichte.Wahlmöglichkeit("geheim", "Geheim", [geschichte.Text("Geheim")],
+                                       bedingung=loader.parse_bedingung(".satt")),
+        ]),
+    ])], "weg"))
+
+
+class TestServer(unittest.TestCase):
+
+    def test_sitzungen(self) -> None:
+        server = Server(_verteiler())
+        a = server.bearbeite({})
+        self.assertEqual(a["ausgaben"], ["Ein Weg"])
+        self.assertEqual(a["wahlen"], [{"id": "apfel", "text": "Apfel nehmen"}])
+        b = server.bearbeite({"seed": 1})
+        self.assertNotEqual(a["sitzung"], b["sitzung"])
+        self.assertEqual(server.bearbeite({"sitzung": a["sitzung"], "wahl": "apfel"}), {
+            "sitzung": a["sitzung"], "ausgaben": ["Du erhältst 2 Apfel"],
+            "wahlen": [{"id": "", "text": "Weiter"}]})
+        antwort = server.bearbeite({"sitzung": a["sitzung"], "wahl": ""})
+        self.assertEqual([w["id"] for w in antwort["wahlen"]], ["apfel", "geheim"])
+        # Die Welt von b ist unabhängig, die Geschichte geteilt.
+        self.assertEqual(server.bearbeite({"sitzung": b["sitzung"], "wahl": "geheim"})["fehler"],
+                         "Wahl 'geheim' steht nicht zur Wahl.")
+        zustand_a = server.sitzungen[a["sitzung"]].zustand
+        zustand_b = server.sitzungen[b["sitzung"]].zustand
+        self.assertIs(zustand_a.position.geschichte, zustand_b.position.geschichte)
+        self.assertEqual(server.bearbeite({"sitzung": b["sitzung"], "ende": True}),
+                         {"sitzung": b["sitzung"], "beendet": True})
+        self.assertEqual(server.bearbeite({"sitzung": b["sitzung"]})["fehler"],
+                         "Unbekannte Sitzung.")
+        self.assertEqual(len(server.sitzungen), 1)
+
+    def test_strom(self) -> None:
+        server = Server(_verteiler())
+        text, erste = server.strome({"seed": 1})
+        id = erste["sitzung"]
+        self.assertEqual(text, {"sitzung": id, "ausgabe": "Ein Weg"})
+        self.assertEqual(erste, {"sitzung": id,
+                                 "wahlen": [{"id": "apfel", "text": "Apfel nehmen"}]})
+        self.assertEqual(list(server.strome({"sitzung": id, "wahl": "apfel"})), [
+            {"sitzung": id, "ausgabe": "Du erhältst 2 Apfel"},
+            {"sitzung": id, "wahlen": [{"id": "", "text": "Weiter"}]}])
+        self.assertEqual(list(server.strome({"sitzung": id, "wahl": "x"})), [
+            {"sitzung": id, "fehler": "Wahl 'x' steht nicht zur Wahl."}])
+
+    def test_strom_im_zug(self) -> None:
+        server = Server(_verteiler())
+        id = server.bearbeite({})["sitzung"]
+        strom = server.strome({"sitzung": id, "wahl": "apfel"})
+        self.assertEqual(next(strom), {"sitzung": id, "ausgabe": "Du erhältst 2 Apfel"})
+        # Eine zweite Anfrage mitten im Zug, z.B. von einer anderen Verbindung.
+        fehler = {"sitzung": id, "fehler": "Die Sitzung ist gerade in einem Zug."}
+        self.assertEqual(server.bearbeite({"sitzung": id, "wahl": "apfel"}), fehler)
+        self.assertEqual(list(server.strome({"sitzung": id, "ende": True})), [fehler])
+        self.assertEqual(list(strom), [{"sitzung": id, "wahlen": [{"id": "", "text": "Weiter"}]}])
+        self.assertEqual(server.bearbeite({"sitzung": id, "wahl": ""})["ausgaben"], ["Ein Weg"])
+        # Bricht der Strom ab, ist die Sitzung beendet.
+        strom = server.strome({"sitzung": id, "wahl": "apfel"})
+        next(strom)
+        strom.close()
+        self.assertNotIn(id, server.sitzungen)
+
+    def test_grenzen(self) -> None:
+        server = Server(_verteiler(), max_sitzungen=1, ablauf=0)
+        server.bearbeite({})
+        self.assertEqual(server.bearbeite({}), {"fehler": "Zu viele Sitzungen."})
+        self.assertEqual(server.räume_auf(), 1)
+        self.assertFalse(server.sitzungen)
+        self.assertIn("fehler", server.bearbeite([]))  # type: ignore
+
+    def test_falsche_typen(self) -> None:
+        server = Server(_verteiler())
+        for anfrage in [{"sitzung": []}, {"sitzung": 1}, {"seed": [1]}, {"seed": {}},
+                        {"sitzung": "x", "wahl": {}}]:
+            with self.subTest(anfrage=anfrage):
+                self.assertIn("falschen Typ", server.bearbeite(anfrage)["fehler"])
+                self.assertIn("falschen Typ", next(server.strome(anfrage))["fehler"])
+        self.assertFalse(server.sitzungen)
+
+    def test_geschichtsfehler(self) -> None:
+        server = Server(Verteiler.aus_geschichte(Geschichte([Geschichtsblock("start", [
+            geschichte.SetzeVariable("x", 1), geschichte.SetzeVariable("x", "a")])])))
+        antwort = server.bearbeite({})
+        self.assertTrue(antwort["beendet"])
+        self.assertFalse(server.sitzungen)
+
+    def test_endlosschleife(self) -> None:
+        server = Server(Verteiler.aus_geschichte(Geschichte([
+            Geschichtsblock("start", [geschichte.Text("Ein Weg"), geschichte.Entscheidung([
+                geschichte.Wahlmöglichkeit("weiter", "Weiter", [geschichte.Sprung("kreis")])])]),
+            Geschichtsblock("kreis", [geschichte.Sprung(geschichte.Sonderziel.Self)]),
+        ])), max_sprünge=1000)
+        id = server.bearbeite({})["sitzung"]
+        self.assertEqual(server.bearbeite({"sitzung": id, "zähler": True}),
+                         {"sitzung": id, "züge": 1, "sprünge": 0})
+        antwort = server.bearbeite({"sitzung": id, "wahl": "weiter"})
+        self.assertTrue(antwort["beendet"])
+        self.assertIn("Schleife über kreis", antwort["fehler"])
+        self.assertEqual(server.endlosschleifen, 1)
+
+    def test_tcp(self) -> None:
+        async def spiele() -> list[dict]:
+            server = Server(_verteiler())
+            tcp = await server.starte(port=0)
+            port = tcp.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            antworten = []
+            for anfrage, zeilen in [({}, 1), ({"strom": True}, 2), ("kaputt", 1)]:
+                writer.write(json.dumps(anfrage).encode() + b"\n")
+                for __ in range(zeilen):
+                    antworten.append(json.loads(await reader.readline()))
+            writer.write(json.dumps({"sitzung": antworten[0]["sitzung"], "wahl": "apfel"})
+                         .encode() + b"\n")
+            antworten.append(json.loads(await reader.readline()))
+            writer.close()
+            await writer.wait_closed()
+            tcp.close()
+            await tcp.wait_closed()
+            return antworten
+
+        antworten = asyncio.run(spiele())
+        self.assertNotEqual(antworten[0]["sitzung"], antworten[1]["sitzung"])
+        self.assertEqual(antworten[1]["ausgabe"], "Ein Weg")
+        self.assertEqual(antworten[2]["sitzung"], antworten[1]["sitzung"])
+        self.assertIn("fehler", antworten[3])
+        self.assertEqual(antworten[4]["ausgaben"], ["Du erhältst 2 Apfel"])
+
+    def test_tcp_fehler(self) -> None:
+        async def sende(*zeilen: bytes) -> list[dict]:
+            server = Server(_verteiler())
+            tcp = await server.starte(port=0)
+            port = tcp.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.writelines(zeilen)
+            antworten = [json.loads(await reader.readline()) for __ in zeilen]
+            writer.close()
+            await writer.wait_closed()
+            tcp.close()
+            await tcp.wait_closed()
+            return antworten
+
+        # Falsche Typen, kaputte Bytes und zu lange Zeilen bekommen eine Antwort, danach geht
+        # es auf der Verbindung weiter.
+        *fehler, neu = asyncio.run(sende(b'{"sitzung": ["x"]}\n', b"\xff\n",
+                                         b"x" * 2**17 + b"\n", b"{}\n"))
+        self.assertEqual([antwort["fehler"][:10] for antwort in fehler],
+                         ["sitzung ha", "Kein JSON:", "Anfrage zu"])
+        self.assertEqual(neu["ausgaben"], ["Ein Weg"])
@@ -0,0 +1,70 @@
+import unittest
+
+from xwatc_zwei import LEVELS, geschichte, loader, simulation
+from xwatc_zwei.verteiler import Geschichte, Geschichtsblock
+
+
+def _schleife() -> Geschichte:
+    return Geschichte([Geschichtsblock("start", [
+        geschichte.Text("Ein Weg"),
+        geschichte.Entscheidung([
+            geschichte.Wahlmöglichkeit("nochmal", "Nochmal", [geschichte.Sprung("start")]),
+            geschichte.Wahlmöglichkeit("apfel", "Apfel nehmen", [
+                geschichte.Erhalten("Apfel", 2),
+                geschichte.SetzeVariable("satt", True),
+            ]),
+            geschichte.Wahlmöglichkeit("geheim", "Geheim", [geschichte.Sprung("ende")],
+                                       bedingung=loader.parse_bedingung("x")),
+        ]),
+    ]), Geschichtsblock("ende", [geschichte.Text("Nie")])])
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_skript(self) -> None:
+        statistik = simulation.simuliere(
+            _schleife(), 10, simulation.Skript(["nochmal", "nochmal", "apfel"]))
+        self.assertEqual(statistik.läufe, 10)
+        self.assertEqual(statistik.ausgänge, {("ende", "", "start"): 10})
+        self.assertEqual(statistik.items, {"Apfel": 20})
+        self.assertEqual(statistik.variablen, {("satt", True): 10})
+        self.assertEqual(statistik.zeilen["", "start", (0,)], 30)
+        self.assertEqual(statistik.zeilen["", "start", (1,)], 30)
+        self.assertEqual(statistik.zeilen["", "start", (1, 1, 0)], 10)
+        self.assertEqual(statistik.blöcke, {("", "start"): 10})
+
+    def test_abbruch(self) -> None:
+        statistik = simulation.simuliere(_schleife(), 3, simulation.erste, max_entscheidungen=5)
+        self.assertEqual(statistik.ausgänge, {("abbruch", "", "start"): 3})
+        self.assertEqual(statistik.zeilen["", "start", (0,)], 18)
+
+    def test_zufällig_reproduzierbar(self) -> None:
+        pilzfee = loader.load_geschichte(LEVELS / "Die_Pilzfee.cfg")
+        seriell = simulation.simuliere(pilzfee, 200, seed=4)
+        parallel = simulation.simuliere(pilzfee, 200, seed=4, prozesse=2)
+        self.assertEqual(seriell.ausgänge, parallel.ausgänge)
+        self.assertEqual(seriell.zeilen, parallel.zeilen)
+        self.assertEqual(seriell.läufe, 200)
+        self.assertGreater(len(seriell.ausgänge), 1)
+        self.assertGreater(parallel.läufe_pro_sekunde, 0)
+
+    def test_geteilte_zeile(self) -> None:
+        gleich = geschichte.Text("Gleich")
+        statistik = simulation.simuliere(Geschichte([
+            Geschichtsblock("a", [gleich, geschichte.Sprung("b")]),
+            Geschichtsblock("b", [gleich])]), 3)
+        self.assertEqual(statistik.zeilen, {("", "a", (0,)): 3, ("", "b", (0,)): 3})
+
+    def test_fehler_pro_lauf(self) -> None:
+        schleife = Geschichte([Geschichtsblock("c", [
+            geschichte.Text("c"), geschichte.Sprung(geschichte.Sonderziel.Self)])])
+        statistik = simulation.simuliere(schleife, 3, max_sprünge=50)
+        self.assertEqual(statistik.ausgänge, {("endlosschleife", "", "c"): 3})
+        self.assertEqual(statistik.zeilen["", "c", (0,)], 3 * 51)
+        falsch = Geschichte([Geschichtsblock("a", [
+            geschichte.SetzeVariable("x", 1), geschichte.Text("Eins"),
+            geschichte.SetzeVariable("x", "zwei")])])
+        statistik = simulation.simuliere(falsch, 2, prozesse=2)
+        self.assertEqual(statistik.läufe, 2)
+        self.assertEqual(statistik.ausgänge, {("fehler", "", "a"): 2})
+        self.assertEqual(statistik.variablen, {("x", 1): 2})
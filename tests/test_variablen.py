@@ -0,0 +1,64 @@
+import pickle
+import unittest
+
+from xwatc_zwei.variablen import Variablen, Änderungen
+
+
+class TestVariablen(unittest.TestCase):
+
+    def test_dict(self) -> None:
+        variablen = Variablen({"a": 1})
+        variablen["b"] = 2
+        self.assertEqual(variablen, {"a": 1, "b": 2})
+        self.assertEqual(len(variablen), 2)
+        del variablen["a"]
+        self.assertNotIn("a", variablen)
+        with self.assertRaises(KeyError):
+            del variablen["a"]
+        self.assertEqual(variablen.get("a", 5), 5)
+
+    def test_fork(self) -> None:
+        original = Variablen({"a": 1, "b": 2})
+        kopie = original.fork()
+        kopie["a"] = 10
+        del kopie["b"]
+        original["c"] = 3
+        self.assertEqual(original, {"a": 1, "b": 2, "c": 3})
+        self.assertEqual(kopie, {"a": 10})
+        enkel = kopie.fork()
+        enkel["b"] = 20
+        self.assertEqual(enkel, {"a": 10, "b": 20})
+        self.assertEqual(kopie, {"a": 10})
+        self.assertEqual(sorted(enkel), ["a", "b"])
+
+    def test_tiefe(self) -> None:
+        variablen = Variablen[int]()
+        kopien = []
+        for i in range(3 * Variablen.MAX_TIEFE):
+            variablen[str(i)] = i
+            kopien.append(variablen.fork())
+            self.assertLessEqual(variablen._tiefe, Variablen.MAX_TIEFE + 1)
+        for i, kopie in enumerate(kopien):
+            self.assertEqual(kopie, {str(j): j for j in range(i + 1)})
+
+    def test_pickle(self) -> None:
+        variablen = Variablen({"a": 1}).fork()
+        variablen["b"] = True
+        self.assertEqual(pickle.loads(pickle.dumps(variablen)), {"a": 1, "b": True})
+
+    def test_änderungen(self) -> None:
+        variablen = Variablen({"a": 1})
+        variablen.änderungen = Änderungen()
+        stand = variablen.änderungen.stand
+        variablen["b"] = 2
+        del variablen["a"]
+        variablen["b"] = 3
+        self.assertEqual(variablen.änderungen.seit(stand), ["b", "a", "b"])
+        self.assertEqual(variablen.änderungen.seit(variablen.änderungen.stand), [])
+        self.assertIsNone(variablen.fork().änderungen)
+        for i in range(Änderungen.MAX_LÄNGE):
+            variablen["c"] = i
+        self.assertIsNone(variablen.änderungen.seit(stand))
+        stand = variablen.änderungen.stand
+        variablen["d"] = 4
+        self.assertEqual(variablen.änderungen.seit(stand), ["d"])
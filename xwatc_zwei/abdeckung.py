@@ -0,0 +1,124 @@
+"""Zeilenabdeckung: Welche Zeilen der Geschichtsdateien wurden in Tests oder Simulationen
+ausgeführt?
+
+Eine :py:class:`Abdeckung` wird wie ein Protokoll an
+:py:attr:`xwatc_zwei.verteiler.Spielzustand.protokoll` gehängt und merkt sich nur die Menge
+der ausgeführten Befehle. Erst für den Bericht werden sie über
+:py:attr:`xwatc_zwei.verteiler.Geschichtsblock.quelle` auf Zeilen der Dateien abgebildet.
+Aufruf::
+
+    python -m xwatc_zwei.simulation level/scenario1.cfg -n 1000 --abdeckung
+"""
+from pathlib import Path
+from typing import ClassVar
+
+from attrs import Factory, define
+
+from xwatc_zwei.programm import Position
+from xwatc_zwei.protokoll import Beobachter
+from xwatc_zwei.verteiler import Geschichte
+
+
+@define
+class Datei:
+    """Die Abdeckung einer Geschichtsdatei."""
+    pfad: str
+    datei: Path | None
+    """Die Datei, None wenn die Geschichte nicht aus einer kommt."""
+    zeilen: set[int]
+    """Alle Zeilen, die zu einer Zeile der Geschichte gehören."""
+    erreicht: set[int]
+
+    @property
+    def nicht_erreicht(self) -> list[int]:
+        return sorted(self.zeilen - self.erreicht)
+
+    @property
+    def anteil(self) -> float:
+        return len(self.erreicht) / len(self.zeilen) if self.zeilen else 1.
+
+
+def _bereiche(zeilen: list[int]) -> str:
+    """Fasse sortierte Zeilennummern zu Bereichen zusammen, z.B. ``3-5, 9``."""
+    bereiche: list[list[int]] = []
+    for zeile in zeilen:
+        if bereiche and bereiche[-1][1] + 1 == zeile:
+            bereiche[-1][1] = zeile
+        else:
+            bereiche.append([zeile, zeile])
+    return ", ".join(f"{a}-{b}" if a != b else str(a) for a, b in bereiche)
+
+
+@define
+class Abdeckung(Beobachter):
+    """Sammelt die ausgeführten Befehle eines oder mehrerer Spielzustände."""
+    nur_befehle: ClassVar[bool] = True
+    befehle: dict[str, set[int]] = Factory(dict)
+    """Die ausgeführten Befehle nach dem Pfad ihrer Geschichte."""
+    _geschichten: dict[str, Geschichte] = Factory(dict)
+
+    def kenne(self, geschichte: Geschichte) -> None:
+        """Nehme eine Geschichte in den Bericht auf, auch wenn sie nie ausgeführt wird."""
+        self._geschichten[geschichte.pfad] = geschichte
+        self.befehle.setdefault(geschichte.pfad, set())
+
+    def beginne(self, geschichte: Geschichte) -> None:
+        self.kenne(geschichte)
+
+    def befehl(self, pfad: str, pc: int) -> None:
+        self.befehle[pfad].add(pc)
+
+    def vereinige(self, andere: 'Abdeckung') -> None:
+        """Nehme die Befehle einer anderen Abdeckung dazu."""
+        for geschichte in andere._geschichten.values():
+            self.kenne(geschichte)
+        for pfad, befehle in andere.befehle.items():
+            self.befehle.setdefault(pfad, set()).update(befehle)
+
+    def erreicht(self, pfad: str) -> set[tuple[str, Position]]:
+        """Die erreichten Zeilen einer Geschichte als Block-Id und Position, wie für
+        :py:meth:`Geschichtsblock.__getitem__`. Der Kopf eines Blocks hat die Position ``()``."""
+        programm = self._geschichten[pfad].programm
+        erreicht: set[tuple[str, Position]] = set()
+        for pc in self.befehle.get(pfad, ()):
+            block = programm.blöcke[pc].id
+            erreicht.add((block, ()))
+            if programm.befehle[pc].zeile is not None:
+                erreicht.add((block, programm.positionen[pc]))
+        return erreicht
+
+    def datei(self, pfad: str) -> Datei:
+        """Die Abdeckung der Datei einer Geschichte. Köpfe von Fällen und Wahlen zählen als
+        erreicht, sobald ihre Verzweigung erreicht wurde."""
+        erreicht = self.erreicht(pfad)
+        zeilen: set[int] = set()
+        getroffen: set[int] = set()
+        geschichte = self._geschichten[pfad]
+        for block in geschichte.module:
+            for pos, (erste, letzte) in block.quelle.items():
+                bereich = range(erste, letzte + 1)
+                zeilen.update(bereich)
+                if (block.id, pos) in erreicht or (
+                        len(pos) % 2 == 0 and (block.id, pos[:-1]) in erreicht):
+                    getroffen.update(bereich)
+        return Datei(pfad, Path(geschichte.datei) if geschichte.datei else None, zeilen,
+                     getroffen)
+
+    def dateien(self) -> list[Datei]:
+        return [self.datei(pfad) for pfad in sorted(self._geschichten)]
+
+    def bericht(self, quelltext: bool = False) -> str:
+        """Eine Zusammenfassung zum Ausgeben: Für jede Datei der Anteil der erreichten Zeilen
+        und die nicht erreichten. Mit `quelltext` werden diese auch mit ausgegeben."""
+        zeilen = ["Abdeckung:"]
+        for datei in self.dateien():
+            zeilen.append(f"  {datei.anteil:7.1%}  {datei.pfad} "
+                          f"({len(datei.erreicht)}/{len(datei.zeilen)})")
+            if not (fehlend := datei.nicht_erreicht):
+                continue
+            zeilen.append(f"           nicht erreicht: {_bereiche(fehlend)}")
+            if quelltext and datei.datei is not None and datei.datei.is_file():
+                text = datei.datei.read_text(encoding="utf-8").splitlines()
+                zeilen.extend(f"      {nr:>5} ! {text[nr - 1]}" for nr in fehlend
+                              if nr <= len(text))
+        return "\n".join(zeilen)
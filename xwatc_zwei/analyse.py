@@ -0,0 +1,216 @@
+"""Statische Analyse von Geschichten: Findet Fehler, bevor ein Spieler sie trifft.
+
+Gesucht werden Sprünge zu unbekannten Blöcken, Blöcke, die nie erreicht werden, Schleifen
+ohne Eingabe und Variablen, die abgefragt, aber nirgends gesetzt werden. Die Analyse läuft
+auf dem übersetzten :py:class:`xwatc_zwei.programm.Programm` und braucht linear viel Zeit.
+Aufruf für alle Geschichten in `level/`::
+
+    python -m xwatc_zwei.analyse
+"""
+from collections.abc import Iterable, Iterator, Sequence
+from enum import Enum
+from os import PathLike
+from pathlib import Path
+import sys
+
+from attrs import define
+import pyparsing as pp
+
+from xwatc_zwei import LEVELS, loader
+from xwatc_zwei.geschichte import (Bedingung, Entscheidung, FuncBedingung, NichtBedingung,
+                                   OderBedingung, SetzeVariable, Sonderziel, Sprung,
+                                   UndBedingung, VariablenBedingung, VarTypError)
+from xwatc_zwei.programm import Op, Programm, nachfolger, ortsname
+from xwatc_zwei.verteiler import Geschichte
+
+
+class Art(Enum):
+    """Die Arten von Befunden."""
+    PARSEFEHLER = "Parsefehler"
+    UNBEKANNTES_ZIEL = "Sprung ins Nichts"
+    UNERREICHBAR = "Unerreichbarer Block"
+    ENDLOSSCHLEIFE = "Endlosschleife ohne Eingabe"
+    SCHLEIFE = "Schleife ohne Eingabe"
+    """Eine Schleife, die nur verlassen wird, wenn sich eine Bedingung ändert."""
+    UNGESETZT = "Variable wird nie gesetzt"
+    NIE_GENOMMEN = "Zweig wird nie genommen"
+    """Ein Fall oder eine Wahl, deren Bedingung nie erfüllt ist. Findet nur
+    :py:mod:`xwatc_zwei.erkundung`, weil es dafür die Geschichte durchspielen muss."""
+
+
+@define(frozen=True)
+class Befund:
+    """Ein gefundenes Problem in einer Geschichte."""
+    art: Art
+    pfad: str
+    """Der Pfad der Geschichte, siehe :py:attr:`Geschichte.pfad`."""
+    ort: str
+    """Wo in der Geschichte, wie in :py:func:`xwatc_zwei.geschichte.teste_block`."""
+    text: str = ""
+
+    def __str__(self) -> str:
+        return f"{self.pfad}:{self.ort}: {self.art.value}" + (f" ({self.text})" if self.text
+                                                             else "")
+
+
+def _erreichbar(programm: Programm, start: int) -> list[bool]:
+    erreicht = [False] * len(programm.befehle)
+    erreicht[start] = True
+    stapel = [start]
+    while stapel:
+        for nächster in nachfolger(programm, stapel.pop()):
+            if not erreicht[nächster]:
+                erreicht[nächster] = True
+                stapel.append(nächster)
+    return erreicht
+
+
+def _schleifen(programm: Programm) -> Iterator[list[int]]:
+    """Finde die starken Zusammenhangskomponenten ohne Eingabe, die eine Schleife enthalten
+    (Tarjan, ohne Rekursion)."""
+    befehle = programm.befehle
+    n = len(befehle)
+    ohne_eingabe = [befehl.op not in (Op.WAHL, Op.TREFFEN) for befehl in befehle]
+    index = [-1] * n
+    tief = [0] * n
+    auf_stapel = [False] * n
+    stapel: list[int] = []
+    zähler = 0
+    for wurzel in range(n):
+        if index[wurzel] != -1 or not ohne_eingabe[wurzel]:
+            continue
+        arbeit = [(wurzel, iter(nachfolger(programm, wurzel)))]
+        index[wurzel] = tief[wurzel] = zähler
+        zähler += 1
+        stapel.append(wurzel)
+        auf_stapel[wurzel] = True
+        while arbeit:
+            knoten, kinder = arbeit[-1]
+            for kind in kinder:
+                if not ohne_eingabe[kind]:
+                    continue
+                if index[kind] == -1:
+                    index[kind] = tief[kind] = zähler
+                    zähler += 1
+                    stapel.append(kind)
+                    auf_stapel[kind] = True
+                    arbeit.append((kind, iter(nachfolger(programm, kind))))
+                    break
+                if auf_stapel[kind]:
+                    tief[knoten] = min(tief[knoten], index[kind])
+            else:
+                arbeit.pop()
+                if arbeit:
+                    eltern = arbeit[-1][0]
+                    tief[eltern] = min(tief[eltern], tief[knoten])
+                if tief[knoten] == index[knoten]:
+                    komponente = []
+                    while True:
+                        teil = stapel.pop()
+                        auf_stapel[teil] = False
+                        komponente.append(teil)
+                        if teil == knoten:
+                            break
+                    if len(komponente) > 1 or knoten in nachfolger(programm, knoten):
+                        yield sorted(komponente)
+
+
+def _gelesene_variablen(bedingung: Bedingung | None) -> Iterator[str]:
+    match bedingung:
+        case None | FuncBedingung():
+            pass
+        case VariablenBedingung(variable=variable):
+            yield variable
+        case NichtBedingung(bedingung=unterbedingung):
+            yield from _gelesene_variablen(unterbedingung)
+        case UndBedingung(bedingungen=bedingungen) | OderBedingung(bedingungen=bedingungen):
+            for unterbedingung in bedingungen:
+                yield from _gelesene_variablen(unterbedingung)
+
+
+def _ort(programm: Programm, pc: int) -> str:
+    return ortsname(programm.blöcke[pc].id, programm.positionen[pc])
+
+
+def analysiere_geschichte(geschichte: Geschichte) -> list[Befund]:
+    """Analysiere eine einzelne Geschichte. Weltvariablen werden nicht geprüft, weil sie auch
+    in anderen Geschichten gesetzt werden können, siehe :py:func:`analysiere`."""
+    return [befund for befund in analysiere([geschichte]) if befund.art != Art.UNGESETZT
+            or not befund.text.startswith(".")]
+
+
+def analysiere(geschichten: Iterable[Geschichte]) -> list[Befund]:
+    """Analysiere mehrere Geschichten zusammen. Weltvariablen gelten als gesetzt, wenn sie
+    in irgendeiner der Geschichten gesetzt werden."""
+    befunde: list[Befund] = []
+    weltvariablen: set[str] = set()
+    gelesene_weltvariablen: dict[str, tuple[str, str]] = {}
+    for geschichte in geschichten:
+        programm = geschichte.programm
+        pfad = geschichte.pfad
+        gesetzt = {"_"}
+        gelesen: dict[str, str] = {}
+        for pc, befehl in enumerate(programm.befehle):
+            match befehl.op, befehl.zeile:
+                case Op.UNBEKANNT, Sprung(ziel=ziel):
+                    befunde.append(Befund(Art.UNBEKANNTES_ZIEL, pfad, _ort(programm, pc),
+                                          ziel.name if isinstance(ziel, Sonderziel) else ziel))
+                case Op.SETZE, SetzeVariable(variable=variable):
+                    if variable.startswith("."):
+                        weltvariablen.add(variable)
+                    else:
+                        gesetzt.add(variable)
+                case Op.WENN, _:
+                    for variable in _gelesene_variablen(befehl.bedingung):
+                        gelesen.setdefault(variable, _ort(programm, pc))
+                case Op.WAHL, Entscheidung(wahlen=wahlen):
+                    for wahl in wahlen:
+                        for variable in _gelesene_variablen(wahl.bedingung):
+                            gelesen.setdefault(variable, _ort(programm, pc))
+        for variable, ort in gelesen.items():
+            if variable.startswith("."):
+                gelesene_weltvariablen.setdefault(variable, (pfad, ort))
+            elif variable not in gesetzt:
+                befunde.append(Befund(Art.UNGESETZT, pfad, ort, variable))
+        if not programm.befehle:
+            continue
+        erreicht = _erreichbar(programm, 0)
+        for block, start in programm.starts.items():
+            if not erreicht[start]:
+                befunde.append(Befund(Art.UNERREICHBAR, pfad, block))
+        for komponente in _schleifen(programm):
+            drin = set(komponente)
+            endlos = all(nächster in drin for pc in komponente
+                         for nächster in nachfolger(programm, pc))
+            befunde.append(Befund(Art.ENDLOSSCHLEIFE if endlos else Art.SCHLEIFE, pfad,
+                                  _ort(programm, komponente[0])))
+    for variable, (pfad, ort) in gelesene_weltvariablen.items():
+        if variable not in weltvariablen:
+            befunde.append(Befund(Art.UNGESETZT, pfad, ort, variable))
+    return befunde
+
+
+def analysiere_dateien(dateien: Iterable[PathLike]) -> list[Befund]:
+    """Lade und analysiere Dateien. Dateien, die nicht geladen werden können, werden als
+    :py:attr:`Art.PARSEFEHLER` gemeldet."""
+    befunde: list[Befund] = []
+    geschichten: list[Geschichte] = []
+    for datei in dateien:
+        try:
+            geschichten.append(loader.load_geschichte(datei))
+        except (pp.ParseBaseException, ValueError, TypeError, VarTypError) as fehler:
+            befunde.append(Befund(Art.PARSEFEHLER, str(datei), "", str(fehler)))
+    return befunde + analysiere(geschichten)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Analysiere die gegebenen Dateien, sonst alle in `level/`."""
+    dateien = [Path(arg) for arg in (sys.argv[1:] if argv is None else argv)]
+    befunde = analysiere_dateien(dateien or sorted(LEVELS.glob("**/*.cfg")))
+    for befund in befunde:
+        print(befund)
+    sys.exit(1 if befunde else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Gewichtete Auswahl der nächsten Geschichte unter denen, deren Bedingung erfüllt ist.
+
+Die Bedingungen werden nicht bei jeder Auswahl alle neu ausgewertet. Ein Index merkt sich,
+welche Geschichten von welcher Größe (Weltvariable, Wert oder Fähigkeit des Mänxen) abhängen,
+und nur die Geschichten, deren Größen sich seit der letzten Auswahl geändert haben, werden neu
+geprüft. Welche Größen geschrieben wurden, steht in den :py:class:`Änderungen` von Welt und
+Mänx, gelesen werden nur diese. Gezogen wird mit einem Fenwick-Baum über die Gewichte in
+O(log n).
+"""
+from collections.abc import Iterable, Sequence
+import random
+
+from attrs import define, field
+
+from xwatc_zwei import bedingung
+from xwatc_zwei.geschichte import Bedingung
+from xwatc_zwei.variablen import Änderungen
+
+
+class Fenwick:
+    """Ein Fenwick-Baum über ganzzahlige Gewichte. Ändern und Ziehen brauchen O(log n),
+    `summe` ist die Summe aller Gewichte."""
+    __slots__ = ("_baum", "_werte", "summe")
+
+    def __init__(self, werte: Sequence[int]) -> None:
+        self._werte = list(werte)
+        self.summe = sum(self._werte)
+        baum = [0, *self._werte]
+        for i in range(1, len(baum)):
+            if (eltern := i + (i & -i)) < len(baum):
+                baum[eltern] += baum[i]
+        self._baum = baum
+
+    def __len__(self) -> int:
+        return len(self._werte)
+
+    def __getitem__(self, index: int) -> int:
+        return self._werte[index]
+
+    def __setitem__(self, index: int, wert: int) -> None:
+        änderung = wert - self._werte[index]
+        if not änderung:
+            return
+        self._werte[index] = wert
+        self.summe += änderung
+        baum = self._baum
+        i = index + 1
+        while i < len(baum):
+            baum[i] += änderung
+            i += i & -i
+
+    def finde(self, ziel: int) -> int:
+        """Der Index, in dessen Gewicht `ziel` fällt, wenn man die Gewichte aneinanderlegt.
+
+        :raises IndexError: wenn `ziel` nicht zwischen 0 und der Summe liegt.
+        """
+        if not 0 <= ziel < self.summe:
+            raise IndexError(ziel)
+        baum = self._baum
+        index = 0
+        schritt = 1 << len(self._werte).bit_length()
+        while schritt:
+            if index + schritt < len(baum) and baum[index + schritt] <= ziel:
+                index += schritt
+                ziel -= baum[index]
+            schritt >>= 1
+        return index
+
+
+@define
+class Auswahl:
+    """Zieht gewichtet aus den Geschichten einer Situation.
+
+    Die Auswahl merkt sich nur, welche Werte die Größen bei der letzten Auswahl hatten und
+    bis zu welchem Stand sie die Änderungen gelesen hat. Sie kann also auch für verschiedene
+    Spielzustände benutzt werden, es werden dann eben alle Größen neu gelesen.
+    """
+    gewichte: Sequence[int]
+    bedingungen: Sequence[Bedingung | None]
+    _baum: Fenwick = field(init=False)
+    _index: dict[str, dict[str, list[int]]] = field(init=False, factory=dict)
+    """Die Geschichten, deren Bedingung von einer Größe abhängt, nach Art und Name der
+    Größe."""
+    _stände: dict[str, tuple[Änderungen, int]] = field(init=False, factory=dict)
+    """Bis wohin die Änderungen jeder Art gelesen wurden."""
+    _immer: list[int] = field(init=False, factory=list)
+    """Die Geschichten, deren Bedingung jedes Mal neu geprüft wird, siehe
+    :py:func:`bedingung.gelesen`."""
+    _gesehen: dict[str, tuple[type, object]] = field(init=False, factory=dict)
+
+    def __attrs_post_init__(self) -> None:
+        if len(self.gewichte) != len(self.bedingungen):
+            raise ValueError("Gewichte und Bedingungen müssen gleich lang sein.")
+        if any(gewicht < 0 for gewicht in self.gewichte):
+            raise ValueError("Gewichte dürfen nicht negativ sein.")
+        for i, bed in enumerate(self.bedingungen):
+            if bed is None:
+                continue
+            größen = bedingung.gelesen(bed)
+            if not größen:
+                self._immer.append(i)
+            for größe in größen or ():
+                art, __, name = größe.partition(":")
+                self._index.setdefault(art, {}).setdefault(name, []).append(i)
+        self._baum = Fenwick([0 if bed else gewicht for gewicht, bed
+                              in zip(self.gewichte, self.bedingungen)])
+
+    def aktualisiere(self, daten: bedingung.Testdaten) -> set[int]:
+        """Prüfe die Bedingungen neu, deren Größen sich geändert haben, und gebe die
+        geprüften Geschichten zurück."""
+        geändert = set(self._immer)
+        for art, index in self._index.items():
+            namen: Iterable[str] = index
+            if (änderungen := bedingung.änderungen(daten, art)) is not None:
+                alt = self._stände.get(art)
+                if alt and alt[0] is änderungen and (
+                        seit := änderungen.seit(alt[1])) is not None:
+                    namen = index.keys() & seit
+                self._stände[art] = änderungen, änderungen.stand
+            for name in namen:
+                größe = f"{art}:{name}"
+                wert = bedingung.lies(daten, größe)
+                if self._gesehen.get(größe) != (gesehen := (type(wert), wert)):
+                    self._gesehen[größe] = gesehen
+                    geändert.update(index[name])
+        for i in sorted(geändert):
+            bed = self.bedingungen[i]
+            self._baum[i] = self.gewichte[i] if bed and bed.übersetzt(daten) else 0
+        return geändert
+
+    def ziehe(self, daten: bedingung.Testdaten, rng: random.Random) -> int:
+        """Ziehe den Index einer möglichen Geschichte, mit Wahrscheinlichkeit nach Gewicht.
+
+        :raises ValueError: wenn keine Geschichte möglich ist.
+        """
+        self.aktualisiere(daten)
+        if not (summe := self._baum.summe):
+            raise ValueError("Keine Geschichte ist gerade möglich.")
+        return self._baum.finde(rng.randrange(summe))
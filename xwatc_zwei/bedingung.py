@@ -1,16 +1,19 @@
 
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from functools import partial
 from itertools import chain
 import math
-from random import random
-from typing import Any, Callable, Protocol, TypeVar, Union, get_type_hints
+import random
+from typing import Any, Callable, Protocol, TypeVar, Union, assert_never, get_type_hints
 
 import cattrs.converters
 from attrs import define
 
 from xwatc_zwei import mänx as mänx_mod
-from xwatc_zwei.geschichte import Item, VarTypError
+from xwatc_zwei.variablen import Änderungen
+from xwatc_zwei.geschichte import (Bedingung, Bedingungsobjekt, FuncBedingung, Item,
+                                   NichtBedingung, OderBedingung, UndBedingung,
+                                   VariablenBedingung, VarTypError)
 
 C = TypeVar("C", bound=Callable)
 
@@ -18,6 +21,11 @@ C = TypeVar("C", bound=Callable)
 class Bedingungsdaten(Protocol):
     def get_mänx(self) -> mänx_mod.Mänx | None: ...
 
+    def get_rng(self) -> random.Random:
+        """Der Zufallsgenerator des Spiels. Alle Zufälle im Spiel sollen ihn benutzen, damit
+        Spiele mit dem gleichen Seed gleich ablaufen."""
+        ...
+
     def assert_get_mänx(self) -> mänx_mod.Mänx:
         """Hole den Mänxen und beschwere dich, wenn er nicht da ist."""
         if mänx := self.get_mänx():
@@ -33,16 +41,55 @@ class Bedingungsdaten(Protocol):
         raise VarTypError("Welt-Eigenschaft gefragt, aber kein Welt.")
 
 
+class Testdaten(Bedingungsdaten, Bedingungsobjekt, Protocol):
+    """Alles, was eine übersetzte Bedingung zum Auswerten braucht."""
+
+
+Test = Callable[[Testdaten], bool]
+"""Eine übersetzte Bedingung."""
+
+
 @define
 class Bedingungsfunc:
     """Eine Funktion, die Bedingungen auswertet."""
     args: Sequence[tuple[Any, bool]]
     callable: Callable
+    wahrscheinlichkeit: Callable[..., float] | None = None
+    """Bei zufälligen Bedingungen die Wahrscheinlichkeit, dass sie erfüllt sind. Bekommt die
+    gleichen Argumente wie :py:attr:`callable`."""
+    liest: Callable[..., Iterable[str]] | None = None
+    """Die Größen, die die Bedingung mit den gegebenen Argumenten (ohne die Daten) liest,
+    siehe :py:func:`gelesen`. None bei zufälligen oder unbekannten."""
 
     @staticmethod
     def by_name(name: str) -> 'Bedingungsfunc | None':
         return _BEDINGUNGEN.get(name)
 
+    def prüfe_argumente(self, func_name: str, args: Sequence[str | int | None]) -> list[Any]:
+        """Prüfe Anzahl und Typen der Argumente und fülle fehlende optionale mit None auf.
+
+        :raises VarTypError: wenn die Argumente nicht passen.
+        """
+        if len(args) > len(self.args):
+            raise VarTypError(f"{func_name} hat {len(args)} statt {len(self.args)} Argumente. "
+                              "Semikolon statt Komma?")
+        args_parsed: list[Any] = []
+        args = [*args] + [None] * (len(self.args) - len(args))
+        for i, (arg, (arg_t, is_opt)) in enumerate(zip(args, self.args, strict=True)):
+            if is_opt and arg is None:
+                args_parsed.append(None)
+            elif arg is None:
+                raise VarTypError(f"{func_name} hat {len(args)} statt {len(self.args)} Argumente. "
+                                  "Komma statt Semikolon?")
+            elif arg_t in (str, int):
+                if not isinstance(arg, arg_t):
+                    raise VarTypError(
+                        f"Das {i+1}-te Argument von {func_name} muss {arg_t.__name__} sein.")
+                args_parsed.append(arg)
+            else:
+                raise ValueError(f"Unbekannter Argumenttyp {arg_t} für {func_name}")
+        return args_parsed
+
 
 def strip_optional(opt: Any) -> tuple[Any, bool]:
     if cattrs.converters.is_union_type(opt):
@@ -57,8 +104,11 @@ def strip_optional(opt: Any) -> tuple[Any, bool]:
 _BEDINGUNGEN = dict[str, Bedingungsfunc]()
 
 
-def bedingung(name: str | Sequence[str] = "") -> Callable[[C], C]:
-    """Markiere eine Funktion als Bedingungsfunktion."""
+def bedingung(name: str | Sequence[str] = "",
+              wahrscheinlichkeit: Callable[..., float] | None = None,
+              liest: Callable[..., Iterable[str]] | None = None) -> Callable[[C], C]:
+    """Markiere eine Funktion als Bedingungsfunktion. Zufällige Bedingungen geben außerdem
+    an, mit welcher Wahrscheinlichkeit sie erfüllt sind, andere, was sie lesen."""
     def wrapper(fn: C) -> C:
         if not name:
             names: Sequence[str] = [fn.__name__.strip("_")]
@@ -69,22 +119,159 @@ def bedingung(name: str | Sequence[str] = "") -> Callable[[C], C]:
         items = [*get_type_hints(fn).items()][1:]
         hints = [strip_optional(typ) for name, typ in items if name not in "_return"]
         for name0 in names:
-            _BEDINGUNGEN[name0] = Bedingungsfunc(hints, fn)
+            _BEDINGUNGEN[name0] = Bedingungsfunc(hints, fn, wahrscheinlichkeit, liest)
         return fn
 
     return wrapper
 
 
+def _variable(variable: str, daten: Testdaten) -> bool:
+    return daten.ist_variable(variable)
+
+
+def _nicht(test: Test, daten: Testdaten) -> bool:
+    return not test(daten)
+
+
+def _und(tests: Sequence[Test], daten: Testdaten) -> bool:
+    for test in tests:
+        if not test(daten):
+            return False
+    return True
+
+
+def _oder(tests: Sequence[Test], daten: Testdaten) -> bool:
+    for test in tests:
+        if test(daten):
+            return True
+    return False
+
+
+def _funktion(func: Callable, args: Sequence[Any], daten: Testdaten) -> bool:
+    return func(daten, *args)
+
+
+def _fehler(typ: type[Exception], meldung: str, daten: Testdaten) -> bool:
+    raise typ(meldung)
+
+
+def übersetze(bed: Bedingung) -> Test:
+    """Übersetze eine Bedingung in eine Funktion, die nur noch mit den Spieldaten aufgerufen
+    wird. Die Bedingungsfunktionen sind dabei schon nachgeschlagen und ihre Argumente geprüft.
+    Fehler in der Bedingung kommen erst beim Auswerten, wie vorher.
+
+    Das Ergebnis besteht nur aus `partial`, damit es sich pickeln lässt.
+    """
+    match bed:
+        case VariablenBedingung(variable=variable):
+            return partial(_variable, variable)
+        case NichtBedingung(bedingung=unterbedingung):
+            return partial(_nicht, unterbedingung.übersetzt)
+        case UndBedingung(bedingungen=[einzige]) | OderBedingung(bedingungen=[einzige]):
+            return einzige.übersetzt
+        case UndBedingung(bedingungen=bedingungen):
+            return partial(_und, tuple(unter.übersetzt for unter in bedingungen))
+        case OderBedingung(bedingungen=bedingungen):
+            return partial(_oder, tuple(unter.übersetzt for unter in bedingungen))
+        case FuncBedingung(func_name, args):
+            func = Bedingungsfunc.by_name(func_name)
+            if not func:
+                return partial(_fehler, VarTypError, f"Unbekannte Regel {func_name}")
+            if bed.geprüfte_args is not None:
+                return partial(_funktion, func.callable, bed.geprüfte_args)
+            try:
+                args_parsed = func.prüfe_argumente(func_name, args)
+            except (VarTypError, ValueError) as fehler:
+                return partial(_fehler, type(fehler), str(fehler))
+            return partial(_funktion, func.callable, tuple(args_parsed))
+        case _:
+            assert_never(bed)
+
+
+def gelesen(bed: Bedingung) -> frozenset[str] | None:
+    """Die Größen, von denen eine Bedingung abhängt: `welt:name` für Weltvariablen,
+    `wert:name` für Attribute und P-Werte und `fähigkeit:name` für Fähigkeiten des Mänxen.
+    Solange sie sich nicht ändern, bleibt das Ergebnis gleich. None, wenn die Bedingung
+    zufällig ist oder etwas anderes liest, z.B. Modulvariablen."""
+    match bed:
+        case VariablenBedingung(variable=variable):
+            if variable.startswith("."):
+                return frozenset([f"welt:{variable[1:]}"])
+            return None
+        case NichtBedingung(bedingung=unter):
+            return gelesen(unter)
+        case UndBedingung(bedingungen=bedingungen) | OderBedingung(bedingungen=bedingungen):
+            größen: set[str] = set()
+            for unter in bedingungen:
+                if (teil := gelesen(unter)) is None:
+                    return None
+                größen |= teil
+            return frozenset(größen)
+        case FuncBedingung(func_name, args):
+            func = Bedingungsfunc.by_name(func_name)
+            if not func or not func.liest:
+                return None
+            if bed.geprüfte_args is not None:
+                return frozenset(func.liest(*bed.geprüfte_args))
+            try:
+                return frozenset(func.liest(*func.prüfe_argumente(func_name, args)))
+            except (VarTypError, ValueError):
+                return None
+        case _:
+            assert_never(bed)
+
+
+def lies(daten: Bedingungsdaten, größe: str) -> object:
+    """Der aktuelle Wert einer Größe aus :py:func:`gelesen`."""
+    art, __, name = größe.partition(":")
+    if art == "welt":
+        welt = daten.get_welt()
+        return welt.get_variable(name, False) if welt else None
+    mänx = daten.get_mänx()
+    if not mänx:
+        return None
+    if art == "wert":
+        return mänx.get_wert(name)
+    if art == "fähigkeit":
+        return mänx.get_fähigkeit(name)
+    raise ValueError(f"Unbekannte Größe {größe}")
+
+
+def änderungen(daten: Bedingungsdaten, art: str) -> Änderungen | None:
+    """Wo die Änderungen der Größen einer Art (`welt`, `wert` oder `fähigkeit`) gemerkt
+    werden, None ohne Welt oder Mänx."""
+    if art == "welt":
+        welt = daten.get_welt()
+        return welt.änderungen if welt else None
+    mänx = daten.get_mänx()
+    if not mänx:
+        return None
+    if art == "wert":
+        return mänx.änderungen_werte
+    if art == "fähigkeit":
+        return mänx.änderungen_fähigkeiten
+    raise ValueError(f"Unbekannte Art von Größen {art}")
+
+
 def wert_bedingung(daten: Bedingungsdaten, wert: int, attrib: str) -> bool:
     return daten.assert_get_mänx().get_wert(attrib) >= wert
 
 
+def _liest_wert(attrib: str, wert: int) -> list[str]:
+    return [f"wert:{attrib}"]
+
+
 for wert in chain(mänx_mod.Mänx.ATTRIBUTE, mänx_mod.Mänx.P_WERTE):
     _BEDINGUNGEN[wert] = Bedingungsfunc(
-        [(int, False)], partial(wert_bedingung, attrib=wert))
+        [(int, False)], partial(wert_bedingung, attrib=wert),
+        liest=partial(_liest_wert, wert))
 
 
-@bedingung(name=["f", "fähig"])
+def _liest_fähigkeit(fähigkeit: str, wert: int | None) -> list[str]:
+    return [f"fähigkeit:{fähigkeit}"]
+
+
+@bedingung(name=["f", "fähig"], liest=_liest_fähigkeit)
 def fähig(daten: Bedingungsdaten, fähigkeit: str, wert: None | int = None) -> bool:
     if wert is None:
         wert = 1
@@ -98,18 +285,24 @@ def hat(daten: Bedingungsdaten, item: str) -> bool:
     return False
 
 
-@bedingung()
-def wurf(daten: Bedingungsdaten, eigenschaft: str, ziel: int) -> bool:
+def _wurf_wkeit(daten: Bedingungsdaten, eigenschaft: str, ziel: int) -> float:
     wert = daten.assert_get_mänx().get_wert(eigenschaft)
     log = math.log1p((wert-ziel) / ziel)
-    wkeit = (log/math.log(2) + 1) / 2
-    return random() < wkeit
+    return min(1., max(0., (log/math.log(2) + 1) / 2))
 
 
-@bedingung()
+@bedingung(wahrscheinlichkeit=_wurf_wkeit)
+def wurf(daten: Bedingungsdaten, eigenschaft: str, ziel: int) -> bool:
+    return daten.get_rng().random() < _wurf_wkeit(daten, eigenschaft, ziel)
+
+
+def _glück_wkeit(daten: Bedingungsdaten, ziel: int) -> float:
+    return min(1., max(0., ziel / 100))
+
+
+@bedingung(wahrscheinlichkeit=_glück_wkeit)
 def glück(daten: Bedingungsdaten, ziel: int) -> bool:
-    wkeit = ziel / 100
-    return random() < wkeit
+    return daten.get_rng().random() < _glück_wkeit(daten, ziel)
 
 
 @bedingung()
@@ -0,0 +1,418 @@
+"""Erkundet alle Wege durch eine Geschichte und berechnet, wie wahrscheinlich jedes Ende ist.
+
+Anders als :py:mod:`xwatc_zwei.simulation` wird nicht gewürfelt: `wurf` und `glück` sind
+Verzweigungen mit ihrer Wahrscheinlichkeit, an Entscheidungen wählt der Spieler gleichverteilt
+unter den freien Wahlen. Zustände mit gleichem Befehl und gleichen Variablen werden über eine
+Hashtabelle zusammengelegt, sonst wächst die Zahl der Wege mit jeder verschachtelten
+Entscheidung exponentiell. Außerdem werden Fälle und Wahlen gemeldet, die bei den gegebenen
+Wertebereichen des Mänxen nie genommen werden können. Aufruf::
+
+    python -m xwatc_zwei.erkundung level/Huhn.cfg --bereich 1:100
+"""
+import argparse
+from collections import deque
+from collections.abc import Hashable, Mapping, Sequence
+import math
+from pathlib import Path
+import random
+import time
+from typing import cast
+
+from attrs import Factory, define, evolve
+
+from xwatc_zwei import bedingung, loader
+from xwatc_zwei.analyse import Art, Befund
+from xwatc_zwei.geschichte import (Bedingung, Entscheidung, FuncBedingung, IfElif,
+                                   NichtBedingung, OderBedingung, SetzeVariable, UndBedingung,
+                                   VariablenBedingung, VarTypError)
+from xwatc_zwei.mänx import Mänx, Welt
+from xwatc_zwei.programm import Op, Programm, ortsname
+from xwatc_zwei.simulation import Ausgang
+from xwatc_zwei.verteiler import Geschichte, Spielzustand, Verteiler, Weltposition
+
+Bereiche = Mapping[str, tuple[int, int]]
+"""Die möglichen Werte von Attributen und P-Werten des Mänxen, jeweils (kleinster, größter)."""
+
+_Wkeit = tuple[float, float, float]
+"""Die Wahrscheinlichkeit mit dem gegebenen Mänxen und die kleinste und größte über alle
+Mänxe in den Bereichen."""
+
+
+@define
+class Erkundung:
+    """Das Ergebnis von :py:func:`erkunde`."""
+    ausgänge: dict[Ausgang, float]
+    """Wie wahrscheinlich jeder Ausgang ist, siehe :py:data:`xwatc_zwei.simulation.Ausgang`.
+    Zusätzlich zu denen der Simulation gibt es "unbekannt" für Sprünge ins Nichts und
+    "schleife", wenn die Geschichte nie endet."""
+    nie_genommen: list[Befund]
+    zustände: int
+    """Die Zahl der verschiedenen Zustände an Verzweigungen und Ausgängen."""
+    übergänge: int
+    zusammengelegt: int
+    """Wie oft ein Übergang bei einem schon bekannten Zustand gelandet ist."""
+    dauer: float = 0.
+
+    def bericht(self) -> str:
+        """Eine Zusammenfassung zum Ausgeben."""
+        zeilen = [f"{self.zustände} Zustände, {self.übergänge} Übergänge, davon "
+                  f"{self.zusammengelegt} zusammengelegt, in {self.dauer:.2f}s", "", "Ausgänge:"]
+        for (art, pfad, block), wkeit in sorted(self.ausgänge.items(), key=lambda x: -x[1]):
+            zeilen.append(f"  {wkeit:7.2%}  {art:<10}{pfad}/{block}")
+        if self.nie_genommen:
+            zeilen += ["", "Nie genommen:"]
+            zeilen += [f"  {befund}" for befund in self.nie_genommen]
+        return "\n".join(zeilen)
+
+
+@define
+class _MitMänx(bedingung.Bedingungsdaten):
+    """Die Daten eines Zustands, aber mit einem anderen Mänxen."""
+    zustand: Spielzustand
+    mänx: Mänx
+
+    def get_mänx(self) -> Mänx | None:
+        return self.mänx
+
+    def get_welt(self) -> Welt | None:
+        return self.zustand.get_welt()
+
+    def get_rng(self) -> random.Random:
+        return self.zustand.get_rng()
+
+
+@define
+class _Knoten:
+    nachfolger: list[tuple[float, Hashable]] = Factory(list)
+    ausgänge: dict[Ausgang, float] = Factory(dict)
+
+
+@define
+class _Erkunder:
+    geschichte: Geschichte
+    grenzen: Sequence[Mänx]
+    """Die Mänxe an den Rändern der Bereiche."""
+    zusammenlegen: bool
+    max_zustände: int
+    max_schritte: int
+    knoten: dict[Hashable, _Knoten] = Factory(dict)
+    möglich: dict[tuple[int, int], bool] = Factory(dict)
+    """Ob ein Zweig genommen werden kann, nach dem Befehl und der Nummer des Zweigs. Bei
+    :py:attr:`Op.WENN` ist 0 erfüllt und 1 nicht erfüllt, bei :py:attr:`Op.WAHL` die Wahl."""
+    _offen: deque[tuple[Hashable, Spielzustand]] = Factory(deque)
+    übergänge: int = 0
+    zusammengelegt: int = 0
+
+    @property
+    def programm(self) -> Programm:
+        return self.geschichte.programm
+
+    def wkeit(self, bed: Bedingung, zustand: Spielzustand) -> _Wkeit:
+        """Die Wahrscheinlichkeit, dass eine Bedingung erfüllt ist. Jeder Aufruf einer
+        zufälligen Bedingung würfelt neu, die Teile sind also unabhängig."""
+        match bed:
+            case VariablenBedingung(variable=variable):
+                wert = float(zustand.ist_variable(variable))
+                return wert, wert, wert
+            case NichtBedingung(bedingung=unter):
+                wert, klein, groß = self.wkeit(unter, zustand)
+                return 1 - wert, 1 - groß, 1 - klein
+            case UndBedingung(bedingungen=bedingungen):
+                teile = [self.wkeit(unter, zustand) for unter in bedingungen]
+                return cast(_Wkeit, tuple(math.prod(spalte) for spalte in zip(*teile)))
+            case OderBedingung(bedingungen=bedingungen):
+                teile = [self.wkeit(unter, zustand) for unter in bedingungen]
+                return cast(_Wkeit, tuple(1 - math.prod(1 - w for w in spalte)
+                                          for spalte in zip(*teile)))
+            case FuncBedingung(func_name, args):
+                func = bedingung.Bedingungsfunc.by_name(func_name)
+                if not func:
+                    raise VarTypError(f"Unbekannte Regel {func_name}")
+                args_parsed = (bed.geprüfte_args if bed.geprüfte_args is not None
+                               else func.prüfe_argumente(func_name, args))
+                if func.wahrscheinlichkeit:
+                    wkeit = func.wahrscheinlichkeit
+                else:
+                    def wkeit(daten: bedingung.Bedingungsdaten, *args) -> float:
+                        return float(func.callable(daten, *args))
+                wert = wkeit(zustand, *args_parsed)
+                andere = [wkeit(_MitMänx(zustand, mänx), *args_parsed) for mänx in self.grenzen]
+                return wert, min([wert, *andere]), max([wert, *andere])
+
+    def teste(self, pc: int, zweig: int, bed: Bedingung | None, zustand: Spielzustand
+              ) -> float:
+        """Die Wahrscheinlichkeit eines Zweigs. Merkt sich, ob er genommen werden kann."""
+        wert, klein, groß = self.wkeit(bed, zustand) if bed else (1., 1., 1.)
+        if groß > 0:
+            self.möglich[pc, zweig] = True
+        else:
+            self.möglich.setdefault((pc, zweig), False)
+        if self.programm.befehle[pc].op is Op.WENN:
+            if klein < 1:
+                self.möglich[pc, 1] = True
+            else:
+                self.möglich.setdefault((pc, 1), False)
+        return wert
+
+    def laufe(self, zustand: Spielzustand) -> str | None:
+        """Lasse den Zustand bis zur nächsten Verzweigung laufen. Gebe die Art des Ausgangs
+        zurück, wenn die Geschichte dort aufhört."""
+        position = zustand.position
+        assert position
+        befehle = self.programm.befehle
+        welt = zustand.assert_get_welt()._variablen
+        pc = position.pc
+        try:
+            for __ in range(self.max_schritte):
+                befehl = befehle[pc]
+                op = befehl.op
+                if op is Op.AUSGABE:
+                    pc += 1
+                elif op is Op.GEHE:
+                    pc = befehl.ziel
+                elif op is Op.SETZE:
+                    position.pc = pc
+                    cast(SetzeVariable, befehl.zeile).ausführen(position.modul_vars, welt)
+                    pc += 1
+                elif op is Op.WENN:
+                    wkeit = self.teste(pc, 0, befehl.bedingung, zustand)
+                    if 0 < wkeit < 1:
+                        return None
+                    pc = pc + 1 if wkeit else befehl.ziel
+                elif op is Op.WAHL:
+                    return None
+                elif op is Op.TREFFEN:
+                    return "treffen"
+                elif op is Op.ENDE:
+                    return "ende"
+                elif op is Op.UNBEKANNT:
+                    return "unbekannt"
+            return "schleife"
+        finally:
+            position.pc = pc
+
+    def schlüssel(self, zustand: Spielzustand) -> Hashable:
+        """Gleiche Schlüssel haben Zustände, die sich ab hier gleich verhalten."""
+        if not self.zusammenlegen:
+            return len(self.knoten)
+        position = zustand.position
+        assert position
+        return (position.pc, frozenset(position.modul_vars.items()),
+                frozenset(zustand.assert_get_welt()._variablen.items()))
+
+    def besuche(self, zustand: Spielzustand) -> Hashable:
+        """Lasse den Zustand bis zur nächsten Verzweigung laufen und lege ihn zu den
+        bekannten, wenn es ihn noch nicht gibt."""
+        art = self.laufe(zustand)
+        schlüssel = self.schlüssel(zustand)
+        if schlüssel in self.knoten:
+            self.zusammengelegt += 1
+            return schlüssel
+        knoten = self.knoten[schlüssel] = _Knoten()
+        position = zustand.position
+        assert position
+        if not art and len(self.knoten) > self.max_zustände:
+            art = "abbruch"
+        if art:
+            knoten.ausgänge[art, self.geschichte.pfad, position.block.id] = 1.
+        else:
+            self._offen.append((schlüssel, zustand))
+        return schlüssel
+
+    def _folge(self, knoten: _Knoten, wkeit: float, zustand: Spielzustand, pc: int,
+               wahl: str | None = None) -> None:
+        kopie = zustand.fork()
+        position = kopie.position
+        assert position
+        position.pc = pc
+        if wahl is not None:
+            position.modul_vars["_"] = wahl
+        self.übergänge += 1
+        knoten.nachfolger.append((wkeit, self.besuche(kopie)))
+
+    def erweitere(self, knoten: _Knoten, zustand: Spielzustand) -> None:
+        """Finde die Nachfolger eines Zustands an einer Verzweigung."""
+        position = zustand.position
+        assert position
+        pc = position.pc
+        befehl = self.programm.befehle[pc]
+        if befehl.op is Op.WENN:
+            wkeit = self.teste(pc, 0, befehl.bedingung, zustand)
+            self._folge(knoten, wkeit, zustand, pc + 1)
+            self._folge(knoten, 1 - wkeit, zustand, befehl.ziel)
+            return
+        wahlen = cast(Entscheidung, befehl.zeile).wahlen
+        anteile, sackgasse = _verteile([self.teste(pc, i, wahl.bedingung, zustand)
+                                        for i, wahl in enumerate(wahlen)])
+        for wahl, anteil, ziel in zip(wahlen, anteile, befehl.ziele):
+            if anteil:
+                self._folge(knoten, anteil, zustand, ziel, wahl.id)
+        if sackgasse:
+            knoten.ausgänge["sackgasse", self.geschichte.pfad, position.block.id] = sackgasse
+
+    def erkunde(self, zustand: Spielzustand) -> Hashable:
+        """Erkunde alle Zustände, die von `zustand` aus erreichbar sind."""
+        start = self.besuche(zustand)
+        while self._offen:
+            schlüssel, zustand = self._offen.popleft()
+            self.erweitere(self.knoten[schlüssel], zustand)
+        return start
+
+    def _nachordnung(self, start: Hashable) -> list[Hashable]:
+        """Die Zustände so sortiert, dass Nachfolger möglichst vor ihren Vorgängern kommen."""
+        reihenfolge = []
+        besucht = {start}
+        stapel = [(start, iter(self.knoten[start].nachfolger))]
+        while stapel:
+            schlüssel, nachfolger = stapel[-1]
+            for __, nächster in nachfolger:
+                if nächster not in besucht:
+                    besucht.add(nächster)
+                    stapel.append((nächster, iter(self.knoten[nächster].nachfolger)))
+                    break
+            else:
+                stapel.pop()
+                reihenfolge.append(schlüssel)
+        return reihenfolge
+
+    def löse(self, start: Hashable, genauigkeit: float = 1e-12, max_runden: int = 10_000
+             ) -> dict[Ausgang, float]:
+        """Berechne die Wahrscheinlichkeiten der Ausgänge. Ohne Schleifen zwischen den
+        Zuständen reicht eine Runde, sonst wird wiederholt, bis sich nichts mehr ändert."""
+        reihenfolge = self._nachordnung(start)
+        werte: dict[Hashable, dict[Ausgang, float]] = {}
+        for __ in range(max_runden):
+            änderung = 0.
+            for schlüssel in reihenfolge:
+                knoten = self.knoten[schlüssel]
+                neu = dict(knoten.ausgänge)
+                for wkeit, nächster in knoten.nachfolger:
+                    for ausgang, wert in werte.get(nächster, {}).items():
+                        neu[ausgang] = neu.get(ausgang, 0.) + wkeit * wert
+                alt = werte.get(schlüssel, {})
+                änderung = max(änderung, max((abs(wert - alt.get(ausgang, 0.))
+                                              for ausgang, wert in neu.items()), default=0.))
+                werte[schlüssel] = neu
+            if änderung < genauigkeit:
+                break
+        ausgänge = werte[start]
+        if (rest := 1 - sum(ausgänge.values())) > 1e-9:
+            ausgänge["schleife", self.geschichte.pfad, ""] = rest
+        return ausgänge
+
+    def nie_genommen(self) -> list[Befund]:
+        """Die Fälle und Wahlen, die bei keinem erreichten Zustand möglich waren. Ein Fall
+        ist auch unmöglich, wenn einer davor immer erfüllt ist."""
+        befunde = []
+        programm = self.programm
+        wenns: dict[int, list[int]] = {}
+        for pc, befehl in enumerate(programm.befehle):
+            if befehl.op is Op.WENN:
+                wenns.setdefault(id(befehl.zeile), []).append(pc)
+        for pc, befehl in enumerate(programm.befehle):
+            ort = ortsname(programm.blöcke[pc].id, programm.positionen[pc])
+            if befehl.op is Op.WAHL:
+                for i, wahl in enumerate(cast(Entscheidung, befehl.zeile).wahlen):
+                    if self.möglich.get((pc, i), True) is False:
+                        befunde.append(Befund(Art.NIE_GENOMMEN, self.geschichte.pfad,
+                                              ort + chr(0x41 + i), wahl.id))
+            elif befehl.op is Op.WENN and wenns[id(befehl.zeile)][0] == pc:
+                if (pc, 0) not in self.möglich:
+                    continue  # nie erreicht, das findet die Analyse
+                fälle = cast(IfElif, befehl.zeile).fälle
+                pcs = iter(wenns[id(befehl.zeile)])
+                for i, (bed, __) in enumerate(fälle):
+                    if bed:
+                        letzter = next(pcs)
+                        möglich = self.möglich.get((letzter, 0), False)
+                    else:
+                        möglich = self.möglich.get((letzter, 1), False)
+                    if not möglich:
+                        befunde.append(Befund(Art.NIE_GENOMMEN, self.geschichte.pfad,
+                                              ort + chr(0x41 + i), "" if bed else "sonst"))
+        return befunde
+
+
+def _verteile(wkeiten: Sequence[float]) -> tuple[list[float], float]:
+    """Wie wahrscheinlich jede Wahl gewählt wird, wenn jede mit ihrer Wahrscheinlichkeit frei
+    ist und der Spieler gleichverteilt unter den freien wählt. Dazu die Wahrscheinlichkeit,
+    dass keine frei ist."""
+    sicher = [i for i, wkeit in enumerate(wkeiten) if wkeit == 1]
+    unsicher = [i for i, wkeit in enumerate(wkeiten) if 0 < wkeit < 1]
+    anteile = [0.] * len(wkeiten)
+    sackgasse = 0.
+    for maske in range(1 << len(unsicher)):
+        frei = sicher.copy()
+        wkeit = 1.
+        for bit, i in enumerate(unsicher):
+            if maske >> bit & 1:
+                frei.append(i)
+                wkeit *= wkeiten[i]
+            else:
+                wkeit *= 1 - wkeiten[i]
+        if not frei:
+            sackgasse += wkeit
+        for i in frei:
+            anteile[i] += wkeit / len(frei)
+    return anteile, sackgasse
+
+
+def erkunde(geschichte: Geschichte, mänx: Mänx | None = None, bereiche: Bereiche = {},
+            zusammenlegen: bool = True, max_zustände: int = 1_000_000,
+            max_schritte: int = 100_000) -> Erkundung:
+    """Erkunde alle Wege durch eine Geschichte.
+
+    :param mänx: Mit diesem Mänxen werden die Wahrscheinlichkeiten berechnet, sonst mit
+    :py:meth:`Mänx.default`.
+    :param bereiche: Ein Zweig wird nur als nie genommen gemeldet, wenn er mit keinem Wert in
+    diesen Bereichen genommen werden kann. Ohne Bereiche zählt nur der Mänx.
+    :param zusammenlegen: Ohne Zusammenlegen wird jeder Weg einzeln erkundet, nur zum Messen.
+    :param max_zustände: Danach werden Zustände nicht mehr erkundet, sondern als "abbruch"
+    gezählt.
+    :param max_schritte: So viele Befehle ohne Verzweigung gelten als Endlosschleife.
+    :raises ValueError: bei einem Bereich für einen unbekannten Wert.
+    """
+    start = time.perf_counter()
+    mänx = mänx or Mänx.default()
+    grenzen = []
+    if bereiche:
+        namen = (*Mänx.ATTRIBUTE, *Mänx.P_WERTE)
+        if unbekannt := set(bereiche) - set(namen):
+            raise ValueError(f"Unbekannte Werte: {', '.join(sorted(unbekannt))}")
+        werte = {name: mänx.get_wert(name) for name in namen}
+        for grenze in (0, 1):
+            grenzen.append(evolve(mänx, werte={
+                **werte, **{name: bereich[grenze] for name, bereich in bereiche.items()}}))
+    erkunder = _Erkunder(geschichte, grenzen, zusammenlegen, max_zustände, max_schritte)
+    zustand = Spielzustand(Verteiler.aus_geschichte(geschichte), Weltposition.start(geschichte),
+                           mänx.fork(), Welt())
+    wurzel = erkunder.erkunde(zustand)
+    return Erkundung(erkunder.löse(wurzel), erkunder.nie_genommen(), len(erkunder.knoten),
+                     erkunder.übergänge, erkunder.zusammengelegt,
+                     time.perf_counter() - start)
+
+
+def _bereich(text: str) -> tuple[str, tuple[int, int]]:
+    name, __, bereich = text.rpartition("=")
+    klein, __, groß = bereich.partition(":")
+    return name, (int(klein), int(groß or klein))
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("datei", type=Path, help="Eine Geschichte (.cfg)")
+    parser.add_argument("--bereich", action="append", type=_bereich, default=[],
+                        help="MIN:MAX für alle Werte oder NAME=MIN:MAX für einen, mehrfach")
+    parser.add_argument("--max-zustände", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    bereiche: dict[str, tuple[int, int]] = {}
+    for name, bereich in args.bereich:
+        for wert in ((*Mänx.ATTRIBUTE, *Mänx.P_WERTE) if not name else (name,)):
+            bereiche[wert] = bereich
+    erkundung = erkunde(loader.load_geschichte(args.datei.resolve()), bereiche=bereiche,
+                        max_zustände=args.max_zustände)
+    print(erkundung.bericht())
+
+
+if __name__ == "__main__":
+    main()
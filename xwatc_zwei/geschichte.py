@@ -1,7 +1,14 @@
-"""Die einzelnen Befehle innerhalb einer Geschichte"""
-from collections.abc import Sequence
+"""Die einzelnen Befehle innerhalb einer Geschichte
+
+Die Zeilen und Bedingungen sind unveränderlich: Listen werden beim Erzeugen zu Tupeln, Ids,
+Namen und Texte werden internalisiert und die Unterblöcke von Fällen und Wahlen stehen fertig
+in `blocks`.
+"""
+from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping, Sequence
 from enum import Enum
-from typing import Protocol, assert_never
+from functools import cached_property
+import sys
+from typing import Protocol, assert_never, cast
 
 from attrs import define, field, validators
 
@@ -12,6 +19,37 @@ Item = str
 Identifier = str
 
 
+def _intern(wert: str) -> str:
+    """Strings werden internalisiert, damit gleiche Ids, Texte und Argumente nur einmal im
+    Speicher liegen."""
+    return sys.intern(wert) if type(wert) is str else wert
+
+
+def _intern_wert(wert: VarTyp) -> VarTyp:
+    return sys.intern(wert) if type(wert) is str else wert
+
+
+def _intern_ziel(ziel: 'Identifier | Sonderziel') -> 'Identifier | Sonderziel':
+    return sys.intern(ziel) if type(ziel) is str else ziel
+
+
+def _intern_args(werte: Iterable[str | int]) -> tuple[str | int, ...]:
+    return tuple(_intern_wert(wert) for wert in werte)
+
+
+def _bedingungen(bedingungen: 'Iterable[Bedingung]') -> 'tuple[Bedingung, ...]':
+    return tuple(bedingungen)
+
+
+def zeilentupel(zeilen: 'Iterable[Zeile]') -> 'tuple[Zeile, ...]':
+    """Macht einen Block unveränderlich, als Konverter für attrs-Felder."""
+    return tuple(zeilen)
+
+
+def _wahlen(wahlen: 'Iterable[Wahlmöglichkeit]') -> 'tuple[Wahlmöglichkeit, ...]':
+    return tuple(wahlen)
+
+
 class VarTypError(RuntimeError):
     """Ein Fehler, wenn der Typ einer Variable nicht stimmt."""
 
@@ -20,14 +58,25 @@ class Bedingungsobjekt(Protocol):
     def ist_variable(self, variable: str) -> bool:
         """Teste, ob eine Variable gesetzt ist."""
 
-    def teste_funktion(self, func_name: str, args: list[str | int]) -> bool:
+    def teste_funktion(self, func_name: str, args: Sequence[str | int]) -> bool:
         """Teste eine Bedingungsfunktion."""
 
 
-@define
-class VariablenBedingung:
+@define(frozen=True)
+class _Übersetzbar:
+    """Basis der Bedingungen, die sich ihre übersetzte Form merken."""
+
+    @cached_property
+    def übersetzt(self) -> 'bedingung_mod.Test':
+        """Die Bedingung als Funktion, siehe :py:func:`xwatc_zwei.bedingung.übersetze`."""
+        return bedingung_mod.übersetze(cast(Bedingung, self))
+
+
+@define(frozen=True)
+class VariablenBedingung(_Übersetzbar):
     """Teste eine Variable"""
-    variable: Identifier = field(validator=validators.instance_of(Identifier))
+    variable: Identifier = field(converter=_intern,
+                                 validator=validators.instance_of(Identifier))
 
     def test(self, zustand: Bedingungsobjekt) -> bool:
         return zustand.ist_variable(self.variable)
@@ -36,34 +85,36 @@ class VariablenBedingung:
         return self.variable
 
 
-@define
-class NichtBedingung:
+@define(frozen=True)
+class NichtBedingung(_Übersetzbar):
     bedingung: 'Bedingung'
 
     def test(self, zustand: Bedingungsobjekt) -> bool:
         return not self.bedingung.test(zustand)
 
 
-@define
-class OderBedingung:
-    bedingungen: 'list[Bedingung]'
+@define(frozen=True)
+class OderBedingung(_Übersetzbar):
+    bedingungen: 'Sequence[Bedingung]' = field(converter=_bedingungen)
 
     def test(self, zustand: Bedingungsobjekt) -> bool:
         return any(bed.test(zustand) for bed in self.bedingungen)
 
 
-@define
-class UndBedingung:
-    bedingungen: 'list[Bedingung]'
+@define(frozen=True)
+class UndBedingung(_Übersetzbar):
+    bedingungen: 'Sequence[Bedingung]' = field(converter=_bedingungen)
 
     def test(self, zustand: Bedingungsobjekt) -> bool:
         return all(bed.test(zustand) for bed in self.bedingungen)
 
 
-@define
-class FuncBedingung:
-    func_name: str = field(validator=validators.instance_of(str))
-    args: list[str | int]
+@define(frozen=True)
+class FuncBedingung(_Übersetzbar):
+    func_name: str = field(converter=_intern, validator=validators.instance_of(str))
+    args: Sequence[str | int] = field(converter=_intern_args)
+    geprüfte_args: tuple | None = field(default=None, init=False, eq=False, repr=False)
+    """Die Argumente, aufgefüllt und geprüft von :py:func:`teste_bedingung`, sonst None."""
 
     def test(self, zustand: Bedingungsobjekt) -> bool:
         return zustand.teste_funktion(self.func_name, self.args)
@@ -78,17 +129,17 @@ Bedingung = NichtBedingung | OderBedingung | UndBedingung | FuncBedingung | Vari
 @define(frozen=True)
 class Text:
     """Eine Textausgabe in der Geschichte"""
-    text: str
+    text: str = field(converter=_intern)
 
     @property
     def blocks(self) -> 'Sequence[Sequence[Zeile]]':
         return ()
 
 
-@define
+@define(frozen=True)
 class Erhalten:
     """Der Hauptcharakter erhält etwas."""
-    objekt: Item
+    objekt: Item = field(converter=_intern)
     anzahl: int = 1
 
     @property
@@ -96,11 +147,11 @@ class Erhalten:
         return ()
 
 
-@define
+@define(frozen=True)
 class Treffen:
     """Ein Treffen, z.B. ein Kampf"""
-    typ: str
-    args: Sequence[str | int]
+    typ: str = field(converter=_intern)
+    args: Sequence[str | int] = field(converter=_intern_args)
 
     @property
     def blocks(self) -> 'Sequence[Sequence[Zeile]]':
@@ -112,44 +163,50 @@ class Sonderziel(Enum):
     Self = 0
 
 
-@define
+@define(frozen=True)
 class Sprung:
     """Die Geschichte wird woanders fortgesetzt. Sollte nur am Ende eines Blockes sein."""
-    ziel: Identifier | Sonderziel
+    ziel: Identifier | Sonderziel = field(converter=_intern_ziel)
 
     @property
     def blocks(self) -> 'Sequence[Sequence[Zeile]]':
         return ()
 
 
-@define
+@define(frozen=True)
 class Wahlmöglichkeit:
     """Eine von mehreren Wahlmöglichkeiten einer Entscheidung."""
-    id: str
-    text: str
-    block: 'Sequence[Zeile]'
+    id: str = field(converter=_intern)
+    text: str = field(converter=_intern)
+    block: 'Sequence[Zeile]' = field(converter=zeilentupel)
     bedingung: Bedingung | None = field(
         default=None, validator=validators.instance_of(None | Bedingung))  # type: ignore
 
 
-@define
+@define(frozen=True)
 class Entscheidung:
     """Eine Entscheidung, die dem Spieler präsentiert wird"""
-    wahlen: Sequence[Wahlmöglichkeit]
+    wahlen: Sequence[Wahlmöglichkeit] = field(converter=_wahlen)
+    blocks: 'Sequence[Sequence[Zeile]]' = field(init=False, eq=False, repr=False)
 
-    @property
-    def blocks(self) -> 'Sequence[Sequence[Zeile]]':
-        return [wahl.block for wahl in self.wahlen]
+    def __attrs_post_init__(self) -> None:
+        object.__setattr__(self, "blocks", tuple(wahl.block for wahl in self.wahlen))
 
     @staticmethod
     def neue_bestätigung() -> 'Entscheidung':
         return Entscheidung([Wahlmöglichkeit("", "Weiter", [])])
 
 
-@define
+def _fälle(fälle: 'Iterable[tuple[Bedingung | None, Iterable[Zeile]]]'
+           ) -> 'tuple[tuple[Bedingung | None, Sequence[Zeile]], ...]':
+    return tuple((bed, tuple(block)) for bed, block in fälle)
+
+
+@define(frozen=True)
 class IfElif:
     """Eine Reihe von Fallunterscheidungen."""
-    fälle: 'Sequence[tuple[Bedingung | None, Sequence[Zeile]]]' = field()
+    fälle: 'Sequence[tuple[Bedingung | None, Sequence[Zeile]]]' = field(converter=_fälle)
+    blocks: 'Sequence[Sequence[Zeile]]' = field(init=False, eq=False, repr=False)
 
     @fälle.validator
     def _validate_fälle(self, _attrib, value):
@@ -157,19 +214,19 @@ class IfElif:
             if not isinstance(bed, None | Bedingung):
                 raise TypeError("Bedingungen in IfElif müssen None oder Bedingung sein.")
 
-    @property
-    def blocks(self) -> 'Sequence[Sequence[Zeile]]':
-        return [fall[1] for fall in self.fälle]
+    def __attrs_post_init__(self) -> None:
+        object.__setattr__(self, "blocks", tuple(fall[1] for fall in self.fälle))
 
 
-@define
+@define(frozen=True)
 class SetzeVariable:
     """Zeile, die eine Variable setzt."""
-    variable: str
-    wert: VarTyp
-    operator: str = "="
+    variable: str = field(converter=_intern)
+    wert: VarTyp = field(converter=_intern_wert)
+    operator: str = field(default="=", converter=_intern)
 
-    def ausführen(self, locals: dict[str, VarTyp], globals: None | dict[str, VarTyp]) -> None:
+    def ausführen(self, locals: MutableMapping[str, VarTyp],
+                  globals: None | MutableMapping[str, VarTyp]) -> None:
         if self.variable.startswith("."):
             var = self.variable.removeprefix(".")
             if globals is None:
@@ -197,50 +254,116 @@ FunktionsZeile = Sprung | IfElif | SetzeVariable
 Zeile = OutputZeile | InputZeile | FunktionsZeile
 
 
-def teste_block(block: Sequence[Zeile], name: str) -> None:
-    """Teste Blöcke auf eindeutige, dumme Fehler, wie Sprünge vor Ende, oder falsche Typen."""
-    # TODO Fehlende Tests: Variablen, die nicht gesetzt werden; Sprünge ins nichts
+def alle_zeilen(block: Sequence[Zeile]) -> Iterator[Zeile]:
+    """Gehe durch alle Zeilen eines Blocks, auch die in Unterblöcken."""
+    for zeile in block:
+        yield zeile
+        for unterblock in zeile.blocks:
+            yield from alle_zeilen(unterblock)
+
+
+Quellzeilen = tuple[int, int]
+"""Die erste und letzte Zeile in der Datei, ab 1 gezählt."""
+
+
+def ordne_quelle(block: Sequence[Zeile], orte: Mapping[int, Quellzeilen],
+                 geteilt: dict[tuple[int, ...], tuple[int, ...]], prefix: tuple[int, ...] = ()
+                 ) -> Iterator[tuple[tuple[int, ...], Quellzeilen]]:
+    """Ordne den Positionen eines Blocks die Zeilen in der Datei zu. `orte` hat die Zeilen der
+    Objekte nach ihrer `id`, wie sie ein Parser beim Erzeugen sammelt. Die Köpfe von Fällen
+    und Wahlen stehen unter der Position des Unterblocks, z.B. ``(2, 1)``. Ihre Unterblöcke
+    müssen dafür schon als Tupel erzeugt werden, sonst kopieren Fall und Wahl sie in neue.
+
+    :param geteilt: Sammelt die Tupel der Positionen und Zeilen, damit gleiche nur einmal im
+    Speicher liegen. Der Parser hält es für eine Datei.
+    """
+    teile = geteilt.setdefault
+    for i, zeile in enumerate(block):
+        pos = (*prefix, i)
+        pos = teile(pos, pos)
+        if (ort := orte.get(id(zeile))) is not None:
+            yield pos, teile(ort, ort)  # type: ignore
+        for j, unterblock in enumerate(zeile.blocks):
+            unterpos = (*pos, j)
+            unterpos = teile(unterpos, unterpos)
+            if (ort := orte.get(id(unterblock))) is not None:
+                yield unterpos, teile(ort, ort)  # type: ignore
+            yield from ordne_quelle(unterblock, orte, geteilt, unterpos)
+
+
+def teste_block(block: Sequence[Zeile], name: str,
+                ort: Callable[[tuple[int, ...]], str | None] | None = None,
+                pos: tuple[int, ...] = ()) -> None:
+    """Teste Blöcke auf eindeutige, dumme Fehler, wie Sprünge vor Ende, oder falsche Typen.
+
+    :param ort: Gibt zu einer Position die Stelle in der Datei zurück, z.B. `datei:zeile`.
+    Fehlermeldungen beginnen dann damit.
+    :param pos: Die Position des Blocks, wenn er ein Unterblock ist.
+    """
+    # Variablen, die nicht gesetzt werden, und Sprünge ins Nichts findet xwatc_zwei.analyse
+    def fehler(typ: type[Exception], meldung: str, *unterpos: int) -> Exception:
+        if ort and (stelle := ort((*pos, *unterpos))):
+            return typ(f"{stelle}: {meldung}")
+        return typ(meldung)
+
     for i, element in enumerate(block):
         if isinstance(element, Sprung) and i != len(block) - 1:
-            raise ValueError(f"Sprung ist nicht letztes Element ({name})")
+            raise fehler(ValueError, f"Sprung ist nicht letztes Element ({name})", i)
         elif isinstance(element, IfElif):
             for j, (bed, unterblock) in enumerate(element.fälle):
-                teste_bedingung(bed, f"{name}.{i+1}{chr(0x41+j)}")
-                teste_block(unterblock, f"{name}.{i+1}{chr(0x41+j)}")
+                try:
+                    teste_bedingung(bed, f"{name}.{i+1}{chr(0x41+j)}")
+                except VarTypError as err:
+                    raise fehler(VarTypError, str(err), i, j) from None
+                teste_block(unterblock, f"{name}.{i+1}{chr(0x41+j)}", ort, (*pos, i, j))
                 if not bed and j != len(element.fälle) - 1:
-                    raise ValueError(f"Leere Bedingung {name}.{i+1}{chr(0x41+j)} "
-                                     "ist nicht letztes Element")
+                    raise fehler(ValueError, f"Leere Bedingung {name}.{i+1}{chr(0x41+j)} "
+                                 "ist nicht letztes Element", i, j)
             if len(element.fälle) == 1 and not element.fälle[0]:
-                raise ValueError(f"Einzige Bedingung ist leer. ({name})")
+                raise fehler(ValueError, f"Einzige Bedingung ist leer. ({name})", i)
         elif isinstance(element, Entscheidung):
             for j, wahl in enumerate(element.wahlen):
-                teste_bedingung(wahl.bedingung, f"{name}.{i+1}{chr(0x41+j)}")
-                teste_block(wahl.block, f"{name}.{i+1}{chr(0x41+j)}")
+                try:
+                    teste_bedingung(wahl.bedingung, f"{name}.{i+1}{chr(0x41+j)}")
+                except VarTypError as err:
+                    raise fehler(VarTypError, str(err), i, j) from None
+                teste_block(wahl.block, f"{name}.{i+1}{chr(0x41+j)}", ort, (*pos, i, j))
             if len({wahl.id for wahl in element.wahlen}) != len(element.wahlen):
-                raise ValueError(f"Doppelt vergebene Wahl in {name}")
+                raise fehler(ValueError, f"Doppelt vergebene Wahl in {name}", i)
         elif not isinstance(element, Zeile):
-            raise TypeError(f"{element} ist keine Zeile! ({name})")
+            raise fehler(TypeError, f"{element} ist keine Zeile! ({name})", i)
+
 
+def teste_bedingung(bedingung: Bedingung | None, name: str, nur_welt: bool = False) -> None:
+    """Teste Bedingungen auf Fehler, wie z.B. fehlende Funktionen oder falsche Argumente.
+    Geprüfte Funktionsaufrufe merken sich ihre Argumente, damit sie zur Laufzeit nicht noch
+    einmal geprüft werden.
 
-def teste_bedingung(bedingung: Bedingung | None, name: str) -> None:
-    """Teste Bedingungen auf Fehler, wie z.B. fehlende Funktionen."""
+    :param nur_welt: Verbiete Modulvariablen, z.B. im Verteiler, wo es keine gibt.
+    """
     match bedingung:
         case None:
             return
         case UndBedingung(bedingungen=bedingungen) | OderBedingung(bedingungen=bedingungen):
             for unterbedingung in bedingungen:
-                teste_bedingung(unterbedingung, name)
+                teste_bedingung(unterbedingung, name, nur_welt)
         case NichtBedingung(bedingung=bedingung):
-            teste_bedingung(bedingung, name)
-        case VariablenBedingung():
-            pass  # TODO Variablen-Check
+            teste_bedingung(bedingung, name, nur_welt)
+        case VariablenBedingung(variable=variable):
+            if nur_welt and not variable.startswith("."):
+                raise VarTypError(f"Bedingung {name}: {variable} ist eine Modulvariable, "
+                                  f"hier gibt es nur Weltvariablen wie .{variable}.")
         case FuncBedingung(func_name, args):
             bfunc = bedingung_mod.Bedingungsfunc.by_name(func_name)
             if bfunc is None:
                 raise VarTypError(f"Bedingung {name}: Funktion {func_name} ist nicht bekannt.")
-            # TODO Typ-Check?
+            try:
+                object.__setattr__(bedingung, "geprüfte_args",
+                                   tuple(bfunc.prüfe_argumente(func_name, args)))
+            except VarTypError as fehler:
+                raise VarTypError(f"Bedingung {name}: {fehler}") from None
         case _:
             assert_never(bedingung)
 
 
-from xwatc_zwei import verteiler, bedingung as bedingung_mod  # noqa
+from xwatc_zwei import bedingung as bedingung_mod  # noqa
@@ -1,12 +1,16 @@
 """Das User-Interface für das Spiel, sowie die Hauptklasse."""
 import sys
+from collections.abc import Sequence
+from pathlib import Path
+import traceback
 from typing import Self, assert_never
+from PyQt5.QtCore import QFileSystemWatcher
 from PyQt5.QtWidgets import QApplication, QLabel, QWidget, QVBoxLayout, QPushButton
 from attrs import define, field
 
 from xwatc_zwei import LEVELS, loader, verteiler
 from xwatc_zwei import geschichte
-from xwatc_zwei.geschichte import Entscheidung, Erhalten, Text, Treffen
+from xwatc_zwei.geschichte import Entscheidung, Erhalten, InputZeile, OutputZeile, Text, Treffen
 
 
 @define
@@ -56,14 +60,41 @@ class Hauptfenster:
 class Controller:
     fenster: Hauptfenster
     model: verteiler.Spielzustand | None = None
+    watcher: QFileSystemWatcher | None = None
 
     def __attrs_post_init__(self):
         # self.view.button.clicked.connect(self.change_text)
         self.next()
 
+    def beobachte(self) -> None:
+        """Lade die Dateien der Geschichten neu, sobald sie gespeichert werden."""
+        assert self.model
+        self.watcher = QFileSystemWatcher(
+            [str(loader.geschichte_datei(pfad)) for pfad in self.model.verteiler.pfade()])
+        self.watcher.fileChanged.connect(self.neu_laden)
+
+    def neu_laden(self, datei: str) -> None:
+        assert self.model and self.watcher
+        # Manche Editoren ersetzen die Datei, dann wird sie nicht mehr beobachtet.
+        if datei not in self.watcher.files():
+            self.watcher.addPath(datei)
+        try:
+            loader.lade_neu(self.model, Path(datei))
+        except Exception:
+            traceback.print_exc()
+            return
+        if self.model.position:
+            outputs, choice = self.model.fortsetzen()
+            if outputs:
+                self.zeige(outputs, choice)
+            else:
+                self.zeige_wahlen(choice)
+
     def next(self, wahl_id: str | None = None):
         assert self.model
-        outputs, choice = self.model.run(wahl_id or "")
+        self.zeige(*self.model.run(wahl_id or ""))
+
+    def zeige(self, outputs: Sequence[OutputZeile], choice: InputZeile) -> None:
         texts = []
         for zeile in outputs:
             match zeile:
@@ -74,6 +105,10 @@ class Controller:
                 case _:
                     assert_never(zeile)
         self.fenster.set_text(texts)
+        self.zeige_wahlen(choice)
+
+    def zeige_wahlen(self, choice: InputZeile) -> None:
+        assert self.model
         if isinstance(choice, Treffen):
             raise NotImplementedError("Treffen sind nicht implementiert.")
         elif isinstance(choice, Entscheidung):
@@ -89,13 +124,18 @@ class Controller:
 
 
 def main():
+    """Starte das Spiel. Mit `--neu-laden` werden geänderte Geschichten im laufenden Spiel
+    neu geladen."""
     # Qt-Anwendung initialisieren
     app = QApplication(sys.argv)
 
     # Model, View und Controller erstellen
-    zustand = verteiler.Spielzustand.from_verteiler(loader.load_verteiler(LEVELS/"verteiler.json"))
+    zustand = verteiler.Spielzustand.from_verteiler(
+        loader.load_verteiler(LEVELS/"verteiler.json", lazy=True, vorladen=True))
     view = Hauptfenster.create()
     controller = Controller(view, zustand)
+    if "--neu-laden" in sys.argv:
+        controller.beobachte()
 
     # Fenster anzeigen
     view.show()
@@ -1,9 +1,17 @@
 """Lädt Scenarien."""
 
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import hashlib
 import json
+import os
 from os import PathLike
-from typing import Any
+from pathlib import Path
+import pickle
+import tempfile
+import threading
+from typing import Any, Literal, TypeVar
 
 import jsonschema
 import pyparsing as pp
@@ -11,10 +19,37 @@ from attrs import define
 from pyparsing import OpAssoc
 from pyparsing import pyparsing_common as pp_common
 
-from xwatc_zwei import LEVELS, MODULE_PATH, geschichte, verteiler
+from xwatc_zwei import LEVELS, MODULE_PATH, geschichte, verteiler, zeilenparser
+
+T = TypeVar("T")
 
 pp.ParserElement.enable_packrat()
 
+GRAMMATIK_VERSION = 7
+"""Version der Grammatik und der Geschichtsklassen. Muss erhöht werden, wenn sich ändert, was
+beim Parsen herauskommt, damit alte Einträge im Cache verworfen werden."""
+CACHE_PATH = LEVELS / "__cache__"
+"""Der Ordner, in dem geparste Geschichten zwischengespeichert werden."""
+
+_orte = threading.local()
+"""Während :py:func:`load_geschichte` parst, stehen in `_orte.zeilen` die Zeilen der erzeugten
+Objekte nach ihrer id und in `_orte.geteilt` die geteilten Tupel, siehe
+:py:func:`geschichte.ordne_quelle`."""
+
+
+def _merke(string: str, loc: int, toks: pp.ParseResults) -> None:
+    """Parse-Action, die sich die Zeile des erzeugten Objekts merkt."""
+    if (orte := getattr(_orte, "zeilen", None)) is not None:
+        nr = pp.lineno(loc, string)
+        orte[id(toks[-1])] = nr, nr
+
+
+def _merke_wie(objekt: object, erste: object, letzte: object | None = None) -> None:
+    """Gebe einem zusammengesetzten Objekt die Zeilen seiner Teile."""
+    if (orte := getattr(_orte, "zeilen", None)) is not None and id(erste) in orte:
+        orte[id(objekt)] = orte[id(erste)][0], orte[id(letzte or erste)][1]
+
+
 ident = pp_common.identifier.copy().set_whitespace_chars(" \t")  # type: ignore
 NoSlashRest = pp.Regex(r"[^/\n]*").leave_whitespace()
 Header = (pp.Suppress("/") + ident + pp.Suppress("/").set_whitespace_chars(" ") +
@@ -28,13 +63,18 @@ def resolve_header(results: pp.ParseResults) -> list:
     return [results[0]]
 
 
+Header.add_parse_action(_merke)
+
+
 @define
 class _BBlock:
     bed: Any
     block: pp.ParseResults
 
-    def as_tuple(self) -> tuple[geschichte.Bedingung, list[geschichte.Zeile]]:
-        return (self.bed, self.block.as_list())
+    def as_tuple(self) -> tuple[geschichte.Bedingung, tuple[geschichte.Zeile, ...]]:
+        block = tuple(self.block.as_list())
+        _merke_wie(block, self)
+        return (self.bed, block)
 
 
 Zeile = pp.Forward()
@@ -111,6 +151,16 @@ def _resolve_wahlmöglichkeit(wahl: pp.ParseResults) -> geschichte.Wahlmöglichk
     return geschichte.Wahlmöglichkeit(id, text, block, bed)
 
 
+for _element in (Text, Geben, Sprung, Treffen, SetzeVariable, Entscheidungsblock,
+                 Bedingungsblock):
+    _element.add_parse_action(_merke)
+
+
+@Entscheidungsblock.add_parse_action
+def _merke_wahlblock(wahl: pp.ParseResults) -> None:
+    _merke_wie(wahl[0].block, wahl[0])
+
+
 def resolve_block(results: Sequence | pp.ParseResults) -> list:
     ans: list[geschichte.Zeile] = []
     group: list[geschichte.Zeile | _BBlock | geschichte.Wahlmöglichkeit] = []
@@ -127,14 +177,18 @@ def resolve_block(results: Sequence | pp.ParseResults) -> list:
 def _glue_lines(lines: list) -> Sequence[geschichte.Zeile]:
     if not lines:
         return ()
+    ans: geschichte.Zeile
     if isinstance(lines[0], _BBlock):
-        return [geschichte.IfElif(fälle=[line.as_tuple() for line in lines])]
+        ans = geschichte.IfElif(fälle=[line.as_tuple() for line in lines])
     elif isinstance(lines[0], geschichte.Wahlmöglichkeit):
-        return [geschichte.Entscheidung(wahlen=lines)]
-    if isinstance(lines[0], geschichte.Text):
-        return [geschichte.Text(" ".join(text.text for text in lines))]
-    assert isinstance(lines[0], geschichte.Zeile), lines[0]
-    return lines
+        ans = geschichte.Entscheidung(wahlen=lines)
+    elif isinstance(lines[0], geschichte.Text):
+        ans = geschichte.Text(" ".join(text.text for text in lines))
+    else:
+        assert isinstance(lines[0], geschichte.Zeile), lines[0]
+        return lines
+    _merke_wie(ans, lines[0], lines[-1] if isinstance(ans, geschichte.Text) else None)
+    return [ans]
 
 
 _IndentedBlockUngrouped.set_parse_action(resolve_block)
@@ -152,43 +206,248 @@ GeschichteBody = Modul[1, ...]
 
 
 @Modul.set_parse_action
-def resolve_modul(results: pp.ParseResults) -> verteiler.Geschichtsblock:
+def resolve_modul(string: str, loc: int, results: pp.ParseResults) -> verteiler.Geschichtsblock:
     header, *rest = results
     rest = resolve_block(rest)
     assert isinstance(header, str)
-    return verteiler.Geschichtsblock(header, rest)
+    quelle: dict[tuple[int, ...], geschichte.Quellzeilen] = {}
+    if (orte := getattr(_orte, "zeilen", None)) is not None:
+        nr = pp.lineno(loc, string)
+        quelle = dict(geschichte.ordne_quelle(rest, orte, _orte.geteilt))
+        quelle[()] = nr, nr
+    return verteiler.Geschichtsblock(header, rest, quelle)
 
 
-def load_geschichte(path: PathLike) -> verteiler.Geschichte:
-    """Lade ein Szenario aus einer Datei."""
+Parser = Literal["pyparsing", "zeilen"]
+"""Die Parser für Geschichten: Die pyparsing-Grammatik in diesem Modul oder der
+handgeschriebene :py:mod:`xwatc_zwei.zeilenparser`."""
+
+
+def load_geschichte(path: PathLike, cache: bool = True,
+                    parser: Parser = "pyparsing") -> verteiler.Geschichte:
+    """Lade ein Szenario aus einer Datei.
+
+    :param cache: Ob der Cache in :py:data:`CACHE_PATH` verwendet werden soll. Ist die Datei
+    seit dem letzten Laden unverändert, wird sie nicht noch einmal geparst.
+    :param parser: Welcher Parser verwendet wird. Beide erzeugen die gleichen Geschichten.
+    """
     path = LEVELS / path
-    name = str(path.relative_to(LEVELS, walk_up=True)).removesuffix(".cfg")
-    parsed = GeschichteBody.parse_file(path, parse_all=True, encoding="utf-8")
-    vert = verteiler.Geschichte(parsed.as_list(), name)
-    for modul in vert.module:
-        geschichte.teste_block(modul.zeilen, modul.id)
+    if cache:
+        schlüssel = _cache_schlüssel(path)
+        if (vert := _lade_cache(path, schlüssel)) is not None:
+            return vert
+    name = _geschichte_name(path)
+    datei = os.path.normpath(path)
+    try:
+        if parser == "zeilen":
+            module = zeilenparser.parse_datei(path)
+        elif parser == "pyparsing":
+            _orte.zeilen = {}
+            _orte.geteilt = {}
+            try:
+                module = GeschichteBody.parse_file(path, parse_all=True,
+                                                   encoding="utf-8").as_list()
+            finally:
+                del _orte.zeilen, _orte.geteilt
+        else:
+            raise ValueError(f"Unbekannter Parser {parser!r}")
+    except pp.ParseBaseException as err:
+        err.add_note(f"{datei}:{err.lineno}")
+        raise
+    except zeilenparser.ParseFehler as err:
+        err.add_note(f"{datei}:{err.zeile}")
+        raise
+    for modul in module:
+        geschichte.teste_block(modul.zeilen, modul.id, partial(_stelle, datei, modul.quelle))
+    vert = verteiler.Geschichte(module, name, datei)
+    if cache:
+        _schreibe_cache(path, schlüssel, vert)
     return vert
 
 
-def load_verteiler(path: PathLike) -> verteiler.Verteiler:
-    """Lade einen Verteiler."""
+def _stelle(datei: str, quelle: dict[tuple[int, ...], geschichte.Quellzeilen],
+            pos: tuple[int, ...]) -> str | None:
+    """Die Stelle einer Position in der Datei, für :py:func:`geschichte.teste_block`."""
+    return f"{datei}:{quelle[pos][0]}" if pos in quelle else None
+
+
+def _geschichte_name(path: Path) -> str:
+    """Der Pfad einer Geschichte, unter dem der Verteiler sie findet."""
+    return str(path.relative_to(LEVELS, walk_up=True)).removesuffix(".cfg")
+
+
+def geschichte_datei(pfad: str) -> Path:
+    """Die Datei zu einem Pfad einer Geschichte, Umkehrung von :py:attr:`Geschichte.pfad`."""
+    return Path(os.path.normpath(LEVELS / f"{pfad}.cfg"))
+
+
+def lade_neu(zustand: verteiler.Spielzustand, path: PathLike,
+             parser: Parser = "pyparsing") -> verteiler.Geschichte:
+    """Lade eine geänderte Datei neu und tausche ihre Geschichte im laufenden Spiel aus.
+    Nur diese eine Datei wird neu geparst.
+
+    :raises: Die Fehler von :py:func:`load_geschichte`, das Spiel bleibt dann unverändert.
+    """
+    neu = load_geschichte(path, parser=parser)
+    zustand.ersetze_geschichte(neu)
+    return neu
+
+
+def _cache_datei(path: Path) -> Path:
+    """Die Cache-Datei für eine Geschichtsdatei."""
+    pfad_hash = hashlib.sha1(os.fsencode(path.resolve())).hexdigest()[:16]
+    return CACHE_PATH / f"{path.stem}-{pfad_hash}.pickle"
+
+
+def _cache_schlüssel(path: Path) -> tuple[int, str, int, int]:
+    """Alles, was sich ändert, wenn die Datei neu geparst werden muss."""
+    stat = path.stat()
+    return GRAMMATIK_VERSION, str(path.resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def _lade_cache(path: Path, schlüssel: tuple) -> verteiler.Geschichte | None:
+    """Lade eine Geschichte aus dem Cache, wenn der Eintrag noch aktuell ist."""
+    try:
+        with open(_cache_datei(path), "rb") as read:
+            gespeichert, vert = pickle.load(read)
+    except Exception:  # Fehlender oder kaputter Cache, wird einfach neu geschrieben.
+        return None
+    if gespeichert != schlüssel or not isinstance(vert, verteiler.Geschichte):
+        return None
+    return vert
+
+
+def _schreibe_cache(path: Path, schlüssel: tuple, vert: verteiler.Geschichte) -> None:
+    """Schreibe eine Geschichte in den Cache. Fehler beim Schreiben oder Picklen werden
+    ignoriert, dann gibt es eben keinen Cache."""
+    ziel = _cache_datei(path)
+    try:
+        ziel.parent.mkdir(parents=True, exist_ok=True)
+        write = tempfile.NamedTemporaryFile("wb", dir=ziel.parent, delete=False)
+    except OSError:
+        return
+    try:
+        with write:
+            pickle.dump((schlüssel, vert), write, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(write.name, ziel)
+    except (OSError, pickle.PicklingError, RecursionError):
+        pass
+    finally:
+        try:
+            os.unlink(write.name)
+        except FileNotFoundError:
+            pass
+
+
+def load_verteiler(path: PathLike, workers: int | None = None, cache: bool = True,
+                   parser: Parser = "pyparsing", lazy: bool = False,
+                   vorladen: bool = False) -> verteiler.Verteiler:
+    """Lade einen Verteiler.
+
+    Jede Geschichte wird nur einmal geladen, auch wenn sie in mehreren Situationen vorkommt.
+    Geschichten, die nicht im Cache sind, werden parallel in mehreren Prozessen geparst.
+
+    :param workers: Die maximale Anzahl an Prozessen, None für einen pro Kern. Bei 1 wird alles
+    im aktuellen Prozess geladen.
+    :param lazy: Lade Geschichten erst, wenn der Verteiler sie braucht. Dann werden Fehler
+    in Geschichten auch erst dort geworfen.
+    :param vorladen: Lade bei `lazy` die Geschichten der Startsituation im Hintergrund.
+    :raises: Den Fehler der ersten fehlerhaften Geschichte, nach Pfad sortiert.
+    """
     with open(path, "r", encoding="utf-8") as read:
         data = json.load(read)
     with open(MODULE_PATH / "verteiler.schema.json", "r", encoding="utf-8") as read:
         schema = json.load(read)
     jsonschema.validate(data, schema)
     start = data["start"]
+    starter = [_normiere(modul) for modul in data.get("starter", [])]
+    pfade = sorted({_normiere(_modul_datei(modul)) for situation in data["situationen"]
+                    for modul in situation["module"]}.union(starter))
+    geschichten: dict[Path, verteiler.Geschichte | verteiler.Geschichtsverweis]
+    if lazy:
+        geschichten = {pfad: verteiler.Geschichtsverweis(_geschichte_name(pfad), pfad)
+                       for pfad in pfade}
+    else:
+        geschichten = dict(zip(pfade, _lade_alle(pfade, workers, cache, parser)))
     situationen = []
     for situation in data["situationen"]:
+        module: list[dict[str, Any]] = [{"datei": modul} if isinstance(modul, str) else modul
+                                        for modul in situation["module"]]
+        bedingungen = []
+        for modul in module:
+            bed = parse_bedingung(modul["bedingung"]) if "bedingung" in modul else None
+            geschichte.teste_bedingung(bed, f"{situation['id']}/{modul['datei']}",
+                                       nur_welt=True)
+            bedingungen.append(bed)
         situationen.append(verteiler.Situation(
-            situation["id"], [load_geschichte(geschichte) for geschichte in situation["module"]]))
+            situation["id"], [geschichten[_normiere(modul["datei"])] for modul in module],
+            [modul.get("gewicht", 1) for modul in module], bedingungen))
     for sit in situationen:
         if sit.id == start:
             start_sit = sit
             break
     else:
         raise ValueError(f"Die Startsituation {start} ist nicht in der Liste der Situationen.")
-    return verteiler.Verteiler(situationen, start_sit)
+    return verteiler.Verteiler(situationen, start_sit,
+                               lader=partial(load_geschichte, cache=cache, parser=parser),
+                               vorladen=lazy and vorladen,
+                               starter=[geschichten[pfad] for pfad in starter])
+
+
+def _modul_datei(modul: str | dict[str, Any]) -> str:
+    """Die Datei eines Eintrags in `module`, der auch Gewicht und Bedingung haben kann."""
+    return modul if isinstance(modul, str) else modul["datei"]
+
+
+def _normiere(modul: str) -> Path:
+    """Der Pfad einer Geschichte, sodass gleiche Dateien gleiche Pfade haben."""
+    return Path(os.path.normpath(LEVELS / modul))
+
+
+def _lade_alle(pfade: Sequence[Path], workers: int | None, cache: bool,
+               parser: Parser) -> list[verteiler.Geschichte]:
+    """Lade alle Geschichten, die nicht im Cache sind, parallel. Fehler werden in der
+    Reihenfolge der Pfade geworfen, damit immer derselbe Fehler gemeldet wird."""
+    geladen: dict[Path, verteiler.Geschichte] = {}
+    if cache:
+        for pfad in pfade:
+            if (vert := _lade_cache(pfad, _cache_schlüssel(pfad))) is not None:
+                geladen[pfad] = vert
+    fehlend = [pfad for pfad in pfade if pfad not in geladen]
+    if workers == 1 or len(fehlend) <= 1:
+        for pfad in fehlend:
+            geladen[pfad] = _mit_pfad(pfad, load_geschichte, pfad, cache, parser)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_lade_im_prozess, pfad, cache, parser) for pfad in fehlend]
+            try:
+                for pfad, future in zip(fehlend, futures):
+                    geladen[pfad] = _mit_pfad(pfad, future.result)
+            finally:
+                for future in futures:
+                    future.cancel()
+    return [geladen[pfad] for pfad in pfade]
+
+
+def _lade_im_prozess(path: Path, cache: bool, parser: Parser) -> verteiler.Geschichte:
+    """Lade eine Geschichte in einem anderen Prozess. pyparsing-Fehler verweisen auf die
+    Grammatik und lassen sich nicht pickeln, deshalb wird eine Kopie ohne Verweis geworfen."""
+    try:
+        return load_geschichte(path, cache, parser)
+    except pp.ParseBaseException as err:
+        kopie = type(err)(err.pstr, err.loc, err.msg)
+        for notiz in getattr(err, "__notes__", ()):
+            kopie.add_note(notiz)
+        raise kopie from None
+
+
+def _mit_pfad(pfad: Path, func: Callable[..., T], *args: Any) -> T:
+    """Rufe func auf und hänge an einen Fehler den Pfad der Geschichte an."""
+    try:
+        return func(*args)
+    except Exception as err:
+        err.add_note(f"Beim Laden von {pfad}")
+        raise
 
 
 def parse_bedingung(bed_str: str):
@@ -1,19 +1,49 @@
 """The main character, his inventory etc."""
 
-from typing import ClassVar, Self, TypeVar
-from attrs import define, Factory
+from collections.abc import Iterable, Mapping
+from typing import Any, ClassVar, Self, TypeVar
+from attrs import define, field
+
+from xwatc_zwei.variablen import Variablen, Änderungen
 
 T = TypeVar("T")
 VarTyp = bool | int | str
 
 
+def _als_zahlen(daten: Mapping[str, int] | Iterable[tuple[str, int]]) -> Variablen[int]:
+    return Variablen.von(daten)
+
+
+def als_variablen(daten: Mapping[str, VarTyp] | Iterable[tuple[str, VarTyp]]
+                  ) -> Variablen[VarTyp]:
+    """Konverter für Felder mit Variablen, siehe :py:meth:`Variablen.von`."""
+    return Variablen.von(daten)
+
+
 @define
 class Mänx:
     """Der Hauptcharakter"""
     ATTRIBUTE: ClassVar[list[str]] = ["flink", "weise", "schlau", "stark", "wach"]
     P_WERTE: ClassVar[list[str]] = ["selbstsicher", "stabil", "gesellig", "naturliebend"]
-    _werte: dict[str, int]
-    _fähigkeiten: dict[str, int] = Factory(dict)
+    _werte: Variablen[int] = field(converter=_als_zahlen)
+    _fähigkeiten: Variablen[int] = field(factory=Variablen, converter=_als_zahlen)
+
+    def __attrs_post_init__(self) -> None:
+        for variablen in (self._werte, self._fähigkeiten):
+            if variablen.änderungen is None:
+                variablen.änderungen = Änderungen()
+
+    @property
+    def änderungen_werte(self) -> Änderungen:
+        """Die geänderten Attribute und P-Werte."""
+        assert self._werte.änderungen is not None
+        return self._werte.änderungen
+
+    @property
+    def änderungen_fähigkeiten(self) -> Änderungen:
+        """Die geänderten Fähigkeiten."""
+        assert self._fähigkeiten.änderungen is not None
+        return self._fähigkeiten.änderungen
 
     @classmethod
     def default(cls) -> Self:
@@ -33,11 +63,32 @@ class Mänx:
         """Fähigkeitsstufe."""
         return self._fähigkeiten.get(fähigkeit, 0)
 
+    def fork(self) -> 'Mänx':
+        """Eine unabhängige Kopie in O(1), siehe :py:meth:`Variablen.fork`."""
+        return Mänx(self._werte.fork(), self._fähigkeiten.fork())
+
+    def speichern(self) -> dict[str, Any]:
+        return {"werte": dict(self._werte), "fähigkeiten": dict(self._fähigkeiten)}
+
+    @classmethod
+    def laden(cls, daten: dict[str, Any]) -> Self:
+        return cls(dict(daten["werte"]), dict(daten["fähigkeiten"]))
+
 
 @define
 class Welt:
     """Die Weltvariablen."""
-    _variablen: dict[str, VarTyp] = Factory(dict)
+    _variablen: Variablen[VarTyp] = field(factory=Variablen, converter=als_variablen)
+
+    def __attrs_post_init__(self) -> None:
+        if self._variablen.änderungen is None:
+            self._variablen.änderungen = Änderungen()
+
+    @property
+    def änderungen(self) -> Änderungen:
+        """Die geänderten Weltvariablen, auch die aus Geschichten gesetzten."""
+        assert self._variablen.änderungen is not None
+        return self._variablen.änderungen
 
     def setze_variable(self, variable: str, wert: VarTyp) -> VarTyp | None:
         ans = self._variablen.get(variable)
@@ -46,3 +97,14 @@ class Welt:
 
     def get_variable(self, variable: str, default: T) -> VarTyp | T:
         return self._variablen.get(variable, default)
+
+    def fork(self) -> 'Welt':
+        """Eine unabhängige Kopie in O(1), siehe :py:meth:`Variablen.fork`."""
+        return Welt(self._variablen.fork())
+
+    def speichern(self) -> dict[str, VarTyp]:
+        return dict(self._variablen)
+
+    @classmethod
+    def laden(cls, daten: dict[str, VarTyp]) -> Self:
+        return cls(dict(daten))
@@ -0,0 +1,219 @@
+"""Übersetzt die Blöcke einer Geschichte in ein flaches Programm.
+
+Statt verschachtelter Zeilen gibt es eine Liste von Befehlen, in der alle Sprungziele schon
+als Index aufgelöst sind. Der Interpreter in :py:class:`xwatc_zwei.verteiler.Spielzustand`
+braucht damit nur einen einzigen Programmzähler.
+"""
+from collections.abc import Sequence
+from enum import Enum
+from typing import TYPE_CHECKING
+
+from attrs import define, field
+
+from xwatc_zwei.geschichte import (Bedingung, Entscheidung, Erhalten, IfElif, SetzeVariable,
+                                   Sonderziel, Sprung, Text, Treffen, Zeile)
+
+if TYPE_CHECKING:
+    from xwatc_zwei.bedingung import Test
+    from xwatc_zwei.verteiler import Geschichtsblock
+
+Position = tuple[int, ...]
+
+
+def ortsname(block: str, pos: Position) -> str:
+    """Benenne eine Position wie :py:func:`xwatc_zwei.geschichte.teste_block`, z.B. `a.2B.1`."""
+    teile = [block]
+    for i in range(0, len(pos) - 1, 2):
+        teile.append(f"{pos[i] + 1}{chr(0x41 + pos[i + 1])}")
+    if pos:
+        teile.append(str(pos[-1] + 1))
+    return ".".join(teile)
+
+
+class Op(Enum):
+    """Die Befehle des Programms."""
+    AUSGABE = 0
+    """Gebe die Zeile aus."""
+    SETZE = 1
+    """Setze eine Variable."""
+    WENN = 2
+    """Springe zum Ziel, wenn die Bedingung nicht erfüllt ist."""
+    GEHE = 3
+    """Springe zum Ziel."""
+    WAHL = 4
+    """Halte an und lasse den Spieler entscheiden. Die Ziele sind die Starts der Wahlen."""
+    TREFFEN = 5
+    """Halte für ein Treffen an."""
+    ENDE = 6
+    """Die Geschichte ist vorbei."""
+    UNBEKANNT = 7
+    """Ein Sprung zu einem Block, den es nicht gibt."""
+
+
+@define
+class Befehl:
+    """Ein einzelner Befehl im Programm. Wird nach dem Übersetzen nicht mehr verändert."""
+    op: Op
+    zeile: Zeile | None = None
+    """Die Zeile, aus der der Befehl entstanden ist, None bei eingefügten Sprüngen."""
+    bedingung: Bedingung | None = None
+    test: 'Test | None' = None
+    """Bei :py:attr:`Op.WENN` die übersetzte Bedingung."""
+    ziel: int = -1
+    ziele: tuple[int, ...] = ()
+
+
+@define(frozen=True)
+class Programm:
+    """Das übersetzte Programm einer ganzen Geschichte. Die Blöcke liegen hintereinander,
+    jeder endet mit :py:attr:`Op.ENDE`."""
+    befehle: Sequence[Befehl]
+    starts: dict[str, int]
+    """Der Index des ersten Befehls jedes Blocks."""
+    blöcke: Sequence['Geschichtsblock']
+    """Der Block zu jedem Befehl."""
+    positionen: Sequence[Position]
+    """Die Position im Block (wie für :py:meth:`Geschichtsblock.__getitem__`) zu jedem Befehl."""
+    _nach_position: dict[tuple[str, Position], int] = field(init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        nach_position: dict[tuple[str, Position], int] = {}
+        for pc, (block, pos) in enumerate(zip(self.blöcke, self.positionen)):
+            nach_position.setdefault((block.id, pos), pc)
+        object.__setattr__(self, "_nach_position", nach_position)
+
+    def pc_von(self, block_id: str, pos: Position) -> int:
+        """Der Befehl an einer Position in einem Block.
+
+        :raises KeyError: wenn es die Position nicht gibt.
+        """
+        return self._nach_position[block_id, pos]
+
+    def schleife(self, pc: int) -> list[int]:
+        """Die Befehle, die zusammen mit `pc` in einer Schleife ohne Eingabe liegen, sortiert.
+        Leer, wenn `pc` in keiner solchen Schleife liegt."""
+        ohne_eingabe = [befehl.op not in (Op.WAHL, Op.TREFFEN) for befehl in self.befehle]
+        vorgänger: dict[int, list[int]] = {}
+        erreicht = {pc}
+        stapel = [pc]
+        while stapel:
+            knoten = stapel.pop()
+            for nächster in nachfolger(self, knoten):
+                if ohne_eingabe[nächster]:
+                    vorgänger.setdefault(nächster, []).append(knoten)
+                    if nächster not in erreicht:
+                        erreicht.add(nächster)
+                        stapel.append(nächster)
+        if pc not in vorgänger:
+            return []
+        zurück = {pc}
+        stapel = [pc]
+        while stapel:
+            for vorher in vorgänger.get(stapel.pop(), ()):
+                if vorher not in zurück:
+                    zurück.add(vorher)
+                    stapel.append(vorher)
+        return sorted(erreicht & zurück)
+
+
+def nachfolger(programm: Programm, pc: int) -> Sequence[int]:
+    """Die Befehle, mit denen es nach `pc` weitergehen kann."""
+    befehl = programm.befehle[pc]
+    match befehl.op:
+        case Op.AUSGABE | Op.SETZE | Op.TREFFEN:
+            return (pc + 1,)
+        case Op.WENN:
+            return (pc + 1, befehl.ziel)
+        case Op.GEHE:
+            return (befehl.ziel,)
+        case Op.WAHL:
+            return befehl.ziele
+        case Op.ENDE | Op.UNBEKANNT:
+            return ()
+
+
+class _Übersetzer:
+    def __init__(self) -> None:
+        self.befehle: list[Befehl] = []
+        self.blöcke: list[Geschichtsblock] = []
+        self.positionen: list[Position] = []
+        self.starts: dict[str, int] = {}
+        self.sprünge: list[Befehl] = []
+
+    def befehl(self, befehl: Befehl, block: 'Geschichtsblock', pos: Position) -> Befehl:
+        self.befehle.append(befehl)
+        self.blöcke.append(block)
+        self.positionen.append(pos)
+        return befehl
+
+    def block(self, block: 'Geschichtsblock') -> None:
+        self.starts[block.id] = len(self.befehle)
+        self.zeilen(block, block.zeilen, ())
+        self.befehl(Befehl(Op.ENDE), block, (len(block.zeilen),))
+
+    def zeilen(self, block: 'Geschichtsblock', zeilen: Sequence[Zeile], prefix: Position) -> None:
+        for i, zeile in enumerate(zeilen):
+            pos = (*prefix, i)
+            match zeile:
+                case Text() | Erhalten():
+                    self.befehl(Befehl(Op.AUSGABE, zeile), block, pos)
+                case SetzeVariable():
+                    self.befehl(Befehl(Op.SETZE, zeile), block, pos)
+                case Treffen():
+                    self.befehl(Befehl(Op.TREFFEN, zeile), block, pos)
+                case Sprung(ziel=Sonderziel.Self):
+                    self.befehl(Befehl(Op.GEHE, zeile, ziel=self.starts[block.id]), block, pos)
+                case Sprung():
+                    self.sprünge.append(self.befehl(Befehl(Op.GEHE, zeile), block, pos))
+                case IfElif(fälle=fälle):
+                    ende: list[Befehl] = []
+                    for j, (bed, unterblock) in enumerate(fälle):
+                        wenn = None
+                        if bed:
+                            wenn = self.befehl(Befehl(Op.WENN, zeile, bed, bed.übersetzt),
+                                               block, pos)
+                        self.zeilen(block, unterblock, (*pos, j))
+                        if j != len(fälle) - 1:
+                            ende.append(self.befehl(
+                                Befehl(Op.GEHE), block, (*pos, j, len(unterblock))))
+                        if wenn:
+                            wenn.ziel = len(self.befehle)
+                    for sprung in ende:
+                        sprung.ziel = len(self.befehle)
+                case Entscheidung(wahlen=wahlen):
+                    wahl = self.befehl(Befehl(Op.WAHL, zeile), block, pos)
+                    ende = []
+                    ziele = []
+                    for j, möglichkeit in enumerate(wahlen):
+                        if möglichkeit.bedingung:
+                            möglichkeit.bedingung.übersetzt  # Schon beim Laden übersetzen
+                        ziele.append(len(self.befehle))
+                        self.zeilen(block, möglichkeit.block, (*pos, j))
+                        if j != len(wahlen) - 1:
+                            ende.append(self.befehl(
+                                Befehl(Op.GEHE), block, (*pos, j, len(möglichkeit.block))))
+                    wahl.ziele = tuple(ziele)
+                    for sprung in ende:
+                        sprung.ziel = len(self.befehle)
+                case _:
+                    raise TypeError(f"{zeile} ist keine Zeile! ({block.id})")
+
+    def löse_sprünge(self) -> None:
+        """Trage die Ziele der Sprünge ein, jetzt wo alle Blöcke übersetzt sind."""
+        for befehl in self.sprünge:
+            assert isinstance(befehl.zeile, Sprung) and isinstance(befehl.zeile.ziel, str)
+            if befehl.zeile.ziel in self.starts:
+                befehl.ziel = self.starts[befehl.zeile.ziel]
+            else:
+                befehl.op = Op.UNBEKANNT
+
+
+def übersetze(module: Sequence['Geschichtsblock']) -> Programm:
+    """Übersetze alle Blöcke einer Geschichte in ein Programm."""
+    übersetzer = _Übersetzer()
+    for block in module:
+        übersetzer.block(block)
+    übersetzer.löse_sprünge()
+    return Programm(tuple(übersetzer.befehle), übersetzer.starts, tuple(übersetzer.blöcke),
+                    tuple(übersetzer.positionen))
+
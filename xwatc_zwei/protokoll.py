@@ -0,0 +1,183 @@
+"""Protokolliert, was der Interpreter tut: ausgeführte Befehle, ausgewertete Bedingungen mit
+Ergebnis und Dauer, Sprünge und die Dauer jedes Zugs.
+
+Ein :py:class:`Protokoll` wird an :py:attr:`xwatc_zwei.verteiler.Spielzustand.protokoll`
+gehängt. Ohne Protokoll kostet es den Interpreter nur einen Vergleich pro Befehl. Das Protokoll
+lässt sich als JSON-Lines-Datei exportieren und als Bericht der heißesten Blöcke zusammenfassen.
+"""
+from collections import Counter, deque
+from os import PathLike
+import json
+from typing import ClassVar
+
+from attrs import Factory, define, field
+
+from xwatc_zwei.programm import ortsname
+from xwatc_zwei.verteiler import Geschichte
+
+Ereignis = tuple[str, str, int, object, int]
+"""Ein Eintrag im Protokoll: Art ("befehl", "bedingung", "sprung", "zug"), Pfad der
+Geschichte, Befehl, ein Wert je nach Art und die Dauer in Nanosekunden.
+
+Der Wert ist bei Bedingungen das Ergebnis, bei Sprüngen das Ziel und bei Zügen die Eingabe.
+"""
+
+
+class Beobachter:
+    """Was der Interpreter meldet, wenn :py:attr:`Spielzustand.protokoll` gesetzt ist. Die
+    Methoden tun hier nichts, Unterklassen überschreiben, was sie brauchen. Pfade sind die
+    der Geschichten, Befehle ihr Index im Programm."""
+    __slots__ = ()
+    nur_befehle: ClassVar[bool] = False
+    """Wenn wahr, meldet der Interpreter nur :py:meth:`beginne` und :py:meth:`befehl` und misst
+    keine Zeiten, z.B. für die :py:class:`xwatc_zwei.abdeckung.Abdeckung`."""
+
+    def beginne(self, geschichte: Geschichte) -> None:
+        """Befehle dieser Geschichte werden gleich gemeldet."""
+
+    def befehl(self, pfad: str, pc: int) -> None:
+        """Ein Befehl wird ausgeführt."""
+
+    def bedingung(self, pfad: str, pc: int, ergebnis: bool, dauer: int) -> None:
+        """Eine Bedingung wurde in `dauer` Nanosekunden ausgewertet."""
+
+    def sprung(self, pfad: str, von: int, nach: int) -> None:
+        """Das Programm springt, auch zu gewählten Wahlen."""
+
+    def zug(self, pfad: str, pc: int, eingabe: str | None, dauer: int) -> None:
+        """Ein Zug hat `dauer` Nanosekunden gedauert und steht jetzt an `pc`."""
+
+
+@define
+class Stelle:
+    """Was in einem Block oder an einem Befehl gezählt wurde."""
+    pfad: str
+    ort: str
+    befehle: int = 0
+    bedingungen: int = 0
+    wahr: int = 0
+    dauer: int = 0
+    """Die Zeit für Bedingungen in Nanosekunden."""
+
+
+@define
+class Protokoll(Beobachter):
+    """Sammelt die Ereignisse eines oder mehrerer Spielzustände."""
+    max_ereignisse: int | None = None
+    """Wie viele Ereignisse höchstens behalten werden, die ältesten fallen heraus. Die Zähler
+    für :py:meth:`bericht` zählen trotzdem alle."""
+    ereignisse: deque[Ereignis] = field(init=False)
+    befehle: Counter[tuple[str, int]] = Factory(Counter)
+    """Wie oft jeder Befehl ausgeführt wurde, nach Pfad und Befehl."""
+    bedingungen: Counter[tuple[str, int, bool]] = Factory(Counter)
+    """Wie oft eine Bedingung an einem Befehl mit welchem Ergebnis ausgewertet wurde."""
+    bedingungszeit: Counter[tuple[str, int]] = Factory(Counter)
+    """Die Zeit für Bedingungen an einem Befehl in Nanosekunden."""
+    züge: list[int] = Factory(list)
+    """Die Dauer jedes Zugs in Nanosekunden."""
+    _geschichten: dict[str, Geschichte] = Factory(dict)
+
+    def __attrs_post_init__(self) -> None:
+        self.ereignisse = deque(maxlen=self.max_ereignisse)
+
+    def beginne(self, geschichte: Geschichte) -> None:
+        self._geschichten[geschichte.pfad] = geschichte
+
+    def befehl(self, pfad: str, pc: int) -> None:
+        self.befehle[pfad, pc] += 1
+        self.ereignisse.append(("befehl", pfad, pc, None, 0))
+
+    def bedingung(self, pfad: str, pc: int, ergebnis: bool, dauer: int) -> None:
+        self.bedingungen[pfad, pc, ergebnis] += 1
+        self.bedingungszeit[pfad, pc] += dauer
+        self.ereignisse.append(("bedingung", pfad, pc, ergebnis, dauer))
+
+    def sprung(self, pfad: str, von: int, nach: int) -> None:
+        self.ereignisse.append(("sprung", pfad, von, nach, 0))
+
+    def zug(self, pfad: str, pc: int, eingabe: str | None, dauer: int) -> None:
+        self.züge.append(dauer)
+        self.ereignisse.append(("zug", pfad, pc, eingabe, dauer))
+
+    def _ort(self, pfad: str, pc: int) -> tuple[str, str]:
+        """Block und Ortsname eines Befehls, leer wenn die Geschichte nicht bekannt ist."""
+        if (geschichte := self._geschichten.get(pfad)) is None or pc < 0:
+            return "", ""
+        programm = geschichte.programm
+        block = programm.blöcke[pc].id
+        return block, ortsname(block, programm.positionen[pc])
+
+    def als_dicts(self) -> list[dict[str, object]]:
+        """Die behaltenen Ereignisse als JSON-taugliche dicts."""
+        ergebnis: list[dict[str, object]] = []
+        for art, pfad, pc, wert, dauer in self.ereignisse:
+            block, ort = self._ort(pfad, pc)
+            eintrag: dict[str, object] = {"art": art, "geschichte": pfad, "block": block,
+                                          "ort": ort}
+            if art == "befehl" and (geschichte := self._geschichten.get(pfad)):
+                eintrag["op"] = geschichte.programm.befehle[pc].op.name
+            elif art == "bedingung":
+                eintrag["ergebnis"] = wert
+            elif art == "sprung":
+                eintrag["nach"] = self._ort(pfad, wert)[1]  # type: ignore
+            elif art == "zug":
+                eintrag["eingabe"] = wert
+            if dauer:
+                eintrag["dauer_ns"] = dauer
+            ergebnis.append(eintrag)
+        return ergebnis
+
+    def exportiere(self, datei: PathLike) -> None:
+        """Schreibe die Ereignisse als JSON Lines, ein Ereignis pro Zeile."""
+        with open(datei, "w", encoding="utf-8") as schreibe:
+            for eintrag in self.als_dicts():
+                schreibe.write(json.dumps(eintrag, ensure_ascii=False))
+                schreibe.write("\n")
+
+    def stellen(self, nach_block: bool = True) -> list[Stelle]:
+        """Die Zähler zusammengefasst nach Block oder einzelnem Befehl, die meisten
+        ausgeführten Befehle zuerst."""
+        stellen: dict[tuple[str, str], Stelle] = {}
+
+        def stelle(pfad: str, pc: int) -> Stelle:
+            block, ort = self._ort(pfad, pc)
+            schlüssel = pfad, block if nach_block else ort
+            if (gefunden := stellen.get(schlüssel)) is None:
+                gefunden = stellen[schlüssel] = Stelle(*schlüssel)
+            return gefunden
+
+        for (pfad, pc), anzahl in self.befehle.items():
+            stelle(pfad, pc).befehle += anzahl
+        for (pfad, pc, ergebnis), anzahl in self.bedingungen.items():
+            gefunden = stelle(pfad, pc)
+            gefunden.bedingungen += anzahl
+            if ergebnis:
+                gefunden.wahr += anzahl
+        for (pfad, pc), dauer in self.bedingungszeit.items():
+            stelle(pfad, pc).dauer += dauer
+        return sorted(stellen.values(), key=lambda s: (-s.befehle, -s.dauer, s.pfad, s.ort))
+
+    def bericht(self, anzahl: int = 10) -> str:
+        """Eine Zusammenfassung zum Ausgeben: Dauer der Züge, die heißesten Blöcke und die
+        teuersten Bedingungen."""
+        zeilen = []
+        if self.züge:
+            züge = sorted(self.züge)
+            zeilen.append(
+                f"{len(züge)} Züge: Mittel {sum(züge) / len(züge) / 1e3:.1f} µs, "
+                f"95% {züge[min(len(züge) - 1, len(züge) * 95 // 100)] / 1e3:.1f} µs, "
+                f"Max {züge[-1] / 1e3:.1f} µs")
+        zeilen.append(f"{self.befehle.total()} Befehle, {self.bedingungen.total()} Bedingungen "
+                      f"in {self.bedingungszeit.total() / 1e6:.2f} ms")
+        zeilen += ["", "Heiße Blöcke:", f"  {'Befehle':>9}{'Bed.':>8}{'ms':>9}  Block"]
+        for stelle in self.stellen()[:anzahl]:
+            zeilen.append(f"  {stelle.befehle:>9}{stelle.bedingungen:>8}"
+                          f"{stelle.dauer / 1e6:>9.3f}  {stelle.pfad}/{stelle.ort}")
+        bedingungen = sorted((s for s in self.stellen(nach_block=False) if s.bedingungen),
+                             key=lambda s: -s.dauer)
+        if bedingungen:
+            zeilen += ["", "Teure Bedingungen:", f"  {'Anzahl':>9}{'wahr':>8}{'ms':>9}  Ort"]
+            for stelle in bedingungen[:anzahl]:
+                zeilen.append(f"  {stelle.bedingungen:>9}{stelle.wahr / stelle.bedingungen:>8.0%}"
+                              f"{stelle.dauer / 1e6:>9.3f}  {stelle.pfad}/{stelle.ort}")
+        return "\n".join(zeilen)
@@ -0,0 +1,334 @@
+"""Ein Server, über den viele Spieler gleichzeitig spielen, mit asyncio.
+
+Die Geschichten werden einmal geladen und von allen Sitzungen geteilt. Jede Sitzung hat nur,
+was sich im Spiel ändert: Position, Mänx, Welt und die Warteliste des Verteilers, siehe
+:py:meth:`Verteiler.fork`. Mänx und Welt sind Kopien einer Vorlage und teilen deren Werte, bis
+sie geändert werden.
+
+Gesprochen wird JSON Lines über TCP, eine Anfrage pro Zeile, siehe :py:meth:`Server.bearbeite`.
+Über eine Verbindung können mehrere Sitzungen laufen. Mit ``strom`` kommen die Ausgaben
+sofort einzeln, siehe :py:meth:`Server.strome`. Aufruf::
+
+    python -m xwatc_zwei.server level/verteiler.json --port 8765
+"""
+import argparse
+import asyncio
+from collections.abc import Generator, Iterable, Iterator, Sequence
+import json
+from os import PathLike
+from pathlib import Path
+import random
+import secrets
+import time
+from types import UnionType
+from typing import Any, assert_never
+
+from attrs import Factory, define, field
+
+from xwatc_zwei import loader
+from xwatc_zwei import mänx as mänx_mod
+from xwatc_zwei.geschichte import Entscheidung, Erhalten, InputZeile, OutputZeile, Text, Treffen
+from xwatc_zwei.verteiler import Endlosschleife, Spielzustand, Verteiler
+
+
+def lade_verteiler(datei: PathLike) -> Verteiler:
+    """Lade einen Verteiler (.json) oder eine einzelne Geschichte (.cfg) als Verteiler."""
+    if Path(datei).suffix == ".json":
+        return loader.load_verteiler(datei)
+    return Verteiler.aus_geschichte(loader.load_geschichte(datei))
+
+
+def _text(zeile: OutputZeile) -> str:
+    match zeile:
+        case Text(text=text):
+            return text
+        case Erhalten(objekt=item, anzahl=anzahl):
+            return f"Du erhältst {anzahl} {item}"
+        case _:
+            assert_never(zeile)
+
+
+_TYPEN: dict[str, type | UnionType] = {
+    "sitzung": str | None, "seed": int | str | None, "wahl": str | None}
+"""Die erlaubten Typen der Felder einer Anfrage, die nicht nur als Wahrheitswert gelesen
+werden."""
+
+
+@define
+class Sitzung:
+    """Ein Spieler auf dem Server."""
+    id: str
+    zustand: Spielzustand
+    wahlen: tuple[str, ...] = ()
+    """Die Ids der Wahlen, die gerade möglich sind."""
+    zuletzt: float = Factory(time.monotonic)
+    """Wann die letzte Anfrage kam, für :py:meth:`Server.räume_auf`."""
+    im_zug: bool = False
+    """Ob gerade ein Zug mit :py:meth:`Server.strome` läuft. Bis er fertig ist, werden andere
+    Anfragen für die Sitzung abgelehnt."""
+
+    def zug(self, wahl: str) -> dict[str, Any]:
+        """Spiele bis zur nächsten Entscheidung und gebe die Antwort für den Client zurück."""
+        outputs, zeile = self.zustand.run(wahl)
+        antwort: dict[str, Any] = {"sitzung": self.id, "ausgaben": [_text(o) for o in outputs]}
+        return self._antwort(antwort, zeile)
+
+    def strom(self, wahl: str) -> Iterator[dict[str, Any]]:
+        """Wie :py:meth:`zug`, aber jede Ausgabe kommt sofort als eigene Antwort mit
+        ``ausgabe``, siehe :py:meth:`Spielzustand.strom`. Die letzte Antwort hat keine
+        ``ausgaben``."""
+        for zeile in self.zustand.strom(wahl):
+            if isinstance(zeile, InputZeile):
+                yield self._antwort({"sitzung": self.id}, zeile)
+            else:
+                yield {"sitzung": self.id, "ausgabe": _text(zeile)}
+
+    def zähler(self) -> dict[str, Any]:
+        """Die Zähler des Spielzustands, zum Beobachten."""
+        return {"sitzung": self.id, "züge": self.zustand.züge, "sprünge": self.zustand.sprünge}
+
+    def _antwort(self, antwort: dict[str, Any], zeile: InputZeile) -> dict[str, Any]:
+        if isinstance(zeile, Treffen):
+            antwort["treffen"] = {"typ": zeile.typ, "args": list(zeile.args)}
+            wahlen = []
+        elif isinstance(zeile, Entscheidung):
+            wahlen = [wahl for wahl in zeile.wahlen
+                      if self.zustand.eval_bedingung(wahl.bedingung)]
+        else:
+            assert_never(zeile)
+        self.wahlen = tuple(wahl.id for wahl in wahlen)
+        antwort["wahlen"] = [{"id": wahl.id, "text": wahl.text} for wahl in wahlen]
+        return antwort
+
+
+@define
+class Server:
+    """Hält die Sitzungen und beantwortet ihre Anfragen.
+
+    Alle Sitzungen teilen sich die Geschichten von `verteiler`. Die Anfragen werden der Reihe
+    nach in der Ereignisschleife bearbeitet, ein Zug blockiert also kurz alle anderen. Damit
+    eine Geschichte mit Endlosschleife nicht den ganzen Server aufhält, sind Züge durch
+    `max_sprünge` und `max_dauer` begrenzt.
+    """
+    verteiler: Verteiler
+    max_sitzungen: int = 100_000
+    ablauf: float = 3600.
+    """Nach so vielen Sekunden ohne Anfrage wird eine Sitzung entfernt."""
+    max_sprünge: int | None = 100_000
+    """Siehe :py:attr:`Spielzustand.max_sprünge`."""
+    max_dauer: float | None = 1.
+    """Siehe :py:attr:`Spielzustand.max_dauer`."""
+    sitzungen: dict[str, Sitzung] = Factory(dict)
+    endlosschleifen: int = 0
+    """Wie viele Züge mit :py:class:`Endlosschleife` abgebrochen wurden."""
+    _mänx: mänx_mod.Mänx = field(init=False, factory=mänx_mod.Mänx.default)
+    _welt: mänx_mod.Welt = field(init=False, factory=mänx_mod.Welt)
+
+    def neue_sitzung(self, seed: int | str | None = None) -> Sitzung:
+        """Starte ein neues Spiel. Mit dem gleichen `seed` läuft es bei gleichen Eingaben
+        gleich ab.
+
+        :raises ValueError: wenn schon `max_sitzungen` Sitzungen laufen.
+        """
+        if len(self.sitzungen) >= self.max_sitzungen:
+            raise ValueError("Zu viele Sitzungen.")
+        while (id := secrets.token_urlsafe(12)) in self.sitzungen:
+            pass
+        zustand = Spielzustand(self.verteiler.fork(), None, self._mänx.fork(),
+                               self._welt.fork(), rng=random.Random(seed),
+                               max_sprünge=self.max_sprünge, max_dauer=self.max_dauer)
+        sitzung = self.sitzungen[id] = Sitzung(id, zustand, ("",))
+        return sitzung
+
+    def bearbeite(self, anfrage: dict[str, Any]) -> dict[str, Any]:
+        """Beantworte eine Anfrage. Ohne ``sitzung`` wird eine neue Sitzung gestartet (mit
+        ``seed``, wenn angegeben), sonst die Wahl ``wahl`` getroffen oder mit ``ende`` die
+        Sitzung beendet. Mit ``zähler`` kommen die Zähler der Sitzung, siehe
+        :py:meth:`Sitzung.zähler`.
+
+        Die Antwort enthält die ``sitzung``, die ``ausgaben`` als Texte und die möglichen
+        ``wahlen`` mit ``id`` und ``text``, bei einem Treffen stattdessen ``treffen``. Bei einem
+        Fehler steht er unter ``fehler``. Fehler in der Geschichte beenden die Sitzung.
+        """
+        gefunden = self._finde(anfrage)
+        if isinstance(gefunden, dict):
+            return gefunden
+        sitzung, wahl = gefunden
+        try:
+            return sitzung.zug(wahl)
+        except Exception as err:
+            return self._geschichtsfehler(sitzung, err)
+
+    def strome(self, anfrage: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """Wie :py:meth:`bearbeite`, aber jede Ausgabe kommt sofort als eigene Antwort, siehe
+        :py:meth:`Sitzung.strom`.
+
+        Zwischen den Antworten können andere Anfragen bearbeitet werden, die für diese Sitzung
+        werden bis zum Ende des Zugs abgelehnt. Wird der Strom vorher geschlossen, z.B. weil
+        die Verbindung abbricht, ist die Sitzung beendet, weil ihr Zug halb gespielt ist.
+        """
+        gefunden = self._finde(anfrage)
+        if isinstance(gefunden, dict):
+            yield gefunden
+            return
+        sitzung, wahl = gefunden
+        sitzung.im_zug = True
+        fertig = False
+        try:
+            yield from sitzung.strom(wahl)
+            fertig = True
+        except Exception as err:
+            fertig = True
+            yield self._geschichtsfehler(sitzung, err)
+        finally:
+            sitzung.im_zug = False
+            if not fertig:
+                self.sitzungen.pop(sitzung.id, None)
+
+    def _finde(self, anfrage: dict[str, Any]) -> tuple[Sitzung, str] | dict[str, Any]:
+        """Die Sitzung und die Wahl einer Anfrage, oder gleich die Antwort, wenn es nichts zu
+        spielen gibt."""
+        if not isinstance(anfrage, dict):
+            return {"fehler": "Anfrage muss ein Objekt sein."}
+        id = anfrage.get("sitzung")
+        sitzung: Sitzung | None
+        for schlüssel, typ in _TYPEN.items():
+            if not isinstance(anfrage.get(schlüssel), typ):
+                return {"fehler": f"{schlüssel} hat einen falschen Typ."}
+        if id is None:
+            try:
+                sitzung = self.neue_sitzung(anfrage.get("seed"))
+            except ValueError as err:
+                return {"fehler": str(err)}
+            wahl = ""
+        elif (sitzung := self.sitzungen.get(id)) is None:
+            return {"sitzung": id, "fehler": "Unbekannte Sitzung."}
+        elif sitzung.im_zug:
+            return {"sitzung": id, "fehler": "Die Sitzung ist gerade in einem Zug."}
+        elif anfrage.get("ende"):
+            del self.sitzungen[id]
+            return {"sitzung": id, "beendet": True}
+        elif anfrage.get("zähler"):
+            return sitzung.zähler()
+        else:
+            wahl = anfrage.get("wahl", "")
+        sitzung.zuletzt = time.monotonic()
+        if wahl not in sitzung.wahlen:
+            return {"sitzung": sitzung.id, "fehler": f"Wahl {wahl!r} steht nicht zur Wahl."}
+        return sitzung, wahl
+
+    def _geschichtsfehler(self, sitzung: Sitzung, err: Exception) -> dict[str, Any]:
+        self.sitzungen.pop(sitzung.id, None)
+        if isinstance(err, Endlosschleife):
+            self.endlosschleifen += 1
+        return {"sitzung": sitzung.id, "fehler": f"Fehler in der Geschichte: {err}",
+                "beendet": True}
+
+    def räume_auf(self) -> int:
+        """Entferne die Sitzungen, die länger als `ablauf` nichts gefragt haben, und gebe ihre
+        Zahl zurück."""
+        grenze = time.monotonic() - self.ablauf
+        alt = [id for id, sitzung in self.sitzungen.items() if sitzung.zuletzt < grenze]
+        for id in alt:
+            del self.sitzungen[id]
+        return len(alt)
+
+    async def verbinde(self, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> None:
+        """Bediene eine Verbindung, bis der Client sie schließt. Anfragen mit ``strom`` werden
+        mit :py:meth:`strome` beantwortet, zwischen den Ausgaben kommen andere Sitzungen
+        dran. Zeilen, die länger als das Limit des Readers sind, bekommen eine Fehlerantwort."""
+        antworten: Iterable[dict[str, Any]] = ()
+        try:
+            while (zeile := await _lies_zeile(reader)) != b"":
+                antworten = self._antworten(zeile)
+                for antwort in antworten:
+                    writer.write(json.dumps(antwort, ensure_ascii=False).encode() + b"\n")
+                    await writer.drain()
+                    if "ausgabe" in antwort:
+                        await asyncio.sleep(0)
+        except ConnectionError:
+            pass
+        finally:
+            if isinstance(antworten, Generator):  # Beendet eine Sitzung mitten im Zug.
+                antworten.close()
+            writer.close()
+
+    def _antworten(self, zeile: bytes | None) -> Iterable[dict[str, Any]]:
+        """Die Antworten auf eine Zeile von :py:func:`_lies_zeile`."""
+        if zeile is None:
+            return [{"fehler": "Anfrage zu lang."}]
+        try:
+            anfrage = json.loads(zeile)
+        except ValueError as err:  # Auch UnicodeDecodeError
+            return [{"fehler": f"Kein JSON: {err}"}]
+        if isinstance(anfrage, dict) and anfrage.get("strom"):
+            return self.strome(anfrage)
+        return [self.bearbeite(anfrage)]
+
+    async def räume_immer_auf(self) -> None:
+        """Rufe regelmäßig :py:meth:`räume_auf` auf, bis die Aufgabe abgebrochen wird."""
+        while True:
+            await asyncio.sleep(min(self.ablauf, 60))
+            self.räume_auf()
+
+    async def starte(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.Server:
+        """Höre auf `host` und `port`. Aufgeräumt wird erst mit :py:meth:`räume_immer_auf`."""
+        return await asyncio.start_server(self.verbinde, host, port)
+
+
+async def _lies_zeile(reader: asyncio.StreamReader) -> bytes | None:
+    """Lese eine Zeile, am Ende der Verbindung b"". Ist sie länger als das Limit des Readers,
+    wird sie bis zum Zeilenende verworfen und None zurückgegeben."""
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as err:  # Die letzte Zeile ohne Zeilenumbruch
+        return err.partial
+    except asyncio.LimitOverrunError as err:
+        zu_lang = err
+    while True:
+        await reader.readexactly(zu_lang.consumed)
+        try:
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as err:
+            zu_lang = err
+
+
+async def _laufe(server: Server, host: str, port: int) -> None:
+    tcp = await server.starte(host, port)
+    print(f"Xwatc-Server auf {', '.join(str(s.getsockname()) for s in tcp.sockets)}")
+    aufräumen = asyncio.create_task(server.räume_immer_auf())
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        aufräumen.cancel()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("datei", type=Path,
+                        help="Eine Geschichte (.cfg) oder ein Verteiler (.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sitzungen", type=int, default=100_000)
+    parser.add_argument("--ablauf", type=float, default=3600.,
+                        help="Sekunden ohne Anfrage, nach denen eine Sitzung entfernt wird")
+    parser.add_argument("--max-sprünge", type=int, default=100_000,
+                        help="Rücksprünge pro Zug, danach wird die Sitzung beendet")
+    parser.add_argument("--max-dauer", type=float, default=1.,
+                        help="Sekunden pro Zug, danach wird die Sitzung beendet")
+    args = parser.parse_args(argv)
+    server = Server(lade_verteiler(args.datei.resolve()), args.max_sitzungen, args.ablauf,
+                    args.max_sprünge, args.max_dauer)
+    try:
+        asyncio.run(_laufe(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Spielt Geschichten ohne Oberfläche viele Male durch und sammelt Statistiken.
+
+Damit lassen sich z.B. Wahrscheinlichkeiten von `wurf` und `glück` ausbalancieren. Aufruf::
+
+    python -m xwatc_zwei.simulation level/scenario1.cfg -n 10000 -j 4
+"""
+import argparse
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+from os import PathLike
+from pathlib import Path
+import random
+import time
+
+from attrs import Factory, define
+
+from xwatc_zwei import loader
+from xwatc_zwei.abdeckung import Abdeckung
+from xwatc_zwei.geschichte import (Entscheidung, Erhalten, Text, Treffen, VarTypError,
+                                   Wahlmöglichkeit)
+from xwatc_zwei.protokoll import Protokoll
+from xwatc_zwei.verteiler import Endlosschleife, Geschichte, Spielzustand, Verteiler
+
+Strategie = Callable[[Sequence[Wahlmöglichkeit], random.Random, int], Wahlmöglichkeit]
+"""Wählt aus den freien Wahlmöglichkeiten. Bekommt außerdem den Zufallsgenerator des Laufs
+und die Nummer der Entscheidung im Lauf."""
+
+Ziel = Geschichte | Callable[[], Verteiler]
+"""Was simuliert wird: eine einzelne Geschichte oder eine Funktion, die einen Verteiler
+erstellt. Bei mehreren Prozessen muss beides pickelbar sein."""
+
+Ausgang = tuple[str, str, str]
+"""Wie ein Lauf geendet hat: Art ("ende", "treffen", "sackgasse", "abbruch",
+"endlosschleife", "fehler"), Pfad der Geschichte und Id des Blocks."""
+
+
+def zufällig(wahlen: Sequence[Wahlmöglichkeit], rng: random.Random, nummer: int
+             ) -> Wahlmöglichkeit:
+    """Wähle gleichverteilt."""
+    return rng.choice(wahlen)
+
+
+def erste(wahlen: Sequence[Wahlmöglichkeit], rng: random.Random, nummer: int
+          ) -> Wahlmöglichkeit:
+    """Wähle immer die erste freie Wahlmöglichkeit."""
+    return wahlen[0]
+
+
+@define(frozen=True)
+class Skript:
+    """Wähle die Wahlmöglichkeiten in einer festen Reihenfolge. Ist das Skript zu Ende oder
+    die Wahl nicht frei, entscheidet `sonst`."""
+    ids: Sequence[str]
+    sonst: Strategie = erste
+
+    def __call__(self, wahlen: Sequence[Wahlmöglichkeit], rng: random.Random, nummer: int
+                 ) -> Wahlmöglichkeit:
+        if nummer < len(self.ids):
+            for wahl in wahlen:
+                if wahl.id == self.ids[nummer]:
+                    return wahl
+        return self.sonst(wahlen, rng, nummer)
+
+
+@define
+class Statistik:
+    """Die gesammelten Ergebnisse von Läufen."""
+    läufe: int = 0
+    dauer: float = 0.
+    """Die gemessene Zeit in Sekunden."""
+    zeilen: Counter[tuple[str, str, tuple[int, ...]]] = Factory(Counter)
+    """Wie oft jede Zeile erreicht wurde, nach Pfad, Block und Position. Gezählt werden
+    Ausgaben und Eingaben."""
+    blöcke: Counter[tuple[str, str]] = Factory(Counter)
+    """In wie vielen Läufen jeder Block erreicht wurde."""
+    ausgänge: Counter[Ausgang] = Factory(Counter)
+    items: Counter[str] = Factory(Counter)
+    """Die Summe aller erhaltenen Items."""
+    variablen: Counter[tuple[str, object]] = Factory(Counter)
+    """In wie vielen Läufen eine Variable am Ende welchen Wert hatte. Weltvariablen beginnen
+    mit einem Punkt."""
+    abdeckung: Abdeckung | None = None
+    """Die ausgeführten Zeilen, wenn mit `abdeckung` simuliert wurde."""
+
+    @property
+    def läufe_pro_sekunde(self) -> float:
+        return self.läufe / self.dauer if self.dauer else 0.
+
+    def vereinige(self, andere: 'Statistik') -> None:
+        """Zähle die Ergebnisse einer anderen Statistik dazu."""
+        self.läufe += andere.läufe
+        self.zeilen.update(andere.zeilen)
+        self.blöcke.update(andere.blöcke)
+        self.ausgänge.update(andere.ausgänge)
+        self.items.update(andere.items)
+        self.variablen.update(andere.variablen)
+        if andere.abdeckung is not None:
+            if self.abdeckung is None:
+                self.abdeckung = Abdeckung()
+            self.abdeckung.vereinige(andere.abdeckung)
+
+    def bericht(self) -> str:
+        """Eine Zusammenfassung zum Ausgeben."""
+        zeilen = [f"{self.läufe} Läufe in {self.dauer:.2f}s ({self.läufe_pro_sekunde:.0f}/s)",
+                  "", "Ausgänge:"]
+        for (art, pfad, block), anzahl in self.ausgänge.most_common():
+            zeilen.append(f"  {anzahl / self.läufe:7.2%}  {art:<10}{pfad}/{block}")
+        zeilen += ["", "Blöcke:"]
+        for (pfad, block), anzahl in sorted(self.blöcke.items()):
+            zeilen.append(f"  {anzahl / self.läufe:7.2%}  {pfad}/{block}")
+        if self.items:
+            zeilen += ["", "Items (pro Lauf):"]
+            for item, anzahl in self.items.most_common():
+                zeilen.append(f"  {anzahl / self.läufe:8.3f}  {item}")
+        if self.variablen:
+            zeilen += ["", "Variablen am Ende:"]
+            for (name, wert), anzahl in sorted(self.variablen.items(), key=str):
+                zeilen.append(f"  {anzahl / self.läufe:7.2%}  {name} = {wert!r}")
+        return "\n".join(zeilen)
+
+
+@define
+class _Läufer:
+    """Spielt Läufe in einem Prozess und zählt in eine Statistik."""
+    ziel: Ziel
+    strategie: Strategie
+    max_entscheidungen: int
+    max_sprünge: int | None = None
+    statistik: Statistik = Factory(Statistik)
+    protokoll: Protokoll | None = None
+    _verteiler: Verteiler | None = None
+
+    def _zustand(self, seed: str) -> Spielzustand:
+        if isinstance(self.ziel, Geschichte):
+            zustand = Spielzustand.aus_geschichte(self.ziel, seed)
+        else:
+            if self._verteiler is None:
+                self._verteiler = self.ziel()
+            zustand = Spielzustand.from_verteiler(self._verteiler, seed)
+        zustand.protokoll = self.protokoll or self.statistik.abdeckung
+        zustand.max_sprünge = self.max_sprünge
+        return zustand
+
+    def kenne_alle(self) -> None:
+        """Nehme alle Geschichten des Ziels in die Abdeckung auf, auch nie gespielte."""
+        assert self.statistik.abdeckung is not None
+        if isinstance(self.ziel, Geschichte):
+            self.statistik.abdeckung.kenne(self.ziel)
+            return
+        if self._verteiler is None:
+            self._verteiler = self.ziel()
+        for pfad in sorted(self._verteiler.pfade()):
+            self.statistik.abdeckung.kenne(self._verteiler.geschichte_by_id(pfad))
+
+    def _zähle(self, geschichte: Geschichte, pc: int, blöcke: set[tuple[str, str]]) -> None:
+        programm = geschichte.programm
+        block = programm.blöcke[pc].id
+        self.statistik.zeilen[geschichte.pfad, block, programm.positionen[pc]] += 1
+        blöcke.add((geschichte.pfad, block))
+
+    def _entscheidungen(self, zustand: Spielzustand, rng: random.Random,
+                        blöcke: set[tuple[str, str]]) -> str:
+        """Spiele die Züge eines Laufs und gebe die Art des Ausgangs zurück. Die Ausgaben
+        kommen einzeln, damit jede ihrem Befehl zugeordnet wird, auch wenn mehrere Befehle
+        dieselbe Zeile teilen."""
+        eingabe = ""
+        nummer = 0
+        while True:
+            for zeile in zustand.strom(eingabe):
+                if isinstance(zeile, Text | Erhalten):
+                    position = zustand.position
+                    assert position
+                    self._zähle(position.geschichte, position.pc - 1, blöcke)
+                    if isinstance(zeile, Erhalten):
+                        self.statistik.items[zeile.objekt] += zeile.anzahl
+            position = zustand.position
+            if position is None:
+                return "ende"
+            self._zähle(position.geschichte, position.pc, blöcke)
+            if isinstance(zeile, Treffen):
+                return "treffen"
+            assert isinstance(zeile, Entscheidung)
+            wahlen = [w for w in zeile.wahlen if zustand.eval_bedingung(w.bedingung)]
+            if not wahlen:
+                return "sackgasse"
+            if nummer == self.max_entscheidungen:
+                return "abbruch"
+            eingabe = self.strategie(wahlen, rng, nummer).id
+            nummer += 1
+
+    def spiele(self, seed: str) -> None:
+        """Spiele eine Geschichte einmal bis zum Ende. Endlosschleifen und Fehler in der
+        Geschichte beenden nur diesen Lauf."""
+        rng = random.Random(f"{seed}:strategie")
+        zustand = self._zustand(seed)
+        blöcke: set[tuple[str, str]] = set()
+        try:
+            art = self._entscheidungen(zustand, rng, blöcke)
+        except Endlosschleife:
+            art = "endlosschleife"
+        except VarTypError:
+            art = "fehler"
+        position = zustand.position or zustand.ende
+        assert position
+        self.statistik.läufe += 1
+        self.statistik.ausgänge[art, position.geschichte.pfad, position.block.id] += 1
+        self.statistik.blöcke.update(blöcke)
+        self.statistik.variablen.update(
+            (name, wert) for name, wert in position.modul_vars.items() if name != "_")
+        welt = zustand.assert_get_welt()
+        self.statistik.variablen.update(
+            (f".{name}", wert) for name, wert in welt._variablen.items())
+
+
+def _simuliere_teil(ziel: Ziel, läufe: range, strategie: Strategie, seed: int,
+                    max_entscheidungen: int, protokoll: Protokoll | None = None,
+                    abdeckung: bool = False, max_sprünge: int | None = None) -> Statistik:
+    läufer = _Läufer(ziel, strategie, max_entscheidungen, max_sprünge, protokoll=protokoll)
+    if abdeckung:
+        läufer.statistik.abdeckung = Abdeckung()
+        läufer.kenne_alle()
+    for lauf in läufe:
+        läufer.spiele(f"{seed}:{lauf}")
+    return läufer.statistik
+
+
+def simuliere(ziel: Ziel, läufe: int, strategie: Strategie = zufällig, seed: int = 0,
+              prozesse: int | None = 1, max_entscheidungen: int = 100,
+              protokoll: Protokoll | None = None, abdeckung: bool = False,
+              max_sprünge: int | None = 10_000) -> Statistik:
+    """Spiele eine Geschichte oder einen Verteiler `läufe` Mal durch.
+
+    Jeder Lauf hat seinen eigenen Seed, das Ergebnis hängt also nicht von der Zahl der
+    Prozesse ab.
+
+    :param prozesse: Die Zahl der Prozesse, None für so viele wie Kerne. Bei 1 wird im
+    aktuellen Prozess gespielt.
+    :param max_entscheidungen: Nach so vielen Entscheidungen wird ein Lauf abgebrochen.
+    :param protokoll: Protokolliere alle Läufe darin, geht nur mit einem Prozess.
+    :param abdeckung: Sammle die ausgeführten Zeilen in :py:attr:`Statistik.abdeckung`.
+    Nicht zusammen mit `protokoll`.
+    :param max_sprünge: Ein Zug mit mehr Rücksprüngen endet den Lauf als "endlosschleife",
+    siehe :py:attr:`Spielzustand.max_sprünge`.
+    """
+    if protokoll is not None and prozesse != 1:
+        raise ValueError("Mit Protokoll kann nur in einem Prozess simuliert werden.")
+    if protokoll is not None and abdeckung:
+        raise ValueError("Protokoll und Abdeckung gehen nicht zusammen.")
+    start = time.perf_counter()
+    if prozesse == 1:
+        statistik = _simuliere_teil(ziel, range(läufe), strategie, seed, max_entscheidungen,
+                                    protokoll, abdeckung, max_sprünge)
+    else:
+        statistik = Statistik()
+        with ProcessPoolExecutor(prozesse) as pool:
+            teile = max(1, min(läufe, (prozesse or os.cpu_count() or 1) * 4))
+            grenzen = [läufe * i // teile for i in range(teile + 1)]
+            for teil in pool.map(partial(_simuliere_teil, ziel, strategie=strategie, seed=seed,
+                                         max_entscheidungen=max_entscheidungen,
+                                         abdeckung=abdeckung, max_sprünge=max_sprünge),
+                                 [range(a, b) for a, b in zip(grenzen, grenzen[1:])]):
+                statistik.vereinige(teil)
+    statistik.dauer = time.perf_counter() - start
+    return statistik
+
+
+def _ziel(datei: PathLike) -> Ziel:
+    if Path(datei).suffix == ".json":
+        return partial(loader.load_verteiler, datei, workers=1)
+    return loader.load_geschichte(datei)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("datei", type=Path,
+                        help="Eine Geschichte (.cfg) oder ein Verteiler (.json)")
+    parser.add_argument("-n", "--läufe", type=int, default=1000)
+    parser.add_argument("-j", "--prozesse", type=int, default=1,
+                        help="Anzahl der Prozesse, 0 für alle Kerne")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategie", choices=["zufällig", "erste"], default="zufällig")
+    parser.add_argument("--skript", help="Ids der Wahlen mit Komma getrennt")
+    parser.add_argument("--max-entscheidungen", type=int, default=100)
+    parser.add_argument("--protokoll", type=Path, metavar="DATEI",
+                        help="Protokolliere die Läufe als JSON Lines in DATEI und gebe die "
+                        "heißesten Blöcke aus (nur mit einem Prozess)")
+    parser.add_argument("--abdeckung", action="store_true",
+                        help="Gebe aus, welche Zeilen der Dateien nie erreicht wurden")
+    parser.add_argument("--quelltext", action="store_true",
+                        help="Gebe bei --abdeckung auch die nicht erreichten Zeilen aus")
+    args = parser.parse_args(argv)
+    strategie: Strategie = zufällig if args.strategie == "zufällig" else erste
+    if args.skript:
+        strategie = Skript(args.skript.split(","), strategie)
+    protokoll = Protokoll() if args.protokoll else None
+    statistik = simuliere(_ziel(args.datei.resolve()), args.läufe, strategie, args.seed,
+                          args.prozesse or None, args.max_entscheidungen, protokoll,
+                          args.abdeckung)
+    print(statistik.bericht())
+    if statistik.abdeckung:
+        print()
+        print(statistik.abdeckung.bericht(args.quelltext))
+    if protokoll:
+        protokoll.exportiere(args.protokoll)
+        print()
+        print(protokoll.bericht())
+
+
+if __name__ == "__main__":
+    main()
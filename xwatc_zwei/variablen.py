@@ -0,0 +1,145 @@
+"""Variablenspeicher, die sich in O(1) kopieren lassen."""
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
+from typing import Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class _Gelöscht:
+    """Markiert in einer oberen Schicht, dass die Variable gelöscht wurde."""
+
+
+_GELÖSCHT = _Gelöscht()
+_FEHLT = object()
+
+
+class Änderungen:
+    """Die Namen geänderter Variablen, der Reihe nach. Leser merken sich den :py:attr:`stand`
+    und holen mit :py:meth:`seit` nach, was sich seitdem geändert hat.
+
+    Es werden höchstens :py:attr:`MAX_LÄNGE` Namen behalten, danach fängt die Liste neu an.
+    Wer einen älteren Stand hat, muss dann alles neu lesen.
+    """
+    __slots__ = ("_namen", "_anfang")
+    MAX_LÄNGE = 1024
+
+    def __init__(self) -> None:
+        self._namen: list[str] = []
+        self._anfang = 0
+
+    @property
+    def stand(self) -> int:
+        return self._anfang + len(self._namen)
+
+    def merke(self, name: str) -> None:
+        if len(self._namen) >= self.MAX_LÄNGE:
+            self._anfang += len(self._namen)
+            self._namen.clear()
+        self._namen.append(name)
+
+    def seit(self, stand: int) -> list[str] | None:
+        """Die Namen, die sich seit `stand` geändert haben, auch doppelt. None, wenn sie nicht
+        mehr bekannt sind."""
+        if stand < self._anfang:
+            return None
+        return self._namen[stand - self._anfang:]
+
+
+class Variablen(MutableMapping[str, V], Generic[V]):
+    """Ein dict mit Copy-on-Write: :py:meth:`fork` kopiert in O(1).
+
+    Die Variablen liegen in Schichten. Geändert wird nur die oberste Schicht, die darunter
+    werden geteilt und nie mehr verändert. Bei einem Fork wird die oberste Schicht eingefroren
+    und beide Seiten bekommen eine neue, leere. Ab :py:attr:`MAX_TIEFE` Schichten werden die
+    Schichten beim nächsten Fork zu einer zusammengelegt, damit das Lesen schnell bleibt.
+    """
+    __slots__ = ("_oben", "_unten", "_tiefe", "änderungen")
+    MAX_TIEFE = 8
+
+    def __init__(self, daten: Mapping[str, V] | Iterable[tuple[str, V]] = ()) -> None:
+        self._oben: dict[str, V | _Gelöscht] = dict(daten)
+        self._unten: Variablen[V] | None = None
+        self._tiefe = 0
+        self.änderungen: Änderungen | None = None
+        """Wenn gesetzt, wird dort jede geänderte Variable gemerkt. Kopien von :py:meth:`fork`
+        haben keine."""
+
+    @classmethod
+    def von(cls, daten: 'Mapping[str, V] | Iterable[tuple[str, V]]') -> 'Variablen[V]':
+        """Übernimmt Variablen ohne Kopie, macht aus allem anderen neue."""
+        if isinstance(daten, Variablen):
+            return daten
+        return cls(daten)
+
+    @classmethod
+    def _aus(cls, oben: dict[str, V | _Gelöscht], unten: 'Variablen[V] | None',
+             tiefe: int) -> 'Variablen[V]':
+        neu = cls.__new__(cls)
+        neu._oben = oben
+        neu._unten = unten
+        neu._tiefe = tiefe
+        neu.änderungen = None
+        return neu
+
+    def fork(self) -> 'Variablen[V]':
+        """Eine unabhängige Kopie. Änderungen an einer Seite sieht die andere nicht."""
+        if self._oben:
+            if self._tiefe >= self.MAX_TIEFE:
+                basis = Variablen._aus(self._flach(), None, 0)
+            else:
+                basis = Variablen._aus(self._oben, self._unten, self._tiefe)
+            self._oben = {}
+            self._unten = basis
+            self._tiefe = basis._tiefe + 1
+        return Variablen._aus({}, self._unten, self._tiefe)
+
+    def _flach(self) -> dict[str, V | _Gelöscht]:
+        """Alle Schichten zusammengelegt, ohne gelöschte Variablen."""
+        schichten = []
+        schicht: Variablen[V] | None = self
+        while schicht is not None:
+            schichten.append(schicht._oben)
+            schicht = schicht._unten
+        flach: dict[str, V | _Gelöscht] = {}
+        for oben in reversed(schichten):
+            flach.update(oben)
+        return {key: wert for key, wert in flach.items() if wert is not _GELÖSCHT}
+
+    def __getitem__(self, key: str) -> V:
+        schicht: Variablen[V] | None = self
+        while schicht is not None:
+            wert = schicht._oben.get(key, _FEHLT)
+            if wert is not _FEHLT:
+                if wert is _GELÖSCHT:
+                    break
+                return wert  # type: ignore
+            schicht = schicht._unten
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, wert: V) -> None:
+        self._oben[key] = wert
+        if self.änderungen is not None:
+            self.änderungen.merke(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if self._unten is not None and key in self._unten:
+            self._oben[key] = _GELÖSCHT
+        else:
+            del self._oben[key]
+        if self.änderungen is not None:
+            self.änderungen.merke(key)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._unten is None:
+            return iter(self._oben)
+        return iter(self._flach())
+
+    def __len__(self) -> int:
+        if self._unten is None:
+            return len(self._oben)
+        return len(self._flach())
+
+    def __repr__(self) -> str:
+        return f"Variablen({self._flach()!r})"
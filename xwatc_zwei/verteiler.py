@@ -1,23 +1,55 @@
 """Die Verteiler wählen Geschichtsmodule"""
-from collections.abc import Sequence
-from queue import PriorityQueue
+from collections.abc import Callable, Iterator, Mapping, Sequence
+import copy
+from functools import cached_property
+import heapq
+import math
+from os import PathLike
 import random
-from typing import Any, Self, assert_never, cast
+import threading
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Final, NoReturn, Self, assert_never, cast
 
-from attrs import Factory, define, field
+from attrs import Factory, define, evolve, field
 
-from xwatc_zwei import bedingung
+from xwatc_zwei import auswahl, bedingung
 from xwatc_zwei import mänx as mänx_mod
-from xwatc_zwei import geschichte
-from xwatc_zwei.geschichte import (Bedingung, Bedingungsobjekt, Entscheidung, FunktionsZeile,
-                                   IfElif, InputZeile, OutputZeile, Sonderziel, Sprung, VarTypError, Zeile)
+from xwatc_zwei import geschichte, programm
+from xwatc_zwei.geschichte import (Bedingung, Entscheidung, FunktionsZeile, IfElif,
+                                   InputZeile, OutputZeile, Sprung, VarTypError, Zeile)
+from xwatc_zwei.programm import Op, ortsname
+from xwatc_zwei.variablen import Variablen
+
+if TYPE_CHECKING:
+    from xwatc_zwei.protokoll import Beobachter
+
+SPIELSTAND_VERSION = 1
+"""Version des Formats von :py:meth:`Spielzustand.speichern`."""
+_ZEIT_PRÜFEN = 1024
+"""Nach so vielen Rücksprüngen wird die Zeit geprüft, wenn `Spielzustand.max_dauer` gesetzt
+ist."""
+
+
+class Endlosschleife(RuntimeError):
+    """Ein Zug wurde abgebrochen, weil er zu oft zurückgesprungen ist oder zu lange gedauert
+    hat, siehe :py:attr:`Spielzustand.max_sprünge`."""
+
+    def __init__(self, meldung: str, blöcke: Sequence[str]) -> None:
+        super().__init__(meldung)
+        self.blöcke = blöcke
+        """Die Ids der Blöcke in der Schleife."""
 
 
 @define
 class Geschichtsblock:
     """Ein einzelner, ununterbrochener Geschichtsstrang."""
     id: str
-    zeilen: list[Zeile]
+    zeilen: Sequence[Zeile] = field(converter=geschichte.zeilentupel)
+    quelle: dict[tuple[int, ...], geschichte.Quellzeilen] = field(
+        factory=dict, eq=False, repr=False)
+    """Die Zeilen in der Datei zu den Positionen, siehe :py:func:`geschichte.ordne_quelle`.
+    Unter ``()`` steht der Kopf des Blocks. Leer, wenn der Block nicht aus einer Datei kommt."""
 
     def __getitem__(self, key: int | Sequence[int]) -> Zeile:
         if isinstance(key, int):
@@ -36,53 +68,150 @@ class Geschichtsblock:
 @define(frozen=True)
 class Geschichte:
     """Eine Geschichte ist eine einzige Sache, die dem Abenteurer passiert.
+
+    Beim Erstellen werden die Ids der Blöcke indiziert und die Blöcke zu einem
+    :py:class:`programm.Programm` übersetzt.
     """
     module: Sequence[Geschichtsblock] = field()
     pfad: str = ""
-
-    @module.validator
-    def _validate_module(self, _attribute, value: Sequence[Geschichtsblock]) -> None:
-        """Validate that all modules' ids are unique."""
-        seen = set()
-        for mod in value:
-            if mod.id in seen:
+    datei: str = field(default="", eq=False, repr=False)
+    """Die Datei, aus der die Geschichte geladen wurde, leer wenn sie nicht aus einer kommt."""
+
+    def __attrs_post_init__(self) -> None:
+        self.index
+        self.programm
+
+    @cached_property
+    def index(self) -> Mapping[str, Geschichtsblock]:
+        """Die Blöcke nach ihrer Id. Prüft dabei, dass alle Ids eindeutig sind."""
+        index: dict[str, Geschichtsblock] = {}
+        for mod in self.module:
+            if mod.id in index:
                 raise ValueError(f"Doppelt vergebene Geschichtsmodul-Id {mod.id}")
-            seen.add(mod.id)
+            index[mod.id] = mod
+        return MappingProxyType(index)
+
+    @cached_property
+    def programm(self) -> programm.Programm:
+        """Die Geschichte als flaches Programm für den Interpreter."""
+        return programm.übersetze(self.module)
+
+    def stelle(self, pc: int, bedingung: Bedingung | None = None) -> str:
+        """Wo ein Befehl steht, für Fehlermeldungen: `datei:zeile`, wenn die Zeile bekannt ist,
+        sonst Pfad und Ortsname wie `pfad/a.2B.1`. Mit `bedingung` die Stelle des Falls oder
+        der Wahl, zu der die Bedingung gehört."""
+        programm = self.programm
+        block = programm.blöcke[pc]
+        pos = programm.positionen[pc]
+        name = ortsname(block.id, pos)
+        zeile = programm.befehle[pc].zeile
+        if bedingung is not None and isinstance(zeile, IfElif | Entscheidung):
+            bedingungen = ([bed for bed, __ in zeile.fälle] if isinstance(zeile, IfElif)
+                           else [wahl.bedingung for wahl in zeile.wahlen])
+            for j, bed in enumerate(bedingungen):
+                if bed is bedingung:
+                    pos, name = (*pos, j), name + chr(0x41 + j)
+                    break
+        if self.datei and (quelle := block.quelle.get(pos)):
+            return f"{self.datei}:{quelle[0]}"
+        return f"{self.pfad}/{name}"
 
     def block_by_id(self, name: str) -> Geschichtsblock:
         """Finde ein Modul mithilfe seiner Id."""
-        for modul in self.module:
-            if modul.id == name:
-                return modul
-        raise KeyError("Unbekanntes Modul", name)
+        try:
+            return self.index[name]
+        except KeyError:
+            raise KeyError("Unbekanntes Modul", name) from None
+
+
+@define(frozen=True)
+class Geschichtsverweis:
+    """Verweis auf eine Geschichte, die erst geladen wird, wenn sie gebraucht wird."""
+    pfad: str
+    """Der Pfad, den die Geschichte haben wird, siehe :py:attr:`Geschichte.pfad`."""
+    datei: PathLike
 
 
 @define(frozen=True)
 class Situation:
-    """Eine Situation ist eine Sammlung von Geschichten, die am selben Ort abspielen."""
+    """Eine Situation ist eine Sammlung von Geschichten, die am selben Ort abspielen.
+
+    Jede Geschichte kann ein Gewicht und eine Bedingung haben. Ohne wird sie mit Gewicht 1
+    immer gewählt.
+    """
     id: str
-    geschichten: Sequence[Geschichte]
+    geschichten: Sequence[Geschichte | Geschichtsverweis]
+    gewichte: Sequence[int] = ()
+    bedingungen: Sequence[Bedingung | None] = ()
+
+    def auswahl(self) -> auswahl.Auswahl:
+        """Eine neue Auswahl über die Geschichten."""
+        anzahl = len(self.geschichten)
+        return auswahl.Auswahl(self.gewichte or [1] * anzahl,
+                               self.bedingungen or [None] * anzahl)
 
 
 @define(frozen=False)
 class Verteiler:
-    """Der Verteiler gibt die Geschichten aus, die dem Spieler passieren."""
+    """Der Verteiler gibt die Geschichten aus, die dem Spieler passieren.
+
+    Situationen können statt Geschichten auch Verweise enthalten, die erst mit dem `lader`
+    geladen werden, wenn die Geschichte gebraucht wird. Mit `vorladen` werden die anderen
+    Geschichten der aktuellen Situation im Hintergrund geladen.
+
+    Geschichten können mit :py:meth:`reihe_ein` für eine Zeit eingereiht werden. Die
+    `starter` werden gleich am Anfang eingereiht.
+    """
     _situationen: list[Situation]
     _situation: Situation
-    _warteliste: PriorityQueue[tuple[int, str, str]] = Factory(PriorityQueue)
+    _warteliste: list[tuple[int, str, str]] = Factory(list)
+    """Ein Heap aus (Zeit, Situation, Pfad), siehe :py:meth:`reihe_ein`."""
     _geschichten: dict[str, Geschichte] = Factory(dict)
     zeit: int = 1
+    """Die Spielzeit. Sie zählt die angefangenen Geschichten."""
+    _lader: Callable[[PathLike], Geschichte] | None = None
+    _vorladen: bool = False
+    _starter: Sequence[Geschichte | Geschichtsverweis] = ()
+    _auswahlen: dict[str, auswahl.Auswahl] = Factory(dict)
+    """Die Auswahl für jede Situation, wird erst erstellt, wenn sie gebraucht wird."""
+    _verweise: dict[str, Geschichtsverweis] = Factory(dict)
+    _lade_lock: threading.Lock = Factory(threading.Lock)
+    """Schützt nur :py:attr:`_lade_locks`, geladen wird unter dem Lock des Pfads."""
+    _lade_locks: dict[str, threading.Lock] = Factory(dict)
+    _vorlade_thread: threading.Thread | None = None
 
     def __attrs_post_init__(self):
         self._update_geschichten()
+        for starter in self._starter:
+            self.reihe_ein(starter.pfad)
+        if self._vorladen:
+            self._starte_vorladen(self._situation)
 
     def _update_geschichten(self):
-        """Update den Cache für Geschichten aus den gegebenen Situationen."""
-        for situation in self._situationen:
+        """Update den Cache für Geschichten aus den gegebenen Situationen und Startern."""
+        for situation in [*self._situationen, Situation("", self._starter)]:
             for geschichte in situation.geschichten:
-                if geschichte.pfad:
+                if isinstance(geschichte, Geschichtsverweis):
+                    self._verweise[geschichte.pfad] = geschichte
+                elif geschichte.pfad:
                     self._geschichten[geschichte.pfad] = geschichte
 
+    def _starte_vorladen(self, situation: Situation) -> None:
+        """Lade die Geschichten einer Situation in einem Hintergrund-Thread."""
+        namen = [geschichte.pfad for geschichte in situation.geschichten
+                 if isinstance(geschichte, Geschichtsverweis)]
+        if namen:
+            self._vorlade_thread = threading.Thread(
+                target=self._lade_im_hintergrund, args=(namen,), name="Vorladen", daemon=True)
+            self._vorlade_thread.start()
+
+    def _lade_im_hintergrund(self, namen: Sequence[str]) -> None:
+        for name in namen:
+            try:
+                self.geschichte_by_id(name)
+            except Exception:  # Der Fehler kommt, wenn die Geschichte wirklich gebraucht wird.
+                pass
+
     @classmethod
     def aus_geschichte(cls, geschichte: Geschichte) -> Self:
         """Mache einen Test-Verteiler aus einer einzigen Geschichte."""
@@ -90,42 +219,188 @@ class Verteiler:
         return cls([situation], situation)
 
     def geschichte_by_id(self, name: str) -> Geschichte:
-        """Hole die Geschichte mit ihrem Pfad."""
-        return self._geschichten[name]
-
-    def nächste_geschichte(self, daten: bedingung.Bedingungsdaten) -> Geschichte:
-        """Hole die nächste Geschichte raus."""
-        return random.choice(self._situation.geschichten)
+        """Hole die Geschichte mit ihrem Pfad. Sie wird geladen, wenn das noch nicht passiert
+        ist."""
+        if (geschichte := self._geschichten.get(name)) is not None:
+            return geschichte
+        with self._pfad_lock(name):
+            if (geschichte := self._geschichten.get(name)) is not None:
+                return geschichte
+            verweis = self._verweise[name]
+            if not self._lader:
+                raise ValueError(f"Verteiler hat keinen Lader für {name}.")
+            geschichte = self._lader(verweis.datei)
+            self._geschichten[name] = geschichte
+            return geschichte
+
+    def _pfad_lock(self, name: str) -> threading.Lock:
+        """Der Lock, unter dem die Geschichte mit diesem Pfad geladen oder ersetzt wird."""
+        with self._lade_lock:
+            return self._lade_locks.setdefault(name, threading.Lock())
+
+    def pfade(self) -> set[str]:
+        """Die Pfade aller Geschichten, geladen oder nicht."""
+        return {*self._geschichten, *self._verweise}
+
+    def ersetze_geschichte(self, neu: Geschichte) -> None:
+        """Tausche die Geschichte mit dem gleichen Pfad gegen eine neu geladene aus. Lädt sie
+        gerade das Vorladen, wird darauf gewartet, damit es die neue nicht überschreibt."""
+        with self._pfad_lock(neu.pfad):
+            self._geschichten[neu.pfad] = neu
+        for i, situation in enumerate(self._situationen):
+            geschichten = [neu if isinstance(alt, Geschichte) and alt.pfad == neu.pfad else alt
+                           for alt in situation.geschichten]
+            if any(a is not b for a, b in zip(geschichten, situation.geschichten)):
+                self._situationen[i] = evolve(situation, geschichten=geschichten)
+                if self._situation is situation:
+                    self._situation = self._situationen[i]
+
+    def situation_by_id(self, id: str) -> Situation:
+        """Finde eine Situation mit ihrer Id.
+
+        :raises KeyError: wenn es die Situation nicht gibt.
+        """
+        for situation in self._situationen:
+            if situation.id == id:
+                return situation
+        raise KeyError("Unbekannte Situation", id)
+
+    def speichern(self) -> dict[str, Any]:
+        """Der veränderliche Teil des Verteilers für einen Spielstand."""
+        return {"zeit": self.zeit, "situation": self._situation.id,
+                "warteliste": [list(eintrag) for eintrag in sorted(self._warteliste)]}
+
+    def laden(self, daten: dict[str, Any]) -> None:
+        """Setze den Verteiler auf einen gespeicherten Stand."""
+        self._situation = self.situation_by_id(daten["situation"])
+        self.zeit = daten["zeit"]
+        self._warteliste = [(zeit, situation_id, pfad)
+                            for zeit, situation_id, pfad in daten["warteliste"]]
+        heapq.heapify(self._warteliste)
+
+    def fork(self) -> Self:
+        """Eine Kopie mit eigener Zeit, Situation und Warteliste. Die Geschichten selbst
+        werden geteilt, aber die Listen und dicts kopiert, damit :py:meth:`ersetze_geschichte`
+        nur diese Kopie ändert."""
+        kopie = copy.copy(self)
+        kopie._warteliste = self._warteliste.copy()
+        kopie._situationen = self._situationen.copy()
+        kopie._geschichten = self._geschichten.copy()
+        kopie._verweise = self._verweise.copy()
+        kopie._auswahlen = self._auswahlen.copy()
+        return kopie
+
+    def reihe_ein(self, pfad: str, zeit: int | None = None, situation: str = "") -> None:
+        """Reihe eine Geschichte ein. Sie kommt dran, sobald die `zeit` erreicht ist, ohne Zeit
+        sofort. Geschichten mit gleicher Zeit kommen nach Situation und Pfad sortiert dran.
+
+        :param situation: Wenn die Geschichte drankommt, wechselt der Verteiler in diese
+        Situation. Leer bleibt die Situation gleich.
+        :raises KeyError: wenn der Verteiler die Geschichte oder die Situation nicht kennt.
+        """
+        if pfad not in self._geschichten and pfad not in self._verweise:
+            raise KeyError("Unbekannte Geschichte", pfad)
+        if situation:
+            self.situation_by_id(situation)
+        heapq.heappush(self._warteliste, (self.zeit if zeit is None else zeit, situation, pfad))
+
+    def nächste_geschichte(self, daten: bedingung.Testdaten) -> Geschichte:
+        """Hole die nächste Geschichte raus: die erste fällige aus der Warteliste, sonst eine
+        aus der aktuellen Situation, deren Bedingung erfüllt ist, nach ihrem Gewicht. Die Zeit
+        läuft dabei eins weiter.
+
+        :raises ValueError: wenn keine Geschichte der Situation möglich ist.
+        """
+        warteliste = self._warteliste
+        if warteliste and warteliste[0][0] <= self.zeit:
+            __, situation, pfad = heapq.heappop(warteliste)
+            if situation:
+                self._situation = self.situation_by_id(situation)
+            geschichte: Geschichte | Geschichtsverweis = self.geschichte_by_id(pfad)
+        else:
+            situation_ = self._situation
+            if (auswahl_ := self._auswahlen.get(situation_.id)) is None:
+                auswahl_ = self._auswahlen[situation_.id] = situation_.auswahl()
+            try:
+                geschichte = situation_.geschichten[auswahl_.ziehe(daten, daten.get_rng())]
+            except ValueError:
+                raise ValueError(f"Keine Geschichte der Situation {situation_.id} ist gerade "
+                                 "möglich.") from None
+        self.zeit += 1
+        if isinstance(geschichte, Geschichtsverweis):
+            return self.geschichte_by_id(geschichte.pfad)
+        return geschichte
 
 
 @define
 class Weltposition:
-    """Eine Position in der Geschichte."""
+    """Eine Position in der Geschichte, als Index in ihr Programm."""
     geschichte: Geschichte
-    block: Geschichtsblock
-    pos: tuple[int, ...] = (0,)
-    modul_vars: 'dict[str, mänx_mod.VarTyp]' = Factory(dict)
+    pc: int = 0
+    modul_vars: 'Variablen[mänx_mod.VarTyp]' = field(factory=Variablen,
+                                                     converter=mänx_mod.als_variablen)
 
     @staticmethod
     def start(geschichte: Geschichte) -> 'Weltposition':
         """Die Weltposition am Anfang der Geschichte, mit keiner Variable gesetzt."""
-        return Weltposition(geschichte, geschichte.module[0])
+        return Weltposition(geschichte, geschichte.programm.starts[geschichte.module[0].id])
 
-    def aktuelle_zeile(self) -> Zeile | None:
-        """Gebe die aktuelle Zeile aus. Wenn die aktuelle Position hinter
-        dem Ende ist, gebe None zurück."""
-        while True:
-            try:
-                return self.block[self.pos]
-            except IndexError:
-                if len(self.pos) > 1:
-                    self.pos = (*self.pos[:-3], self.pos[-3] + 1)
-                else:
-                    return None
+    @property
+    def block(self) -> Geschichtsblock:
+        """Der Block, in dem die Position liegt."""
+        return self.geschichte.programm.blöcke[self.pc]
+
+    @property
+    def pos(self) -> tuple[int, ...]:
+        """Die Position innerhalb des Blocks, siehe :py:meth:`Geschichtsblock.__getitem__`."""
+        return self.geschichte.programm.positionen[self.pc]
 
-    def advance(self) -> None:
-        """Bewege die Position um genau 1 nach vorne."""
-        self.pos = (*self.pos[:-1], self.pos[-1] + 1)
+    @staticmethod
+    def an(geschichte: Geschichte, block: str, pos: tuple[int, ...],
+           modul_vars: 'Mapping[str, mänx_mod.VarTyp]', op: Op | None = None
+           ) -> 'Weltposition':
+        """Die Weltposition an einer Stelle in einem Block.
+
+        Gibt es die Stelle nicht oder steht dort kein Befehl der Art `op`, geht es am Anfang
+        des Blocks weiter, und wenn es den Block nicht gibt, am Anfang der Geschichte.
+        """
+        programm = geschichte.programm
+        try:
+            pc = programm.pc_von(block, pos)
+            if op is not None and programm.befehle[pc].op is not op:
+                raise KeyError(pc)
+        except KeyError:
+            pc = programm.starts.get(block, programm.starts[geschichte.module[0].id])
+        return Weltposition(geschichte, pc, Variablen.von(modul_vars))
+
+    def übertrage(self, neu: Geschichte) -> 'Weltposition':
+        """Die gleiche Position in einer neu geladenen Version der Geschichte, siehe
+        :py:meth:`an`. Die Modulvariablen bleiben erhalten."""
+        befehl = self.geschichte.programm.befehle[self.pc]
+        return Weltposition.an(neu, self.block.id, self.pos, self.modul_vars, befehl.op)
+
+    def speichern(self) -> dict[str, Any]:
+        """Die Position für einen Spielstand, mit der Geschichte nur als Pfad."""
+        if not self.geschichte.pfad:
+            raise ValueError("Eine Geschichte ohne Pfad kann nicht gespeichert werden.")
+        return {"geschichte": self.geschichte.pfad, "block": self.block.id, "pos": self.pos,
+                "op": self.geschichte.programm.befehle[self.pc].op.name,
+                "modul_vars": dict(self.modul_vars)}
+
+    def fork(self) -> 'Weltposition':
+        """Eine unabhängige Kopie in O(1), siehe :py:meth:`Variablen.fork`."""
+        return Weltposition(self.geschichte, self.pc, self.modul_vars.fork())
+
+    @staticmethod
+    def laden(daten: dict[str, Any], verteiler: 'Verteiler') -> 'Weltposition':
+        """Lade eine gespeicherte Position, siehe :py:meth:`an`."""
+        return Weltposition.an(verteiler.geschichte_by_id(daten["geschichte"]), daten["block"],
+                               tuple(daten["pos"]), dict(daten["modul_vars"]), Op[daten["op"]])
+
+    def aktuelle_zeile(self) -> Zeile | None:
+        """Gebe die Zeile aus, an der das Programm steht. Am Ende der Geschichte gebe None
+        zurück."""
+        return self.geschichte.programm.befehle[self.pc].zeile
 
 
 @define
@@ -136,14 +411,90 @@ class Spielzustand(bedingung.Bedingungsdaten):
     _mänx: None | mänx_mod.Mänx = None
     _welt: None | mänx_mod.Welt = None
     _outputs: list[OutputZeile] = Factory(list)
+    _rng: random.Random = Factory(random.Random)
+    ende: Weltposition | None = field(default=None, init=False)
+    """Die Position, an der die letzte Geschichte geendet hat."""
+    protokoll: 'Beobachter | None' = field(default=None, kw_only=True)
+    """Wenn gesetzt, werden Befehle, Bedingungen, Sprünge und Züge dorthin gemeldet, z.B. an
+    ein :py:class:`xwatc_zwei.protokoll.Protokoll`. Kopien von :py:meth:`fork` melden nichts."""
+    max_sprünge: int | None = field(default=None, kw_only=True)
+    """Wie oft ein Zug höchstens zurückspringen darf, sonst wird er mit
+    :py:class:`Endlosschleife` abgebrochen. Jede Schleife ohne Eingabe springt einmal pro
+    Runde zurück. None für keine Grenze."""
+    max_dauer: float | None = field(default=None, kw_only=True)
+    """Wie viele Sekunden ein Zug höchstens dauern darf, geprüft bei Rücksprüngen."""
+    züge: int = field(default=0, init=False)
+    """Die Zahl der Züge, zum Beobachten."""
+    sprünge: int = field(default=0, init=False)
+    """Die Zahl aller Rücksprünge, zum Beobachten."""
+    _prüfung: float = field(default=math.inf, init=False)
+    """Bei dieser Zahl von `sprünge` prüft :py:meth:`_prüfe_grenzen` die Grenzen."""
+    _grenze: float = field(default=math.inf, init=False)
+    _frist: float = field(default=math.inf, init=False)
 
     @classmethod
-    def from_verteiler(cls, verteiler: Verteiler) -> Self:
-        return cls(verteiler, mänx=mänx_mod.Mänx.default(), welt=mänx_mod.Welt())
+    def from_verteiler(cls, verteiler: Verteiler, seed: int | str | None = None) -> Self:
+        """Neues Spiel. Mit dem gleichen `seed` läuft es bei gleichen Eingaben gleich ab."""
+        return cls(verteiler, mänx=mänx_mod.Mänx.default(), welt=mänx_mod.Welt(),
+                   rng=random.Random(seed))
 
     @classmethod
-    def aus_geschichte(cls, geschichte: Geschichte) -> Self:
-        return cls.from_verteiler(Verteiler.aus_geschichte(geschichte))
+    def aus_geschichte(cls, geschichte: Geschichte, seed: int | str | None = None) -> Self:
+        return cls.from_verteiler(Verteiler.aus_geschichte(geschichte), seed)
+
+    def speichern(self) -> dict[str, Any]:
+        """Der ganze Spielzustand als JSON-taugliches dict. Geschichten werden nur über ihren
+        Pfad und Blöcke über ihre Id gespeichert, nicht der Inhalt."""
+        version, intern, gauss = self._rng.getstate()
+        return {
+            "version": SPIELSTAND_VERSION,
+            "position": self._position.speichern() if self._position else None,
+            "mänx": self._mänx.speichern() if self._mänx else None,
+            "welt": self._welt.speichern() if self._welt else None,
+            "zufall": [version, intern, gauss],
+            "verteiler": self.verteiler.speichern(),
+        }
+
+    @classmethod
+    def laden(cls, daten: dict[str, Any], verteiler: Verteiler) -> Self:
+        """Lade einen Spielstand aus :py:meth:`speichern`. Der Verteiler muss die gespeicherten
+        Geschichten kennen.
+
+        :raises ValueError: wenn der Spielstand eine andere Version hat.
+        """
+        if daten.get("version") != SPIELSTAND_VERSION:
+            raise ValueError(f"Spielstand hat Version {daten.get('version')}, "
+                             f"erwartet {SPIELSTAND_VERSION}.")
+        verteiler.laden(daten["verteiler"])
+        rng = random.Random()
+        version, intern, gauss = daten["zufall"]
+        rng.setstate((version, tuple(intern), gauss))
+        return cls(
+            verteiler,
+            Weltposition.laden(daten["position"], verteiler) if daten["position"] else None,
+            mänx_mod.Mänx.laden(daten["mänx"]) if daten["mänx"] else None,
+            mänx_mod.Welt.laden(daten["welt"]) if daten["welt"] is not None else None,
+            rng=rng)
+
+    def fork(self) -> Self:
+        """Eine unabhängige Kopie des Spiels, z.B. um an einer Entscheidung alle Wahlen
+        auszuprobieren. Variablen werden erst kopiert, wenn sie geändert werden, vom Verteiler
+        nur die Warteliste, siehe :py:meth:`Verteiler.fork`."""
+        rng = random.Random()
+        rng.setstate(self._rng.getstate())
+        kopie = type(self)(
+            self.verteiler.fork(),
+            self._position.fork() if self._position else None,
+            self._mänx.fork() if self._mänx else None,
+            self._welt.fork() if self._welt else None,
+            list(self._outputs), rng, max_sprünge=self.max_sprünge, max_dauer=self.max_dauer)
+        kopie.ende = self.ende
+        return kopie
+
+    @property
+    def position(self) -> Weltposition | None:
+        """Die aktuelle Position, None zwischen zwei Geschichten."""
+        return self._position
 
     def get_mänx(self) -> mänx_mod.Mänx | None:
         return self._mänx
@@ -151,28 +502,245 @@ class Spielzustand(bedingung.Bedingungsdaten):
     def get_welt(self) -> mänx_mod.Welt | None:
         return self._welt
 
+    def get_rng(self) -> random.Random:
+        return self._rng
+
+    def zufallszustand(self) -> object:
+        """Ein Schnappschuss des Zufallsgenerators, für :py:meth:`setze_zufallszustand`."""
+        return self._rng.getstate()
+
+    def setze_zufallszustand(self, zustand: object) -> None:
+        """Setze den Zufallsgenerator auf einen Schnappschuss zurück."""
+        self._rng.setstate(zustand)  # type: ignore
+
     def run(self, input: str) -> tuple[Sequence[OutputZeile], InputZeile]:
-        """Lasse die Geschichte bis zur nächsten Entscheidung laufen."""
+        """Lasse die Geschichte bis zur nächsten Entscheidung laufen.
+
+        :raises Endlosschleife: wenn der Zug `max_sprünge` oder `max_dauer` überschreitet.
+        """
+        self._beginne_zug()
+        if self.protokoll is not None and not self.protokoll.nur_befehle:
+            return self._zug_protokolliert(input)
         self._entscheide(input)
-        while True:
-            if not self._position:
-                self._position = Weltposition.start(self.verteiler.nächste_geschichte(self))
-            zeile = self._position.aktuelle_zeile()
-            if not zeile:  # Ende der Geschichte
-                self._position = None
-                outputs = self._outputs.copy()
-                self._outputs.clear()
-                return outputs, Entscheidung.neue_bestätigung()
-            if isinstance(zeile, OutputZeile):
-                self._outputs.append(zeile)
+        return self._fortsetzen()
+
+    def fortsetzen(self) -> tuple[Sequence[OutputZeile], InputZeile]:
+        """Lasse die Geschichte von der aktuellen Position aus bis zur nächsten Entscheidung
+        laufen, ohne etwas zu entscheiden. Steht die Position schon an einer Entscheidung,
+        wird diese ohne Ausgaben zurückgegeben."""
+        self._beginne_zug()
+        if self.protokoll is not None and not self.protokoll.nur_befehle:
+            return self._zug_protokolliert(None)
+        return self._fortsetzen()
+
+    def strom(self, input: str | None = "") -> Iterator[OutputZeile | InputZeile]:
+        """Wie :py:meth:`run`, aber jede Ausgabe kommt einzeln, sobald sie ausgeführt ist, und
+        als letztes die Entscheidung oder das Treffen. Mit `input` None wie
+        :py:meth:`fortsetzen`. Bis der Strom zu Ende ist, darf nicht anders weitergespielt
+        werden."""
+        self._beginne_zug()
+        protokoll = self.protokoll
+        if protokoll is not None and protokoll.nur_befehle:
+            protokoll = None
+        start = time.perf_counter_ns() if protokoll is not None else 0
+        dauer = 0
+        if input is not None:
+            self._entscheide(input)
+        if not self._position:
+            self._position = Weltposition.start(self.verteiler.nächste_geschichte(self))
+        while (zeile := self._ausführen(einzeln=True)) is not None:
             if isinstance(zeile, InputZeile):
-                return self._outputs, zeile
-            else:
-                self._run_line()
+                break
+            if protokoll is not None:  # Die Zeit beim Empfänger zählt nicht zum Zug.
+                dauer += time.perf_counter_ns() - start
+            pause = time.perf_counter()
+            yield cast(OutputZeile, zeile)
+            self._frist += time.perf_counter() - pause  # Auch nicht zu `max_dauer`.
+            if protokoll is not None:
+                start = time.perf_counter_ns()
+        position = self._position
+        if zeile is None:
+            self.ende = position
+            self._position = None
+        if protokoll is not None:
+            dauer += time.perf_counter_ns() - start
+            protokoll.zug(position.geschichte.pfad, position.pc, input, dauer)
+        yield zeile if zeile is not None else Entscheidung.neue_bestätigung()
+
+    def _beginne_zug(self) -> None:
+        """Setze die Grenzen für einen neuen Zug."""
+        self.züge += 1
+        self._grenze = self.sprünge + (
+            self.max_sprünge if self.max_sprünge is not None else math.inf)
+        self._frist = time.perf_counter() + (
+            self.max_dauer if self.max_dauer is not None else math.inf)
+        self._prüfung = min(self._grenze + 1, self.sprünge + (
+            _ZEIT_PRÜFEN if self.max_dauer is not None else math.inf))
+
+    def _prüfe_grenzen(self, pc: int) -> None:
+        """Wird vom Interpreter aufgerufen, wenn `sprünge` `_prüfung` erreicht.
+
+        :raises Endlosschleife: wenn eine Grenze überschritten ist. Die Geschichte ist dann
+        beendet, wie nach :py:attr:`Op.ENDE`, und der nächste Zug fängt die nächste an.
+        """
+        if self.sprünge > self._grenze:
+            grund = f"nach mehr als {self.max_sprünge} Rücksprüngen"
+        elif time.perf_counter() >= self._frist:
+            grund = f"nach {self.max_dauer} Sekunden"
+        else:
+            self._prüfung = min(self._grenze + 1, self.sprünge + _ZEIT_PRÜFEN)
+            return
+        position = self._position
+        assert position
+        programm = position.geschichte.programm
+        blöcke = list(dict.fromkeys(programm.blöcke[i].id
+                                    for i in programm.schleife(pc) or [pc]))
+        fehler = Endlosschleife(f"Zug {grund} abgebrochen, Schleife über {', '.join(blöcke)}",
+                                blöcke)
+        fehler.add_note(f"In {position.geschichte.stelle(pc)}")
+        position.pc = pc
+        self.ende = position
+        self._position = None
+        raise fehler
+
+    def _zug_protokolliert(self, input: str | None
+                           ) -> tuple[Sequence[OutputZeile], InputZeile]:
+        """Ein Zug wie :py:meth:`run` oder :py:meth:`fortsetzen`, dessen Dauer protokolliert
+        wird."""
+        assert self.protokoll is not None
+        start = time.perf_counter_ns()
+        if input is not None:
+            self._entscheide(input)
+        ergebnis = self._fortsetzen()
+        dauer = time.perf_counter_ns() - start
+        position = self._position or self.ende
+        self.protokoll.zug(position.geschichte.pfad if position else "",
+                           position.pc if position else -1, input, dauer)
+        return ergebnis
+
+    def _fortsetzen(self) -> tuple[Sequence[OutputZeile], InputZeile]:
+        if not self._position:
+            self._position = Weltposition.start(self.verteiler.nächste_geschichte(self))
+        try:
+            zeile = cast(InputZeile | None, self._ausführen())
+            outputs = self._outputs.copy()
+        finally:  # Nach einem Fehler gehören die Ausgaben nicht zum nächsten Zug.
+            self._outputs.clear()
+        if not zeile:  # Ende der Geschichte
+            self.ende = self._position
+            self._position = None
+            return outputs, Entscheidung.neue_bestätigung()
+        return outputs, zeile
+
+    def ersetze_geschichte(self, neu: Geschichte) -> None:
+        """Tausche eine Geschichte im laufenden Spiel aus, z.B. nachdem ihre Datei geändert
+        wurde. Ist das Spiel gerade in der Geschichte, wird die Position übertragen, siehe
+        :py:meth:`Weltposition.übertrage`."""
+        self.verteiler.ersetze_geschichte(neu)
+        if self._position and self._position.geschichte.pfad == neu.pfad:
+            self._position = self._position.übertrage(neu)
+
+    def _ausführen(self, einzeln: bool = False) -> Zeile | None:
+        """Führe das Programm aus, bis eine Eingabe gebraucht wird. Am Ende der Geschichte
+        gebe None zurück. Mit `einzeln` halte stattdessen nach jeder Ausgabe an und gebe sie
+        zurück, siehe :py:meth:`strom`.
+
+        Mit :py:attr:`protokoll` wird jeder Befehl, jede Bedingung und jeder Sprung gemeldet,
+        siehe :py:attr:`Beobachter.nur_befehle`. Ohne kostet das nur einen Vergleich mit einer
+        lokalen Variable pro Befehl."""
+        assert self._position, "Kann _ausführen nicht verwenden, wenn keine Position."
+        position = self._position
+        befehle = position.geschichte.programm.befehle
+        # Bei Op.AUSGABE ist die Zeile immer eine OutputZeile.
+        ausgeben = cast(Callable[[Zeile | None], None], self._outputs.append)
+        pc = position.pc
+        protokoll = self.protokoll
+        if protokoll is not None:
+            protokoll.beginne(position.geschichte)
+            voll = not protokoll.nur_befehle
+        else:
+            voll = False
+        pfad = position.geschichte.pfad
+        # Die häufigen Befehle als lokale Namen, sie werden bei jedem Schritt verglichen.
+        # Final, damit mypy die Literale kennt und `op` einengt.
+        ausgabe: Final = Op.AUSGABE
+        wenn: Final = Op.WENN
+        gehe: Final = Op.GEHE
+        try:
+            while True:
+                befehl = befehle[pc]
+                op = befehl.op
+                if protokoll is not None:
+                    protokoll.befehl(pfad, pc)
+                if op is ausgabe:
+                    if einzeln:
+                        position.pc = pc + 1
+                        return befehl.zeile
+                    ausgeben(befehl.zeile)
+                    pc += 1
+                elif op is wenn:
+                    if voll:
+                        pc = self._melde_wenn(pfad, pc, befehl)
+                    else:
+                        test = befehl.test
+                        assert test is not None
+                        pc = pc + 1 if test(self) else befehl.ziel
+                elif op is gehe:
+                    if voll:
+                        assert protokoll is not None
+                        protokoll.sprung(pfad, pc, befehl.ziel)
+                    if befehl.ziel <= pc:
+                        self.sprünge += 1
+                        if self.sprünge >= self._prüfung:
+                            self._prüfe_grenzen(pc)
+                    pc = befehl.ziel
+                elif op is Op.SETZE:
+                    globals_ = self._welt._variablen if self._welt else None
+                    position.pc = pc
+                    cast(geschichte.SetzeVariable, befehl.zeile).ausführen(
+                        position.modul_vars, globals_)
+                    pc += 1
+                elif op is Op.WAHL or op is Op.TREFFEN:
+                    position.pc = pc
+                    return cast(InputZeile, befehl.zeile)
+                elif op is Op.ENDE:
+                    position.pc = pc
+                    return None
+                elif op is Op.UNBEKANNT:
+                    position.pc = pc
+                    raise KeyError("Unbekanntes Modul", cast(Sprung, befehl.zeile).ziel)
+                else:
+                    assert_never(op)
+        except Endlosschleife:
+            raise  # Hat die Stelle schon, die Position ist beendet.
+        except Exception as fehler:
+            self._wirf_mit_stelle(fehler, pc, befehl.bedingung)
+
+    def _melde_wenn(self, pfad: str, pc: int, befehl: programm.Befehl) -> int:
+        """Werte eine Bedingung für :py:meth:`_ausführen` mit Protokoll aus und gebe den
+        nächsten Befehl zurück."""
+        assert self.protokoll is not None and befehl.test is not None
+        start = time.perf_counter_ns()
+        ergebnis = befehl.test(self)
+        self.protokoll.bedingung(pfad, pc, ergebnis, time.perf_counter_ns() - start)
+        if ergebnis:
+            return pc + 1
+        self.protokoll.sprung(pfad, pc, befehl.ziel)
+        return befehl.ziel
+
+    def _wirf_mit_stelle(self, fehler: Exception, pc: int, bedingung: Bedingung | None
+                         ) -> NoReturn:
+        """Wirf einen Fehler aus dem Programm mit der Stelle in der Datei: VarTypError davor,
+        andere Fehler bekommen sie als Notiz."""
+        assert self._position
+        stelle = self._position.geschichte.stelle(pc, bedingung)
+        if isinstance(fehler, VarTypError):
+            raise VarTypError(f"{stelle}: {fehler}") from fehler
+        fehler.add_note(f"In {stelle}")
+        raise fehler
 
     def _entscheide(self, id: str) -> None:
-        """Treffe eine Entscheidung und gebe die folgende Zeile zurück.
-        Wenn keine Entscheidung ansteht, nutze :py:`Spielzustand.next`.
+        """Treffe eine Entscheidung und springe zum Anfang der gewählten Möglichkeit.
 
         :raises ValueError: wenn gerade keine Entscheidung ansteht.
         """
@@ -181,8 +749,9 @@ class Spielzustand(bedingung.Bedingungsdaten):
                 raise ValueError("Kein Rückgabewert zum Start der Geschichte!")
             self._position = Weltposition.start(self.verteiler.nächste_geschichte(self))
             return
-        zeile = self._position.aktuelle_zeile()
-        if not isinstance(zeile, Entscheidung):
+        befehl = self._position.geschichte.programm.befehle[self._position.pc]
+        zeile = befehl.zeile
+        if befehl.op is not Op.WAHL or not isinstance(zeile, Entscheidung):
             raise ValueError("Keine Entscheidung steht an, kann `entscheide` nicht verwenden.")
         for i, wahl in enumerate(zeile.wahlen):
             if wahl.id == id:
@@ -191,53 +760,30 @@ class Spielzustand(bedingung.Bedingungsdaten):
                 break
         else:
             raise KeyError(f"Entscheidung {id} stand nicht zur Wahl.")
-        self._position.pos = (*self._position.pos, i, 0)
+        if self.protokoll is not None and not self.protokoll.nur_befehle:
+            self.protokoll.sprung(self._position.geschichte.pfad, self._position.pc,
+                                  befehl.ziele[i])
+        self._position.pc = befehl.ziele[i]
         self._position.modul_vars["_"] = id
 
-    def _run_line(self) -> None:
-        """Führe eine Zeile aus.
-
-        :param zeile: Die Zeile zum ausführen
-        :param advance: Ob nach dem Ausführen der Zeile, wenn es keinen Sprung gab, die Position
-        erhöht werden soll.
-        """
-        assert self._position, "Kann _run_line nicht verwenden, wenn keine Position."
-        zeile = self._position.aktuelle_zeile()
-        assert zeile, "Kann _run_line nicht verwenden, wenn hinter der letzten Zeile."
-        assert not isinstance(zeile, InputZeile), ("Kann _run_line nicht "
-                                                   "verwenden, wenn auf InputZeile")
-        jump = False
-        if isinstance(zeile, IfElif):
-            for j, (bed, _fall) in enumerate(zeile.fälle):
-                if not bed or self.eval_bedingung(bed):
-                    self._position.pos = (*self._position.pos, j, 0)
-                    jump = True
-                    break
-        elif isinstance(zeile, Sprung):
-            if zeile.ziel == Sonderziel.Self:
-                self._position.pos = (0,)
-            else:
-                self._position.block = self._position.geschichte.block_by_id(zeile.ziel)
-                self._position.pos = (0,)
-            jump = True
-        elif isinstance(zeile, geschichte.Text):
-            pass
-        elif isinstance(zeile, geschichte.Erhalten):
-            pass  # TODO Gebe dem Mänxen Zeugs
-        elif isinstance(zeile, geschichte.SetzeVariable):
-            globals_ = self._welt._variablen if self._welt else None
-            zeile.ausführen(self._position.modul_vars, globals_)
-        else:
-            assert_never(zeile)
-        if not jump:
-            self._position.advance()
-
     def eval_bedingung(self, bed: Bedingung | None) -> bool:
         """Evaluiere eine Bedingung zum jetzigen Zustand."""
         if not bed:
             return True
-        zustand: Bedingungsobjekt = self
-        return bed.test(zustand)
+        try:
+            if self.protokoll is None or self.protokoll.nur_befehle:
+                return bed.übersetzt(self)
+            start = time.perf_counter_ns()
+            ergebnis = bed.übersetzt(self)
+        except Exception as fehler:
+            if not self._position:
+                raise
+            self._wirf_mit_stelle(fehler, self._position.pc, bed)
+        position = self._position
+        self.protokoll.bedingung(position.geschichte.pfad if position else "",
+                                 position.pc if position else -1, ergebnis,
+                                 time.perf_counter_ns() - start)
+        return ergebnis
 
     def ist_variable(self, variable: str) -> bool:
         """Teste, ob eine Variable gesetzt ist."""
@@ -260,23 +806,6 @@ class Spielzustand(bedingung.Bedingungsdaten):
         func = bedingung.Bedingungsfunc.by_name(func_name)
         if not func:
             raise VarTypError(f"Unbekannte Regel {func_name}")
-        args_parsed: list[Any] = []
-        if len(args) > len(func.args):
-            raise VarTypError(f"{func_name} hat {len(args)} statt {len(func.args)} Argumente. "
-                              "Semikolon statt Komma?")
-        args = [*args] + [None] * (len(func.args) - len(args))
-        for i, (arg, (arg_t, is_opt)) in enumerate(zip(args, func.args, strict=True)):
-            if is_opt and arg is None:
-                args_parsed.append(None)
-            elif arg is None:
-                raise VarTypError(f"{func_name} hat {len(args)} statt {len(func.args)} Argumente. "
-                                  "Komma statt Semikolon?")
-            elif arg_t in (str, int):
-                if not isinstance(arg, arg_t):
-                    raise VarTypError(
-                        f"Das {i+1}-te Argument von {func_name} muss {arg_t.__name__} sein.")
-                args_parsed.append(arg)
-            else:
-                raise ValueError(f"Unbekannter Argumenttyp {arg_t} für {func_name}")
+        args_parsed = func.prüfe_argumente(func_name, args)
         daten: bedingung.Bedingungsdaten = self
         return func.callable(daten, *args_parsed)
@@ -0,0 +1,413 @@
+"""Ein handgeschriebener, zeilenbasierter Parser für Geschichten.
+
+Er erzeugt genau die gleichen Objekte wie die pyparsing-Grammatik in :py:mod:`xwatc_zwei.loader`,
+nutzt aber aus, dass das Format sowieso zeilen- und einrückungsbasiert ist: Jede Zeile wird
+einmal angeschaut, Blöcke werden über die Spalte ihrer ersten Zeile erkannt, und Bedingungen
+werden mit einem kleinen Pratt-Parser gelesen.
+
+Anders als bei pyparsing können Bedingungen und Zeilen nicht über mehrere Zeilen gehen.
+"""
+from collections.abc import Callable, Sequence
+from os import PathLike
+import re
+
+from attrs import define, field
+
+from xwatc_zwei import geschichte, verteiler
+
+_IDENT = re.compile(r"[A-Z_a-zªµºÀ-ÖØ-öø-ÿ][0-9A-Z_a-zªµ·ºÀ-ÖØ-öø-ÿ]*")
+_GANZZAHL = re.compile(r"[0-9]+")
+_VORZEICHENZAHL = re.compile(r"[+-]?\d+")
+_ZITAT = re.compile(r'"(?:(?:\\.)|(?:[^"\n\r\\]))*"')
+_ENTZITAT = re.compile(r"(\\t|\\n|\\f|\\r)|(\\.)|(\n|.)")
+_ESCAPES = {"\\t": "\t", "\\n": "\n", "\\f": "\f", "\\r": "\r"}
+_KEYWORD_ZEICHEN = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$")
+_LEER = " \t\r"
+
+_BINDUNG: dict[str, tuple[int, Callable[[list[geschichte.Bedingung]], geschichte.Bedingung]]] = {
+    ",": (2, geschichte.UndBedingung),
+    "|": (1, geschichte.OderBedingung),
+}
+"""Bindungsstärke der Infix-Operatoren in Bedingungen. ``!`` bindet stärker als beide."""
+
+
+class ParseFehler(ValueError):
+    """Die Geschichte entspricht nicht der Grammatik."""
+
+    def __init__(self, nachricht: str, zeile: int, spalte: int) -> None:
+        # Alle Argumente in args, damit der Fehler sich pickeln lässt, z.B. aus einem Prozess.
+        super().__init__(nachricht, zeile, spalte)
+        self.nachricht = nachricht
+        self.zeile = zeile
+        self.spalte = spalte
+
+    def __str__(self) -> str:
+        return f"{self.nachricht} (Zeile {self.zeile}, Spalte {self.spalte})"
+
+
+class _KeinTreffer(Exception):
+    """Die Regel passt nicht, aber eine andere könnte es noch tun."""
+
+
+_KOMMENTAR = object()
+"""Eine Zeile, die erkannt wurde, aber nichts erzeugt."""
+
+
+@define
+class _Fall:
+    """Ein Bedingungsblock, wird mit seinen Nachbarn zu einem IfElif zusammengefasst."""
+    bed: geschichte.Bedingung | None
+    block: tuple[geschichte.Zeile, ...] = field(converter=geschichte.zeilentupel)
+
+
+def _überspringe(text: str, pos: int) -> int:
+    """Überspringe Leerzeichen innerhalb einer Zeile."""
+    while pos < len(text) and text[pos] in _LEER:
+        pos += 1
+    return pos
+
+
+def _ist_zeilenende(text: str, pos: int) -> bool:
+    return _überspringe(text, pos) == len(text)
+
+
+def _verkleben(zeilen: Sequence, orte: dict[int, geschichte.Quellzeilen]
+               ) -> list[geschichte.Zeile]:
+    """Fasse gleichartige, aufeinanderfolgende Zeilen zusammen, wie
+    :py:func:`xwatc_zwei.loader.resolve_block`. Die neuen Zeilen bekommen in `orte` die
+    Zeilen ihrer Teile."""
+    ans: list[geschichte.Zeile] = []
+    gruppe: list = []
+    for zeile in zeilen:
+        if gruppe and type(gruppe[0]) == type(zeile):
+            gruppe.append(zeile)
+        else:
+            ans.extend(_klebe(gruppe, orte))
+            gruppe = [zeile]
+    ans.extend(_klebe(gruppe, orte))
+    return ans
+
+
+def _klebe(gruppe: list, orte: dict[int, geschichte.Quellzeilen]
+           ) -> Sequence[geschichte.Zeile]:
+    if not gruppe:
+        return ()
+    ans: geschichte.Zeile
+    if isinstance(gruppe[0], _Fall):
+        ans = geschichte.IfElif(fälle=[(fall.bed, fall.block) for fall in gruppe])
+    elif isinstance(gruppe[0], geschichte.Wahlmöglichkeit):
+        ans = geschichte.Entscheidung(wahlen=gruppe)
+    elif isinstance(gruppe[0], geschichte.Text):
+        ans = geschichte.Text(" ".join(text.text for text in gruppe))
+    else:
+        return gruppe
+    # Fälle und Wahlen haben eigene Einträge, das Ganze steht nur für den ersten Kopf.
+    letzte = gruppe[-1] if isinstance(ans, geschichte.Text) else gruppe[0]
+    orte[id(ans)] = orte[id(gruppe[0])][0], orte[id(letzte)][1]
+    return [ans]
+
+
+class _Parser:
+    """Liest eine Geschichte Zeile für Zeile. Die Position ist immer eine Zeile und der
+    Index darin, an dem das nächste Element beginnt."""
+
+    def __init__(self, text: str) -> None:
+        self.zeilen = text.expandtabs().split("\n")
+        self.nr = 0
+        self.index = 0
+        self.orte: dict[int, geschichte.Quellzeilen] = {}
+        """Die Zeilen der erzeugten Objekte, siehe :py:func:`geschichte.ordne_quelle`."""
+        self.geteilt: dict[tuple[int, ...], tuple[int, ...]] = {}
+
+    def merke(self, objekt: object, nr: int) -> None:
+        """Merke die Zeile (ab 0) eines erzeugten Objekts."""
+        self.orte[id(objekt)] = nr + 1, nr + 1
+
+    def fehler(self, nachricht: str, index: int | None = None) -> ParseFehler:
+        if index is None:
+            index = self.index
+        return ParseFehler(nachricht, self.nr + 1, index + 1)
+
+    def anfang(self) -> str | None:
+        """Gehe zum nächsten Element, über leere Zeilen hinweg. Gibt die aktuelle Zeile zurück,
+        oder None am Ende der Datei."""
+        while self.nr < len(self.zeilen):
+            zeile = self.zeilen[self.nr]
+            self.index = _überspringe(zeile, self.index)
+            if self.index < len(zeile):
+                return zeile
+            self.nr += 1
+            self.index = 0
+        return None
+
+    def nächste_zeile(self) -> None:
+        self.nr += 1
+        self.index = 0
+
+    def alle_module(self) -> list[verteiler.Geschichtsblock]:
+        module = []
+        if self.anfang() is None:
+            raise self.fehler("Geschichte ist leer")
+        while self.anfang() is not None:
+            module.append(self.modul())
+        return module
+
+    def modul(self) -> verteiler.Geschichtsblock:
+        zeile = self.zeilen[self.nr]
+        kopf = self.nr
+        ende = zeile.find("/", self.index + 1)
+        if zeile[self.index] != "/" or ende == -1:
+            raise self.fehler("Header erwartet")
+        name = _IDENT.match(zeile, _überspringe(zeile, self.index + 1), ende)
+        if not name or zeile[name.end():ende].strip(" ") or "/" in zeile[ende + 1:]:
+            raise self.fehler("Header erwartet")
+        zeilen: list = []
+        if text := zeile[ende + 1:].strip():
+            zeilen.append(geschichte.Text(text))
+            self.merke(zeilen[-1], kopf)
+        self.nächste_zeile()
+        while self.anfang() is not None:
+            element = self.zeile()
+            if element is None:
+                break
+            if element is not _KOMMENTAR:
+                zeilen.append(element)
+        zeilen = _verkleben(zeilen, self.orte)
+        quelle = dict(geschichte.ordne_quelle(zeilen, self.orte, self.geteilt))
+        quelle[()] = kopf + 1, kopf + 1
+        return verteiler.Geschichtsblock(name.group(), zeilen, quelle)
+
+    def block(self) -> list[geschichte.Zeile]:
+        """Ein eingerückter Block. Alle Zeilen müssen in der Spalte der ersten Zeile beginnen."""
+        if self.anfang() is None:
+            raise self.fehler("Zeile erwartet")
+        spalte = self.index
+        zeilen: list = []
+        gefunden = False
+        while self.anfang() is not None and self.index == spalte:
+            element = self.zeile()
+            if element is None:
+                break
+            gefunden = True
+            if element is not _KOMMENTAR:
+                zeilen.append(element)
+        if not gefunden:
+            raise self.fehler("Zeile erwartet")
+        return _verkleben(zeilen, self.orte)
+
+    def zeile(self) -> object:
+        """Lies eine Zeile ab der aktuellen Position. Passt sie nicht, wird None zurückgegeben und
+        die Position nicht verändert."""
+        zeile = self.zeilen[self.nr]
+        start = self.index
+        match zeile[start]:
+            case "/":
+                if "/" in zeile[start + 1:]:
+                    return None
+                ans: object = geschichte.Text(zeile[start + 1:].strip())
+            case "+" | "-":
+                ans = self.geben(zeile, start)
+            case ">":
+                ans = self.sprung(zeile, start)
+            case "%":
+                typ, args, pos = self.funktion(zeile, start + 1)
+                ans = geschichte.Treffen(typ, args) if _ist_zeilenende(zeile, pos) else None
+            case "#":
+                ans = _KOMMENTAR
+            case ":":
+                return self.entscheidungsblock(zeile, start)
+            case "<":
+                return self.bedingungsblock(zeile, start)
+            case _:
+                ans = self.setze_variable(zeile, start)
+        if ans is not None:
+            if ans is not _KOMMENTAR:
+                self.merke(ans, self.nr)
+            self.nächste_zeile()
+        return ans
+
+    def ident(self, zeile: str, pos: int) -> tuple[str, int]:
+        pos = _überspringe(zeile, pos)
+        if not (name := _IDENT.match(zeile, pos)):
+            raise self.fehler("Bezeichner erwartet", pos)
+        return name.group(), name.end()
+
+    def geben(self, zeile: str, start: int) -> geschichte.Erhalten | None:
+        objekt, pos = self.ident(zeile, start + 1)
+        anzahl = 0
+        if zahl := _GANZZAHL.match(zeile, _überspringe(zeile, pos)):
+            anzahl = int(zahl.group())
+            pos = zahl.end()
+        if not _ist_zeilenende(zeile, pos):
+            return None
+        return geschichte.Erhalten(objekt, -anzahl if zeile[start] == "-" else anzahl)
+
+    def sprung(self, zeile: str, start: int) -> geschichte.Sprung | None:
+        pos = _überspringe(zeile, start + 1)
+        ziel: str | geschichte.Sonderziel
+        if zeile[pos:pos + 4].lower() == "self" and (
+                pos + 4 == len(zeile) or zeile[pos + 4] not in _KEYWORD_ZEICHEN):
+            ziel, pos = geschichte.Sonderziel.Self, pos + 4
+        else:
+            ziel, pos = self.ident(zeile, pos)
+        if not _ist_zeilenende(zeile, pos):
+            return None
+        return geschichte.Sprung(ziel)
+
+    def setze_variable(self, zeile: str, start: int) -> geschichte.SetzeVariable | None:
+        pos = start + 1 if zeile[start] == "." else start
+        if not (name := _IDENT.match(zeile, pos)):
+            return None
+        pos = _überspringe(zeile, name.end())
+        if zeile[pos:pos + 1] != "=":
+            return None
+        pos = _überspringe(zeile, pos + 1)
+        wert: str | int
+        if zitat := _ZITAT.match(zeile, pos):
+            wert = "".join(
+                _ESCAPES[teil.group(1)] if teil.group(1)
+                else teil.group(2)[-1] if teil.group(2)
+                else teil.group(3)
+                for teil in _ENTZITAT.finditer(zitat.group()[1:-1]))
+            pos = zitat.end()
+        elif zahl := _VORZEICHENZAHL.match(zeile, pos):
+            wert = int(zahl.group())
+            pos = zahl.end()
+        else:
+            return None
+        if not _ist_zeilenende(zeile, pos):
+            return None
+        return geschichte.SetzeVariable(zeile[start:name.end()], wert, "=")
+
+    def funktion(self, zeile: str, pos: int) -> tuple[str, list[str | int], int]:
+        """Ein Funktionsaufruf ``name(arg, arg)``, es muss mindestens ein Argument geben."""
+        name, pos = self.ident(zeile, pos)
+        pos = _überspringe(zeile, pos)
+        if zeile[pos:pos + 1] != "(":
+            raise self.fehler("'(' erwartet", pos)
+        args: list[str | int] = []
+        while True:
+            pos = _überspringe(zeile, pos + 1)
+            if arg := _IDENT.match(zeile, pos):
+                args.append(arg.group())
+            elif arg := _VORZEICHENZAHL.match(zeile, pos):
+                args.append(int(arg.group()))
+            else:
+                raise self.fehler("Argument erwartet", pos)
+            pos = _überspringe(zeile, arg.end())
+            if zeile[pos:pos + 1] != ",":
+                break
+        if zeile[pos:pos + 1] != ")":
+            raise self.fehler("')' erwartet", pos)
+        return name, args, pos + 1
+
+    def bedingungskopf(self, zeile: str, start: int) -> tuple[geschichte.Bedingung | None, int]:
+        """``<Bedingung>``, wobei die Bedingung leer sein kann."""
+        try:
+            bed, pos = self.ausdruck(zeile, start + 1, 0)
+        except _KeinTreffer:
+            bed, pos = None, start + 1
+        pos = _überspringe(zeile, pos)
+        if zeile[pos:pos + 1] != ">":
+            raise self.fehler("'>' erwartet", pos)
+        return bed, pos + 1
+
+    def ausdruck(self, zeile: str, pos: int, min_bindung: int
+                 ) -> tuple[geschichte.Bedingung, int]:
+        """Pratt-Parser für Bedingungen. Ketten desselben Operators werden in eine einzige
+        Und- bzw. Oderbedingung gesammelt."""
+        links, pos = self.präfix(zeile, pos)
+        while True:
+            op_pos = _überspringe(zeile, pos)
+            op = zeile[op_pos:op_pos + 1]
+            if op not in _BINDUNG or _BINDUNG[op][0] < min_bindung:
+                return links, pos
+            bindung, klasse = _BINDUNG[op]
+            teile = [links]
+            while zeile[op_pos:op_pos + 1] == op:
+                teil, pos = self.ausdruck(zeile, op_pos + 1, bindung + 1)
+                teile.append(teil)
+                op_pos = _überspringe(zeile, pos)
+            links = klasse(teile)
+
+    def präfix(self, zeile: str, pos: int) -> tuple[geschichte.Bedingung, int]:
+        pos = _überspringe(zeile, pos)
+        zeichen = zeile[pos:pos + 1]
+        if zeichen == "!":
+            bed, pos = self.präfix(zeile, pos + 1)
+            return geschichte.NichtBedingung(bed), pos
+        elif zeichen == "(":
+            bed, pos = self.ausdruck(zeile, pos + 1, 0)
+            pos = _überspringe(zeile, pos)
+            if zeile[pos:pos + 1] != ")":
+                raise _KeinTreffer()
+            return bed, pos + 1
+        elif zeichen == "." and (name := _IDENT.match(zeile, pos + 1)):
+            return geschichte.VariablenBedingung(zeile[pos:name.end()]), name.end()
+        elif name := _IDENT.match(zeile, pos):
+            if zeile[_überspringe(zeile, name.end()):][:1] == "(":
+                func_name, args, pos = self.funktion(zeile, pos)
+                return geschichte.FuncBedingung(func_name, args), pos
+            return geschichte.VariablenBedingung(name.group()), name.end()
+        raise _KeinTreffer()
+
+    def nach_kopf(self, zeile: str, pos: int) -> None:
+        """Setze die Position hinter einen Blockkopf. Steht danach noch etwas in der Zeile,
+        beginnt der Block dort."""
+        if _ist_zeilenende(zeile, pos):
+            self.nächste_zeile()
+        else:
+            self.index = pos
+
+    def bedingungsblock(self, zeile: str, start: int) -> _Fall:
+        kopf = self.nr
+        bed, pos = self.bedingungskopf(zeile, start)
+        self.nach_kopf(zeile, pos)
+        fall = _Fall(bed, self.block())
+        self.merke(fall, kopf)
+        self.merke(fall.block, kopf)
+        return fall
+
+    def entscheidungsblock(self, zeile: str, start: int) -> geschichte.Wahlmöglichkeit:
+        kopf = self.nr
+        id, pos = self.ident(zeile, start + 1)
+        pos = _überspringe(zeile, pos)
+        bed = None
+        if zeile[pos:pos + 1] == "<":
+            bed, pos = self.bedingungskopf(zeile, pos)
+            pos = _überspringe(zeile, pos)
+        if zeile[pos:pos + 1] != ":":
+            raise self.fehler("':' erwartet", pos)
+        ende = zeile.find("/", pos + 1)
+        if ende == -1:
+            ende = len(zeile)
+        text = zeile[pos + 1:ende].strip()
+        self.nach_kopf(zeile, ende)
+        wahl = geschichte.Wahlmöglichkeit(id, text, self.block(), bed)
+        self.merke(wahl, kopf)
+        self.merke(wahl.block, kopf)
+        return wahl
+
+
+def parse_geschichte(text: str) -> list[verteiler.Geschichtsblock]:
+    """Parse den Inhalt einer Geschichtsdatei in ihre Blöcke."""
+    return _Parser(text).alle_module()
+
+
+def parse_datei(path: PathLike) -> list[verteiler.Geschichtsblock]:
+    """Parse eine Geschichtsdatei in ihre Blöcke."""
+    with open(path, "r", encoding="utf-8") as read:
+        return parse_geschichte(read.read())
+
+
+def parse_bedingung(bed_str: str) -> geschichte.Bedingung | None:
+    """Parse eine einzelne Bedingung, wie sie zwischen ``<`` und ``>`` steht."""
+    parser = _Parser(bed_str)
+    zeile = parser.zeilen[0] if len(parser.zeilen) == 1 else ""
+    try:
+        bed, pos = parser.ausdruck(zeile, 0, 0)
+    except _KeinTreffer:
+        bed, pos = None, 0
+    if not _ist_zeilenende(zeile, pos) or len(parser.zeilen) != 1:
+        raise parser.fehler("Ende der Bedingung erwartet", pos)
+    return bed